@@ -0,0 +1,36 @@
+"""Timing and memory measurement shared by the benchmarks."""
+
+import gc
+import time as timer
+import tracemalloc
+from typing import Any, Callable, Dict
+
+
+def measure(fn: Callable[[], Any], number: int = 1, repeat: int = 5) -> Dict[str, Any]:
+    """Best-of-``repeat`` time per call over ``number`` calls, plus peak memory
+
+    Memory is traced on a separate single call, since tracemalloc slows
+    allocation down several times.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = timer.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((timer.perf_counter() - started) / number)
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {
+        "seconds": min(timings),
+        "median_seconds": sorted(timings)[len(timings) // 2],
+        "number": number,
+        "repeat": repeat,
+        "peak_bytes": peak,
+        "retained_bytes": current,
+    }
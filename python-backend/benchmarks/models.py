@@ -0,0 +1,104 @@
+"""Construction time and memory of the domain model when hydrating rows.
+
+Compares UserAvailability.from_dict with the previous eager, __dict__-based
+dataclass on synthetic PostgREST rows. Run from python-backend:
+
+    python -m benchmarks.models --rows 20000
+"""
+
+import argparse
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from classes import UserAvailability
+
+from benchmarks.harness import measure
+
+
+@dataclass
+class LegacyUserAvailability:
+    """UserAvailability as it was before slots and lazy parsing"""
+
+    id: Optional[UUID] = None
+    event_id: UUID = None
+    user_id: UUID = None
+    available_date: date = None
+    available_time: time = None
+    created_at: Optional[datetime] = None
+
+    def __post_init__(self):
+        if self.id is None:
+            self.id = uuid4()
+        if self.created_at is None:
+            self.created_at = datetime.now()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LegacyUserAvailability":
+        return cls(
+            id=UUID(data["id"]) if data.get("id") else None,
+            event_id=UUID(data["event_id"]),
+            user_id=UUID(data["user_id"]),
+            available_date=(
+                date.fromisoformat(data["available_date"])
+                if data.get("available_date")
+                else None
+            ),
+            available_time=(
+                time.fromisoformat(data["available_time"])
+                if data.get("available_time")
+                else None
+            ),
+            created_at=(
+                datetime.fromisoformat(data["created_at"])
+                if data.get("created_at")
+                else None
+            ),
+        )
+
+
+def availability_rows(count: int, users: int = 200) -> List[Dict[str, Any]]:
+    """Rows shaped like a user_availability select(*)"""
+    event_id = str(uuid4())
+    user_ids = [str(uuid4()) for _ in range(users)]
+    start = date(2025, 7, 1)
+    created_at = datetime(2025, 6, 30, 12, 0).isoformat()
+    rows = []
+    for i in range(count):
+        slot = i // users
+        rows.append(
+            {
+                "id": str(uuid4()),
+                "event_id": event_id,
+                "user_id": user_ids[i % users],
+                "available_date": (start + timedelta(days=slot // 48)).isoformat(),
+                "available_time": time(slot % 48 // 2, slot % 2 * 30).isoformat(),
+                "created_at": created_at,
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    rows = availability_rows(args.rows)
+    cases = {
+        "legacy": lambda: [LegacyUserAvailability.from_dict(row) for row in rows],
+        "slots": lambda: [UserAvailability.from_dict(row) for row in rows],
+    }
+    print(f"{args.rows} rows")
+    for name, build in cases.items():
+        result = measure(build, repeat=3)
+        print(
+            f"{name:>8}: {result['seconds'] * 1000:8.1f} ms"
+            f"  {result['retained_bytes'] / args.rows:6.0f} B/row retained"
+            f"  {result['peak_bytes'] / 2**20:6.1f} MiB peak"
+        )
+
+
+if __name__ == "__main__":
+    main()
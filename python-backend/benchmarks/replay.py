@@ -0,0 +1,366 @@
+"""Replay Telegram updates through the bot handlers and report latencies.
+
+Updates are fed to ``bot.process_new_updates`` through the same keyed worker
+pool the webhook uses, against a fake Telegram API and a local storage
+backend. Run from python-backend:
+
+    python -m benchmarks.replay --updates 5000 --workers 8 --json replay.json
+    python -m benchmarks.replay --input recorded_updates.jsonl
+
+Recorded input is one Update JSON object per line. Without it a synthetic
+stream of /start, event creation, inline queries, joins, availability
+submissions and Calculate clicks is generated.
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import os
+import random
+import string
+import threading
+import time as timer
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from querylog import QueryLog, track_queries
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+class FakeTelegramAPI:
+    """Stands in for api.telegram.org via apihelper.CUSTOM_REQUEST_SENDER"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, method, url, **kwargs):
+        name = url.rsplit("/", 1)[-1]
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            timer.sleep(self.latency)
+        result: Any = True
+        if name in ("sendMessage", "editMessageText"):
+            result = {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": 1, "type": "private"},
+                "text": "",
+            }
+        return _Response({"ok": True, "result": result})
+
+
+class _Response:
+    status_code = 200
+    reason = "OK"
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def synthetic_updates(
+    count: int, users: int, events: List[str], seed: int = 0
+) -> Iterator[Dict[str, Any]]:
+    """A stream shaped like an invite being shared in a busy group"""
+    rng = random.Random(seed)
+    start = date(2025, 7, 1)
+    kinds = ["start", "create", "inline", "join", "submit", "calculate"]
+    weights = [10, 2, 10, 45, 20, 13]
+    for update_id in range(1, count + 1):
+        tele_id = 1000 + rng.randrange(users)
+        sender = {
+            "id": tele_id,
+            "is_bot": False,
+            "first_name": f"User{tele_id}",
+            "username": f"user{tele_id}",
+        }
+        private = {"id": tele_id, "type": "private"}
+        message = {"message_id": update_id, "date": 0, "chat": private, "from": sender}
+        event_id = rng.choice(events)
+        kind = rng.choices(kinds, weights)[0]
+
+        if kind == "start":
+            message.update(
+                text="/start",
+                entities=[{"type": "bot_command", "offset": 0, "length": 6}],
+            )
+            yield {"update_id": update_id, "message": message}
+        elif kind == "create":
+            data = {
+                "web_app_number": 0,
+                "event_name": f"Event {update_id}",
+                "event_details": "",
+                "start": start.isoformat(),
+                "end": (start + timedelta(days=13)).isoformat(),
+            }
+            message["web_app_data"] = {"data": json.dumps(data), "button_text": ""}
+            yield {"update_id": update_id, "message": message}
+        elif kind == "inline":
+            yield {
+                "update_id": update_id,
+                "inline_query": {
+                    "id": str(update_id),
+                    "from": sender,
+                    "query": f"Event:{event_id}",
+                    "offset": "",
+                },
+            }
+        elif kind == "submit":
+            data = {
+                "success": True,
+                "event_id": event_id,
+                "user": {"name": sender["username"]},
+            }
+            message["web_app_data"] = {"data": json.dumps(data), "button_text": ""}
+            yield {"update_id": update_id, "message": message}
+        else:
+            yield {
+                "update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id),
+                    "from": sender,
+                    "chat_instance": "replay",
+                    "inline_message_id": f"inline-{event_id}",
+                    "data": event_id if kind == "join" else f"Calculate {event_id}",
+                },
+            }
+
+
+class Recorder:
+    """Per-handler latencies, storage calls and round trips per update"""
+
+    def __init__(self, budget: Optional[int] = None):
+        self.budget = budget
+        self.current = threading.local()
+        self.handler_latency: Dict[str, List[float]] = defaultdict(list)
+        self.update_latency: List[float] = []
+        self.db_calls: Dict[str, List[int]] = defaultdict(list)
+        self.queries: Dict[str, List[QueryLog]] = defaultdict(list)
+        self.db_methods = Counter()
+        self._lock = threading.Lock()
+
+    def wrap_handler(self, name: str, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            self.current.handler = name
+            started = timer.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = timer.perf_counter() - started
+                with self._lock:
+                    self.handler_latency[name].append(elapsed)
+
+        return timed
+
+    def wrap_db(self, name: str, method):
+        @functools.wraps(method)
+        def counted(*args, **kwargs):
+            # Only the outermost call counts, not methods calling each other
+            depth = getattr(self.current, "depth", 0)
+            if depth == 0 and hasattr(self.current, "db_calls"):
+                self.current.db_calls += 1
+                with self._lock:
+                    self.db_methods[name] += 1
+            self.current.depth = depth + 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.current.depth = depth
+
+        return counted
+
+    def process(self, bot, update):
+        self.current.handler = "unhandled"
+        self.current.db_calls = 0
+        started = timer.perf_counter()
+        try:
+            with track_queries("replay", budget=self.budget, strict=False) as log:
+                bot.process_new_updates([update])
+        finally:
+            elapsed = timer.perf_counter() - started
+            with self._lock:
+                self.update_latency.append(elapsed)
+                self.db_calls[self.current.handler].append(self.current.db_calls)
+                self.queries[self.current.handler].append(log)
+            del self.current.db_calls
+
+
+def instrument(telegram, recorder: Recorder):
+    """Time every registered handler and count every public storage call"""
+    bot = telegram.bot
+    for handlers in (
+        bot.message_handlers,
+        bot.inline_handlers,
+        bot.callback_query_handlers,
+    ):
+        for handler in handlers:
+            function = handler["function"]
+            handler["function"] = recorder.wrap_handler(function.__name__, function)
+
+    db = telegram.db
+    for name in dir(type(db)):
+        if name.startswith("_") or name in ("event_cache_stats",):
+            continue
+        method = getattr(db, name)
+        if callable(method):
+            setattr(db, name, recorder.wrap_db(name, method))
+
+
+def seed_events(db, count: int, seed: int = 0) -> List[str]:
+    """Create events (and their creators) to target with the stream"""
+    from classes import Event
+
+    rng = random.Random(seed)
+    event_ids = []
+    for number in range(count):
+        creator = db.get_or_create_user(str(900000 + number), f"creator{number}")
+        event_id = "".join(rng.choices(string.ascii_letters + string.digits, k=16))
+        db.create_event(
+            Event(
+                event_id=event_id,
+                event_name=f"Seeded {number}",
+                creator_id=creator.id,
+                start_date=date(2025, 7, 1),
+                end_date=date(2025, 7, 14),
+            )
+        )
+        event_ids.append(event_id)
+    return event_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", help="recorded updates, one JSON object per line")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--events", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--backend", default="memory")
+    parser.add_argument(
+        "--rate-limit", action="store_true", help="keep outbound limits"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=int, help="round trips allowed per update")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    # Everything below must be configured before telegram is imported
+    os.environ.setdefault("BOT_TOKEN", "0:replay")
+    os.environ["STORAGE_BACKEND"] = args.backend
+    if not args.rate_limit:
+        os.environ["OUTBOUND_GLOBAL_RATE"] = "1e9"
+        os.environ["OUTBOUND_CHAT_RATE"] = "1e9"
+        os.environ["OUTBOUND_CHAT_BURST"] = "1e9"
+
+    import logging
+
+    import telebot
+    from icecream import ic
+    from telebot import apihelper
+
+    api = FakeTelegramAPI(args.api_latency)
+    apihelper.CUSTOM_REQUEST_SENDER = api
+    import telegram
+    from workers import UpdateWorkerPool
+
+    # telegram.py turns on debug logging at import time
+    telebot.logger.setLevel(logging.WARNING)
+    ic.disable()
+
+    recorder = Recorder(args.budget)
+    if args.input:
+        with open(args.input) as f:
+            raw = [json.loads(line) for line in f if line.strip()]
+    else:
+        events = seed_events(telegram.db, args.events, args.seed)
+        raw = list(synthetic_updates(args.updates, args.users, events, args.seed))
+    instrument(telegram, recorder)
+    updates = [telebot.types.Update.de_json(item) for item in raw]
+
+    pool = UpdateWorkerPool(
+        lambda update: recorder.process(telegram.bot, update),
+        workers=args.workers,
+        queue_size=len(updates),
+        name="replay",
+        key=telegram.update_dispatch_key,
+    )
+    pool.start()
+    started = timer.perf_counter()
+    # The handlers print debugging output; keep it out of the report
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        for update in updates:
+            pool.submit(update)
+        pool.shutdown(drain=True)
+        telegram.outbound.flush()
+    elapsed = timer.perf_counter() - started
+
+    handlers = {}
+    for name, latencies in sorted(recorder.handler_latency.items()):
+        latencies.sort()
+        calls = recorder.db_calls.get(name, [])
+        logs = recorder.queries.get(name, [])
+        round_trips = [log.round_trips for log in logs]
+        handlers[name] = {
+            "count": len(latencies),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "db_calls_mean": sum(calls) / len(calls) if calls else 0.0,
+            "db_calls_max": max(calls, default=0),
+            "queries_mean": sum(round_trips) / len(logs) if logs else 0.0,
+            "queries_max": max(round_trips, default=0),
+            "rows_mean": sum(log.rows for log in logs) / len(logs) if logs else 0.0,
+            "with_repeats": sum(1 for log in logs if log.duplicates),
+            "over_budget": sum(1 for log in logs if log.over_budget),
+        }
+    report = {
+        "meta": {
+            k: v for k, v in vars(args).items() if k not in ("json", "rate_limit")
+        },
+        "updates": len(updates),
+        "seconds": elapsed,
+        "updates_per_second": len(updates) / elapsed if elapsed else 0.0,
+        "failed": pool.stats()["failed"],
+        "handlers": handlers,
+        "db_methods": dict(recorder.db_methods.most_common()),
+        "api_calls": dict(api.calls.most_common()),
+    }
+
+    print(
+        f"{len(updates)} updates in {elapsed:.2f}s"
+        f" ({report['updates_per_second']:.0f}/s, {args.workers} workers)"
+    )
+    print(
+        f"{'handler':>24} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8}"
+        f" {'db/upd':>7} {'q/upd':>6} {'q max':>6} {'repeats':>8} {'over':>5}"
+    )
+    for name, row in handlers.items():
+        print(
+            f"{name:>24} {row['count']:>6} {row['p50_ms']:>8.2f}"
+            f" {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+            f" {row['db_calls_mean']:>7.1f} {row['queries_mean']:>6.1f}"
+            f" {row['queries_max']:>6} {row['with_repeats']:>8}"
+            f" {row['over_budget']:>5}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
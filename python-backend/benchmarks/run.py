@@ -0,0 +1,149 @@
+"""Benchmarks for the scheduling and persistence hot paths.
+
+Run from python-backend:
+
+    python -m benchmarks.run --users 200 --days 21 --density 0.3 --json out.json
+
+Each case reports best and median time per call and the peak memory of one
+call. ``--json`` writes the results with the run parameters so they can be
+compared between commits.
+"""
+
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from classes import (
+    AvailabilityCalculator,
+    AvailabilityGrid,
+    Event,
+    UserAvailability,
+    WindowIndex,
+    parse_webapp_slots,
+)
+
+from benchmarks.harness import measure
+from benchmarks.synthetic import SyntheticEvent, generate
+
+
+def cases(data: SyntheticEvent) -> List[Tuple[str, Callable[[], Any], int]]:
+    """(name, callable, calls per timing) for every benchmarked path"""
+    event = data.event
+    event_row = event.to_dict()
+    grid = AvailabilityGrid.from_rows(
+        data.rows, data.users, event.start_date, event.end_date
+    )
+    slots = grid.summary()
+    index = WindowIndex(grid)
+
+    return [
+        (
+            "summary_grouping",
+            lambda: AvailabilityGrid.from_rows(
+                data.rows, data.users, event.start_date, event.end_date
+            ).summary(),
+            1,
+        ),
+        ("find_best_times", lambda: AvailabilityCalculator.find_best_times(slots), 1),
+        (
+            "find_best_time_streamed",
+            lambda: [
+                grid.to_availability_slot(index)
+                for index in AvailabilityCalculator.find_best_indices(
+                    grid.iter_counts(), 1
+                )
+            ],
+            1,
+        ),
+        (
+            "find_contiguous_slots",
+            lambda: AvailabilityCalculator.find_contiguous_slots(slots, 60),
+            1,
+        ),
+        (
+            "find_best_windows",
+            lambda: AvailabilityCalculator.find_best_windows(grid, 120),
+            1,
+        ),
+        ("window_index_build", lambda: WindowIndex(grid), 1),
+        ("window_query_2h", lambda: index.best_window(120), 10),
+        (
+            "window_query_weekend_3h",
+            lambda: index.best_window(180, weekdays=(5, 6)),
+            10,
+        ),
+        ("grid_best_slots", lambda: grid.best_slots(1), 100),
+        ("event_from_dict", lambda: Event.from_dict(event_row), 1000),
+        ("event_to_dict", lambda: event.to_dict(), 1000),
+        (
+            "availability_from_dict",
+            lambda: [UserAvailability.from_dict(row) for row in data.rows],
+            1,
+        ),
+        (
+            "from_webapp_data",
+            lambda: [
+                UserAvailability.from_webapp_data(event.id, event.creator_id, item)
+                for item in data.payload
+            ],
+            1,
+        ),
+        (
+            "parse_webapp_slots",
+            lambda: parse_webapp_slots(data.payload, event.start_date, event.end_date),
+            1,
+        ),
+        ("generate_display_text", lambda: event.generate_display_text(), 100),
+    ]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    data = generate(args.users, args.days, args.density, args.seed)
+    results = []
+    for name, fn, number in cases(data):
+        if args.filter and args.filter not in name:
+            continue
+        result = {"name": name, **measure(fn, number=number, repeat=args.repeat)}
+        results.append(result)
+        print(
+            f"{name:>24}: {result['seconds'] * 1000:10.3f} ms"
+            f"  (median {result['median_seconds'] * 1000:.3f})"
+            f"  peak {result['peak_bytes'] / 1024:10.1f} KiB"
+        )
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "users": args.users,
+            "days": args.days,
+            "density": args.density,
+            "seed": args.seed,
+            "availability_rows": len(data.rows),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", help="only run cases whose name contains this")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
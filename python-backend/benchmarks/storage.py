@@ -0,0 +1,122 @@
+"""End-to-end storage benchmarks on a local backend.
+
+Loads a synthetic event into a storage backend and times the paths the bot
+hits on every join and "Calculate" click. Run from python-backend:
+
+    python -m benchmarks.storage --backend memory --users 200 --days 21
+
+Uses create_storage, so any STORAGE_BACKEND (including supabase) can be
+compared with the same data.
+"""
+
+import argparse
+import json
+
+from classes import User
+from storage import Storage, create_storage
+
+from benchmarks.harness import measure
+from benchmarks.synthetic import SyntheticEvent, generate
+
+
+def populate(db: Storage, data: SyntheticEvent):
+    """Write the synthetic users, event, members and availability"""
+    for user in data.users:
+        db.create_user(user)
+    db.create_event(data.event)
+    by_user = {}
+    for row in data.rows:
+        by_user.setdefault(row["user_id"], []).append(row)
+    for user in data.users:
+        db.add_event_member(data.event.id, user.id)
+        db.set_user_availability(
+            data.event.id,
+            user.id,
+            [
+                {
+                    "date": "/".join(reversed(row["available_date"].split("-"))),
+                    "time": row["available_time"][:5].replace(":", ""),
+                }
+                for row in by_user.get(str(user.id), [])
+            ],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", default="memory")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    db = create_storage(args.backend)
+    data = generate(args.users, args.days, args.density, args.seed)
+    populate(db, data)
+    event = data.event
+    resubmitter: User = data.users[-1]
+
+    def cold(fn):
+        """Drop caches first so the backend is actually queried"""
+
+        def run():
+            db.invalidate_availability(event.id)
+            return fn()
+
+        return run
+
+    cases = [
+        ("get_event_cached", lambda: db.get_event_by_id(event.id)),
+        ("get_event_cold", cold(lambda: db.get_event_by_id(event.id))),
+        (
+            "get_event_name_only",
+            cold(lambda: db.get_event_by_event_id(event.event_id, load=())),
+        ),
+        ("availability_grid", lambda: db.get_availability_grid(event.id)),
+        ("availability_summary", lambda: db.get_availability_summary(event.id)),
+        (
+            "best_time_streamed",
+            lambda: db.find_best_times(event.id, 1),
+        ),
+        ("best_times_cold", cold(lambda: db.calculate_best_meeting_times(event.id, 1))),
+        ("best_times_warm", lambda: db.calculate_best_meeting_times(event.id, 1)),
+        (
+            "resubmit_one_slot",
+            lambda: db.set_user_availability(
+                event.id, resubmitter.id, data.payload[1:]
+            ),
+        ),
+        ("update_display_text", lambda: db.update_event_display_text(event.id)),
+    ]
+
+    results = []
+    for name, fn in cases:
+        fn()  # warm up
+        result = {"name": name, **measure(fn, repeat=args.repeat)}
+        results.append(result)
+        print(
+            f"{name:>24}: {result['seconds'] * 1000:10.3f} ms"
+            f"  peak {result['peak_bytes'] / 1024:10.1f} KiB"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "backend": type(db).__name__,
+                        **{k: v for k, v in vars(args).items() if k != "json"},
+                        "availability_rows": len(data.rows),
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
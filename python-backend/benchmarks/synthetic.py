@@ -0,0 +1,91 @@
+"""Synthetic events for benchmarks: users x days x slot density."""
+
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from classes import Event, User, UserAvailability, SLOT_MINUTES
+
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+@dataclass
+class SyntheticEvent:
+    """An event with members, availability rows and a webapp payload"""
+
+    event: Event
+    users: List[User]
+    rows: List[Dict[str, Any]]  # as returned by user_availability select(*)
+    payload: List[Dict[str, str]]  # dragselector dateTimes for one user
+
+    @property
+    def availability(self) -> List[UserAvailability]:
+        return [UserAvailability.from_dict(row) for row in self.rows]
+
+
+def generate(
+    users: int = 50,
+    days: int = 14,
+    density: float = 0.3,
+    seed: int = 0,
+    start_date: Optional[date] = None,
+) -> SyntheticEvent:
+    """Each user is free in roughly ``density`` of the event's slots.
+
+    Availability comes in blocks of one to four hours, like dragselector
+    submissions, rather than independently random cells.
+    """
+    rng = random.Random(seed)
+    start_date = start_date or date(2025, 7, 1)
+    end_date = start_date + timedelta(days=days - 1)
+    created_at = datetime(2025, 6, 30, 12, 0).isoformat()
+
+    members = [
+        User(id=uuid4(), tele_id=str(100000 + i), tele_username=f"user{i}")
+        for i in range(users)
+    ]
+    event = Event(
+        id=uuid4(),
+        event_id="".join(rng.choice("abcdefghijklmnop") for _ in range(16)),
+        event_name="Synthetic event",
+        creator_id=members[0].id if members else None,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    event.members = members
+
+    total = days * SLOTS_PER_DAY
+    rows = []
+    payload = []
+    event_str = str(event.id)
+    for number, user in enumerate(members):
+        free = set()
+        while len(free) < density * total:
+            start = rng.randrange(total)
+            free.update(range(start, min(total, start + rng.randint(2, 8))))
+        user_str = str(user.id)
+        for index in sorted(free):
+            day, slot = divmod(index, SLOTS_PER_DAY)
+            available_date = start_date + timedelta(days=day)
+            minutes = slot * SLOT_MINUTES
+            available_time = time(minutes // 60, minutes % 60)
+            rows.append(
+                {
+                    "id": str(uuid4()),
+                    "event_id": event_str,
+                    "user_id": user_str,
+                    "available_date": available_date.isoformat(),
+                    "available_time": available_time.isoformat(),
+                    "created_at": created_at,
+                }
+            )
+            if number == 0:
+                payload.append(
+                    {
+                        "date": available_date.strftime("%d/%m/%Y"),
+                        "time": available_time.strftime("%H%M"),
+                    }
+                )
+    return SyntheticEvent(event=event, users=members, rows=rows, payload=payload)
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a time-to-live.
+
+    Every ``invalidate`` stamps the key with a generation number; a loader that
+    read the backing store before that stamp passes its starting generation to
+    ``set`` and the stale value is dropped instead of cached.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._invalidated: Dict[Hashable, int] = {}
+        self._generation = 0
+        self._floor = 0  # loads that started before this are always rejected
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def generation(self) -> int:
+        """Current generation, to be passed back to ``set`` by loaders"""
+        with self._lock:
+            return self._generation
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def record_miss(self):
+        """Count a miss for a lookup that never reached ``get``"""
+        with self._lock:
+            self.misses += 1
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> bool:
+        """Cache a value; skipped if the key was invalidated after generation"""
+        with self._lock:
+            if generation is not None and (
+                generation < self._floor or self._invalidated.get(key, -1) >= generation
+            ):
+                return False
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+    def invalidate(self, key: Hashable) -> Any:
+        """Drop a key and reject in-flight loads of it; returns the old value"""
+        with self._lock:
+            self._invalidated[key] = self._generation
+            self._generation += 1
+            if len(self._invalidated) > self.maxsize * 4:
+                # Forget old stamps; loads older than them are rejected outright
+                self._floor = self._generation - self.maxsize * 2
+                self._invalidated = {
+                    k: g for k, g in self._invalidated.items() if g >= self._floor
+                }
+            entry = self._data.pop(key, None)
+            return entry[1] if entry else None
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+            self._floor = self._generation
+            self._invalidated.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
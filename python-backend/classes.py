@@ -1,11 +1,103 @@
-from dataclasses import dataclass, field
+from collections import defaultdict
+from dataclasses import MISSING, dataclass, field, fields
 from datetime import datetime, date, time
-from typing import List, Optional, Dict, Any
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 from uuid import UUID, uuid4
+import functools
+import heapq
 import json
 
+import numpy as np
 
-@dataclass
+# Stored values repeat a lot (the same event/user IDs and dates on every
+# availability row), so parse each distinct string once
+_parse_uuid = functools.lru_cache(maxsize=4096)(UUID)
+_parse_date = functools.lru_cache(maxsize=4096)(date.fromisoformat)
+_parse_time = functools.lru_cache(maxsize=1024)(time.fromisoformat)
+
+
+def _optional(parse: Callable[[str], Any], value: Optional[str]) -> Any:
+    return parse(value) if value else None
+
+
+class _LazyField:
+    """Wraps a slot so a string stored by from_dict is parsed on first read"""
+
+    def __init__(self, slot, parse: Callable[[str], Any]):
+        self.slot = slot
+        self.parse = parse
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = self.slot.__get__(obj, owner)
+        if isinstance(value, str):
+            value = self.parse(value)
+            self.slot.__set__(obj, value)
+        return value
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+
+
+def _lazy_fields(**parsers: Callable[[str], Any]):
+    """Class decorator making the named slot fields parse lazily"""
+
+    def decorate(cls):
+        for name, parse in parsers.items():
+            setattr(cls, name, _LazyField(cls.__dict__[name], parse))
+        return cls
+
+    return decorate
+
+
+_FIELD_DEFAULTS: Dict[type, List[Tuple[str, Any, Any]]] = {}
+
+
+def _hydrate(cls, values: Dict[str, Any]):
+    """Build an instance from stored values without running __post_init__
+
+    Fields missing from values get their declared defaults, so nothing calls
+    uuid4() or datetime.now() for records that already exist.
+    """
+    defaults = _FIELD_DEFAULTS.get(cls)
+    if defaults is None:
+        defaults = _FIELD_DEFAULTS[cls] = [
+            (f.name, f.default, f.default_factory) for f in fields(cls)
+        ]
+    obj = object.__new__(cls)
+    for name, default, factory in defaults:
+        if name in values:
+            value = values[name]
+        elif factory is not MISSING:
+            value = factory()
+        else:
+            value = None if default is MISSING else default
+        setattr(obj, name, value)
+    return obj
+
+
+def _id_column(value: Optional[UUID]) -> Dict[str, str]:
+    """The "id" entry of a row, left out when from_dict was given no id"""
+    return {} if value is None else {"id": str(value)}
+
+
+_timestamp = datetime.fromisoformat
+
+
+@_lazy_fields(id=UUID, created_at=_timestamp, updated_at=_timestamp)
+@dataclass(slots=True)
 class User:
     """Represents a Telegram user in the system"""
 
@@ -29,7 +121,7 @@ class User:
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for database operations"""
         return {
-            "id": str(self.id),
+            **_id_column(self.id),
             "tele_id": self.tele_id,
             "tele_username": self.tele_username,
             "display_name": self.display_name,
@@ -42,27 +134,52 @@ class User:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "User":
         """Create User instance from dictionary"""
-        return cls(
-            id=UUID(data["id"]) if data.get("id") else None,
-            tele_id=data.get("tele_id", ""),
-            tele_username=data.get("tele_username"),
-            display_name=data.get("display_name"),
-            initialised=data.get("initialised", False),
-            callout_cleared=data.get("callout_cleared", True),
-            created_at=(
-                datetime.fromisoformat(data["created_at"])
-                if data.get("created_at")
-                else None
-            ),
-            updated_at=(
-                datetime.fromisoformat(data["updated_at"])
-                if data.get("updated_at")
-                else None
-            ),
+        return _hydrate(
+            cls,
+            {
+                "id": data.get("id") or None,
+                "tele_id": data.get("tele_id", ""),
+                "tele_username": data.get("tele_username"),
+                "display_name": data.get("display_name"),
+                "initialised": data.get("initialised", False),
+                "callout_cleared": data.get("callout_cleared", True),
+                "created_at": data.get("created_at") or None,
+                "updated_at": data.get("updated_at") or None,
+            },
         )
 
 
-@dataclass
+EVENT_RELATIONS = ("members", "availability")
+
+DISPLAY_TEXT_LIMIT = 4096  # Telegram's maximum message length
+
+
+class _DeferredRelation:
+    """Event relation that is loaded by a registered loader on first access"""
+
+    storage = {"members": "_members", "availability": "_availability_data"}
+
+    def __init__(self, relation: str):
+        self.relation = relation
+        self.attr = self.storage[relation]
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.attr)
+        if value is None:
+            loader = obj._loaders.pop(self.relation, None)
+            value = loader() if loader else []
+            setattr(obj, self.attr, value)
+        return value
+
+    def __set__(self, obj, value):
+        obj._loaders.pop(self.relation, None)
+        setattr(obj, self.attr, value)
+
+
+@_lazy_fields(id=UUID, created_at=_timestamp, updated_at=_timestamp)
+@dataclass(slots=True)
 class Event:
     """Represents an event that users can join and set availability for"""
 
@@ -81,12 +198,20 @@ class Event:
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    # Computed fields (not stored in DB)
-    members: List["User"] = field(default_factory=list, init=False)
-    availability_data: List["UserAvailability"] = field(
-        default_factory=list, init=False
+    # Computed fields (not stored in DB), see the deferred relations below
+    _members: Optional[List["User"]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _availability_data: Optional[List["UserAvailability"]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _loaders: Dict[str, Callable[[], list]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
     )
 
+    members = _DeferredRelation("members")
+    availability_data = _DeferredRelation("availability")
+
     def __post_init__(self):
         if self.id is None:
             self.id = uuid4()
@@ -98,7 +223,7 @@ class Event:
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for database operations"""
         return {
-            "id": str(self.id),
+            **_id_column(self.id),
             "event_id": self.event_id,
             "event_name": self.event_name,
             "event_details": self.event_details,
@@ -121,49 +246,41 @@ class Event:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "Event":
         """Create Event instance from dictionary"""
-        return cls(
-            id=UUID(data["id"]) if data.get("id") else None,
-            event_id=data.get("event_id", ""),
-            event_name=data.get("event_name", ""),
-            event_details=data.get("event_details"),
-            creator_id=UUID(data["creator_id"]) if data.get("creator_id") else None,
-            start_date=(
-                date.fromisoformat(data["start_date"])
-                if data.get("start_date")
-                else None
-            ),
-            end_date=(
-                date.fromisoformat(data["end_date"]) if data.get("end_date") else None
-            ),
-            display_text=data.get("display_text"),
-            best_date=(
-                date.fromisoformat(data["best_date"]) if data.get("best_date") else None
-            ),
-            best_start_time=(
-                time.fromisoformat(data["best_start_time"])
-                if data.get("best_start_time")
-                else None
-            ),
-            best_end_time=(
-                time.fromisoformat(data["best_end_time"])
-                if data.get("best_end_time")
-                else None
-            ),
-            max_participants=data.get("max_participants", 0),
-            created_at=(
-                datetime.fromisoformat(data["created_at"])
-                if data.get("created_at")
-                else None
-            ),
-            updated_at=(
-                datetime.fromisoformat(data["updated_at"])
-                if data.get("updated_at")
-                else None
-            ),
+        return _hydrate(
+            cls,
+            {
+                "id": data.get("id") or None,
+                "event_id": data.get("event_id", ""),
+                "event_name": data.get("event_name", ""),
+                "event_details": data.get("event_details"),
+                "creator_id": _optional(_parse_uuid, data.get("creator_id")),
+                "start_date": _optional(_parse_date, data.get("start_date")),
+                "end_date": _optional(_parse_date, data.get("end_date")),
+                "display_text": data.get("display_text"),
+                "best_date": _optional(_parse_date, data.get("best_date")),
+                "best_start_time": _optional(_parse_time, data.get("best_start_time")),
+                "best_end_time": _optional(_parse_time, data.get("best_end_time")),
+                "max_participants": data.get("max_participants", 0),
+                "created_at": data.get("created_at") or None,
+                "updated_at": data.get("updated_at") or None,
+            },
         )
 
-    def generate_display_text(self) -> str:
-        """Generate the formatted display text for Telegram"""
+    def defer(self, relation: str, loader: Callable[[], list]):
+        """Load a relation ("members" or "availability") on first access"""
+        self._loaders[relation] = loader
+        setattr(self, _DeferredRelation.storage[relation], None)
+
+    def is_loaded(self, relation: str) -> bool:
+        """Whether a relation has been loaded (or explicitly set)"""
+        return getattr(self, _DeferredRelation.storage[relation]) is not None
+
+    def generate_display_text(self, limit: int = DISPLAY_TEXT_LIMIT) -> str:
+        """Generate the formatted display text for Telegram
+
+        Members that would push the text past ``limit`` characters (Telegram's
+        message limit by default) are summarised as "...and N more".
+        """
         if not self.start_date or not self.end_date:
             return ""
 
@@ -172,7 +289,7 @@ class Event:
         if self.best_start_time and self.best_end_time:
             best_timing_str = f"[{self.best_start_time.strftime('%H%M')} - {self.best_end_time.strftime('%H%M')}]"
 
-        text = f"""Date range: {self.start_date.strftime("%-d %b %Y")} - {self.end_date.strftime("%-d %b %Y")}
+        header = f"""Date range: {self.start_date.strftime("%-d %b %Y")} - {self.end_date.strftime("%-d %b %Y")}
 Best date: {best_date_str}
 Best timing: {best_timing_str}
 
@@ -182,15 +299,27 @@ Joining:
 ---------------
 """
         # Add member list
-        for member in self.members:
-            text += (
+        members = self.members
+        parts = [header]
+        length = len(header)
+        summary_room = len(f"\n ...and {len(members)} more")
+        for shown, member in enumerate(members):
+            line = (
                 f"\n <b>{member.tele_username or member.display_name or 'Unknown'}</b>"
             )
+            # Keep room for the summary line unless this is the last member
+            reserve = summary_room if shown < len(members) - 1 else 0
+            if length + len(line) + reserve > limit:
+                parts.append(f"\n ...and {len(members) - shown} more")
+                break
+            parts.append(line)
+            length += len(line)
 
-        return text
+        return "".join(parts)
 
 
-@dataclass
+@_lazy_fields(id=UUID, joined_at=_timestamp)
+@dataclass(slots=True)
 class EventMember:
     """Represents the many-to-many relationship between events and users"""
 
@@ -208,7 +337,7 @@ class EventMember:
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for database operations"""
         return {
-            "id": str(self.id),
+            **_id_column(self.id),
             "event_id": str(self.event_id),
             "user_id": str(self.user_id),
             "joined_at": self.joined_at.isoformat() if self.joined_at else None,
@@ -217,19 +346,19 @@ class EventMember:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "EventMember":
         """Create EventMember instance from dictionary"""
-        return cls(
-            id=UUID(data["id"]) if data.get("id") else None,
-            event_id=UUID(data["event_id"]),
-            user_id=UUID(data["user_id"]),
-            joined_at=(
-                datetime.fromisoformat(data["joined_at"])
-                if data.get("joined_at")
-                else None
-            ),
+        return _hydrate(
+            cls,
+            {
+                "id": data.get("id") or None,
+                "event_id": _parse_uuid(data["event_id"]),
+                "user_id": _parse_uuid(data["user_id"]),
+                "joined_at": data.get("joined_at") or None,
+            },
         )
 
 
-@dataclass
+@_lazy_fields(id=UUID, created_at=_timestamp)
+@dataclass(slots=True)
 class UserAvailability:
     """Represents a user's availability for a specific time slot in an event"""
 
@@ -249,7 +378,7 @@ class UserAvailability:
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for database operations"""
         return {
-            "id": str(self.id),
+            **_id_column(self.id),
             "event_id": str(self.event_id),
             "user_id": str(self.user_id),
             "available_date": (
@@ -264,25 +393,16 @@ class UserAvailability:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "UserAvailability":
         """Create UserAvailability instance from dictionary"""
-        return cls(
-            id=UUID(data["id"]) if data.get("id") else None,
-            event_id=UUID(data["event_id"]),
-            user_id=UUID(data["user_id"]),
-            available_date=(
-                date.fromisoformat(data["available_date"])
-                if data.get("available_date")
-                else None
-            ),
-            available_time=(
-                time.fromisoformat(data["available_time"])
-                if data.get("available_time")
-                else None
-            ),
-            created_at=(
-                datetime.fromisoformat(data["created_at"])
-                if data.get("created_at")
-                else None
-            ),
+        return _hydrate(
+            cls,
+            {
+                "id": data.get("id") or None,
+                "event_id": _parse_uuid(data["event_id"]),
+                "user_id": _parse_uuid(data["user_id"]),
+                "available_date": _optional(_parse_date, data.get("available_date")),
+                "available_time": _optional(_parse_time, data.get("available_time")),
+                "created_at": data.get("created_at") or None,
+            },
         )
 
     @classmethod
@@ -307,7 +427,41 @@ class UserAvailability:
         )
 
 
-@dataclass
+class EventMembership:
+    """Immutable snapshot of an event's member ids in join order
+
+    Membership tests are O(1); ``with_member``/``without_member`` return a new
+    snapshot, so readers never see one half-updated.
+    """
+
+    __slots__ = ("event_id", "user_ids", "_index")
+
+    def __init__(self, event_id: UUID, user_ids: Iterable[Union[UUID, str]] = ()):
+        self.event_id = event_id
+        self.user_ids: Tuple[str, ...] = tuple(dict.fromkeys(map(str, user_ids)))
+        self._index = frozenset(self.user_ids)
+
+    def __contains__(self, user_id: Union[UUID, str]) -> bool:
+        return str(user_id) in self._index
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def with_member(self, user_id: Union[UUID, str]) -> "EventMembership":
+        if user_id in self:
+            return self
+        return EventMembership(self.event_id, self.user_ids + (str(user_id),))
+
+    def without_member(self, user_id: Union[UUID, str]) -> "EventMembership":
+        if user_id not in self:
+            return self
+        return EventMembership(
+            self.event_id, (uid for uid in self.user_ids if uid != str(user_id))
+        )
+
+
+@_lazy_fields(id=UUID, created_at=_timestamp)
+@dataclass(slots=True)
 class TelegramGroup:
     """Represents a Telegram group/chat where events can be shared"""
 
@@ -326,7 +480,7 @@ class TelegramGroup:
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for database operations"""
         return {
-            "id": str(self.id),
+            **_id_column(self.id),
             "group_id": self.group_id,
             "group_name": self.group_name,
             "group_type": self.group_type,
@@ -336,20 +490,20 @@ class TelegramGroup:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "TelegramGroup":
         """Create TelegramGroup instance from dictionary"""
-        return cls(
-            id=UUID(data["id"]) if data.get("id") else None,
-            group_id=data.get("group_id", ""),
-            group_name=data.get("group_name"),
-            group_type=data.get("group_type", "group"),
-            created_at=(
-                datetime.fromisoformat(data["created_at"])
-                if data.get("created_at")
-                else None
-            ),
+        return _hydrate(
+            cls,
+            {
+                "id": data.get("id") or None,
+                "group_id": data.get("group_id", ""),
+                "group_name": data.get("group_name"),
+                "group_type": data.get("group_type", "group"),
+                "created_at": data.get("created_at") or None,
+            },
         )
 
 
-@dataclass
+@_lazy_fields(id=UUID, shared_at=_timestamp)
+@dataclass(slots=True)
 class EventGroupShare:
     """Represents an event shared in a specific Telegram group"""
 
@@ -368,7 +522,7 @@ class EventGroupShare:
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for database operations"""
         return {
-            "id": str(self.id),
+            **_id_column(self.id),
             "event_id": str(self.event_id),
             "group_id": str(self.group_id),
             "inline_message_id": self.inline_message_id,
@@ -378,20 +532,19 @@ class EventGroupShare:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "EventGroupShare":
         """Create EventGroupShare instance from dictionary"""
-        return cls(
-            id=UUID(data["id"]) if data.get("id") else None,
-            event_id=UUID(data["event_id"]),
-            group_id=UUID(data["group_id"]),
-            inline_message_id=data.get("inline_message_id"),
-            shared_at=(
-                datetime.fromisoformat(data["shared_at"])
-                if data.get("shared_at")
-                else None
-            ),
+        return _hydrate(
+            cls,
+            {
+                "id": data.get("id") or None,
+                "event_id": _parse_uuid(data["event_id"]),
+                "group_id": _parse_uuid(data["group_id"]),
+                "inline_message_id": data.get("inline_message_id"),
+                "shared_at": data.get("shared_at") or None,
+            },
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class AvailabilitySlot:
     """Helper class for representing aggregated availability data"""
 
@@ -410,20 +563,74 @@ class AvailabilitySlot:
         }
 
 
+@dataclass(slots=True)
+class TimeWindow:
+    """Helper class for a contiguous block of slots on a single day"""
+
+    available_date: date
+    start_time: time
+    end_time: time
+    participant_count: int
+    available_user_ids: List[UUID] = field(default_factory=list)
+    available_users: List[User] = field(default_factory=list)
+
+    @property
+    def duration_minutes(self) -> int:
+        """Length of the window in minutes"""
+        end_minutes = (
+            24 * 60
+            if self.end_time == time.max
+            else self.end_time.hour * 60 + self.end_time.minute
+        )
+        return end_minutes - (self.start_time.hour * 60 + self.start_time.minute)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary"""
+        return {
+            "available_date": self.available_date.isoformat(),
+            "start_time": self.start_time.isoformat(),
+            "end_time": self.end_time.isoformat(),
+            "participant_count": self.participant_count,
+            "available_users": [user.tele_username for user in self.available_users],
+        }
+
+
 class AvailabilityCalculator:
     """Utility class for calculating best meeting times"""
 
     @staticmethod
     def find_best_times(
-        availability_slots: List[AvailabilitySlot], limit: int = 10
+        availability_slots: Iterable[AvailabilitySlot], limit: int = 10
     ) -> List[AvailabilitySlot]:
-        """Find the best meeting times based on participant count"""
-        # Sort by participant count (descending), then by date and time
-        sorted_slots = sorted(
+        """Find the best meeting times based on participant count
+
+        Slots are streamed through a heap bounded by ``limit`` rather than
+        sorted, so any iterable (e.g. Storage.iter_availability_summary) works
+        and only the winners are kept in memory.
+        """
+        if limit <= 0:
+            return []
+        # Most participants first, then earliest date and time
+        return heapq.nsmallest(
+            limit,
             availability_slots,
             key=lambda x: (-x.participant_count, x.available_date, x.available_time),
         )
-        return sorted_slots[:limit]
+
+    @staticmethod
+    def find_best_indices(
+        counts: Iterable[Tuple[int, int]], limit: int = 10
+    ) -> List[int]:
+        """Top ``limit`` slot indices from (slot index, participant count) pairs
+
+        The same ordering as find_best_times, for grids whose slot indices run
+        in date and time order: only the pairs go through the heap, so the
+        winners are the only slots that need materialising.
+        """
+        if limit <= 0:
+            return []
+        best = heapq.nsmallest(limit, counts, key=lambda pair: (-pair[1], pair[0]))
+        return [index for index, _ in best]
 
     @staticmethod
     def find_contiguous_slots(
@@ -432,37 +639,857 @@ class AvailabilityCalculator:
         """Find contiguous time slots with the same participants"""
         contiguous_groups = []
         current_group = []
+        current_ids = None
+        last_minutes = None
 
         for slot in sorted(
             availability_slots, key=lambda x: (x.available_date, x.available_time)
         ):
-            if not current_group:
-                current_group = [slot]
+            slot_ids = frozenset(user.id for user in slot.available_users)
+            slot_minutes = slot.available_time.hour * 60 + slot.available_time.minute
+            # Contiguous means same date, 30 minutes later and same participants
+            if (
+                current_group
+                and slot.available_date == current_group[-1].available_date
+                and slot_minutes == last_minutes + 30
+                and slot_ids == current_ids
+            ):
+                current_group.append(slot)
             else:
-                last_slot = current_group[-1]
-                # Check if this slot is contiguous (same date, 30 minutes later, same participants)
-                if (
-                    slot.available_date == last_slot.available_date
-                    and slot.available_time.hour * 60 + slot.available_time.minute
-                    == last_slot.available_time.hour * 60
-                    + last_slot.available_time.minute
-                    + 30
-                    and set(user.id for user in slot.available_users)
-                    == set(user.id for user in last_slot.available_users)
-                ):
-                    current_group.append(slot)
-                else:
-                    # Check if current group meets minimum duration
-                    if len(current_group) * 30 >= min_duration_minutes:
-                        contiguous_groups.append(current_group)
-                    current_group = [slot]
+                # Check if current group meets minimum duration
+                if len(current_group) * 30 >= min_duration_minutes:
+                    contiguous_groups.append(current_group)
+                current_group = [slot]
+                current_ids = slot_ids
+            last_minutes = slot_minutes
 
         # Don't forget the last group
-        if len(current_group) * 30 >= min_duration_minutes:
+        if current_group and len(current_group) * 30 >= min_duration_minutes:
             contiguous_groups.append(current_group)
 
         return contiguous_groups
 
+    @staticmethod
+    def find_best_windows(
+        grid: "AvailabilityGrid",
+        min_duration_minutes: int = 60,
+        min_attendance: int = 1,
+        top_k: int = 3,
+    ) -> List[TimeWindow]:
+        """Find the top-k contiguous windows per day, ordered by date then rank.
+
+        A member counts towards a window only if they are free for all of it.
+        Builds a throwaway WindowIndex; keep one (AvailabilityTally.window_index)
+        to answer several durations or day filters against the same grid.
+        """
+        return WindowIndex(grid).best_windows(
+            min_duration_minutes, min_attendance, top_k
+        )
+
+    @staticmethod
+    def best_window(
+        grid: "AvailabilityGrid",
+        min_duration_minutes: int = 60,
+        min_attendance: int = 1,
+    ) -> Optional[TimeWindow]:
+        """Best window across all days: most attendees, then longest, then earliest"""
+        windows = AvailabilityCalculator.find_best_windows(
+            grid, min_duration_minutes, min_attendance, top_k=1
+        )
+        if not windows:
+            return None
+        return min(
+            windows,
+            key=lambda w: (
+                -w.participant_count,
+                -w.duration_minutes,
+                w.available_date,
+                w.start_time,
+            ),
+        )
+
+
+SLOT_MINUTES = 30  # Granularity of the dragselector grid
+
+
+def _iter_bits(mask: int) -> Iterator[int]:
+    """Yield the positions of the set bits in mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class AvailabilityGrid:
+    """Bitset index of an event's availability over its date x time grid.
+
+    Every (date, time) cell maps to an integer slot index and every participant
+    to a bit position. ``slot_masks[i]`` holds the members free in slot ``i``
+    and ``user_masks[b]`` the slots member ``b`` is free in, so counts,
+    intersections and "who is free" are popcounts and bit scans.
+    """
+
+    def __init__(
+        self, start_date: date, end_date: date, slot_minutes: int = SLOT_MINUTES
+    ):
+        if end_date < start_date:
+            raise ValueError("end_date must not be before start_date")
+
+        self.start_date = start_date
+        self.end_date = end_date
+        self.slot_minutes = slot_minutes
+        self.slots_per_day = 24 * 60 // slot_minutes
+        self.num_days = (end_date - start_date).days + 1
+        self.num_slots = self.num_days * self.slots_per_day
+
+        self.slot_masks: List[int] = [0] * self.num_slots
+        self.user_masks: List[int] = []
+        self.user_ids: List[UUID] = []
+        self.users: Dict[UUID, User] = {}
+        self._user_bits: Dict[UUID, int] = {}
+        self._start_ordinal = start_date.toordinal()
+
+    # ---------- slot / member mapping ----------
+
+    def slot_index(self, available_date: date, available_time: time) -> Optional[int]:
+        """Map a date and time to its slot index, or None if outside the grid"""
+        day = available_date.toordinal() - self._start_ordinal
+        if day < 0 or day >= self.num_days:
+            return None
+        minutes = available_time.hour * 60 + available_time.minute
+        return day * self.slots_per_day + minutes // self.slot_minutes
+
+    def slot_datetime(self, index: int) -> Tuple[date, time]:
+        """Map a slot index back to its date and start time"""
+        day, slot = divmod(index, self.slots_per_day)
+        minutes = slot * self.slot_minutes
+        return (
+            date.fromordinal(self._start_ordinal + day),
+            time(minutes // 60, minutes % 60),
+        )
+
+    def user_bit(self, user_id: UUID) -> int:
+        """Return the bit position for a user, assigning one if needed"""
+        bit = self._user_bits.get(user_id)
+        if bit is None:
+            bit = len(self.user_ids)
+            self._user_bits[user_id] = bit
+            self.user_ids.append(user_id)
+            self.user_masks.append(0)
+        return bit
+
+    # ---------- building ----------
+
+    def add(self, user_id: UUID, index: int):
+        """Mark a user as available in the given slot"""
+        bit = self.user_bit(user_id)
+        self.slot_masks[index] |= 1 << bit
+        self.user_masks[bit] |= 1 << index
+
+    def remove(self, user_id: UUID, index: int):
+        """Mark a user as no longer available in the given slot"""
+        bit = self._user_bits.get(user_id)
+        if bit is None:
+            return
+        self.slot_masks[index] &= ~(1 << bit)
+        self.user_masks[bit] &= ~(1 << index)
+
+    def add_availability(
+        self, user_id: UUID, available_date: date, available_time: time
+    ) -> bool:
+        """Mark a user as available at a date and time; False if off-grid"""
+        index = self.slot_index(available_date, available_time)
+        if index is None:
+            return False
+        self.add(user_id, index)
+        return True
+
+    def add_compact(self, compact: "CompactAvailability") -> bool:
+        """Add a user's range-encoded availability; False if any slot is off-grid"""
+        if compact.slot_minutes != self.slot_minutes or not compact.start_date:
+            ok = True
+            for available_date, available_time in compact.slots():
+                ok = (
+                    self.add_availability(
+                        compact.user_id, available_date, available_time
+                    )
+                    and ok
+                )
+            return ok
+
+        # Same granularity, so ranges map onto the grid by a fixed offset
+        offset = (
+            compact.start_date.toordinal() - self._start_ordinal
+        ) * self.slots_per_day
+        bit = self.user_bit(compact.user_id)
+        ok = True
+        for start, end in iter_slot_ranges(compact.slot_ranges):
+            for index in range(
+                max(start + offset, 0), min(end + offset + 1, self.num_slots)
+            ):
+                self.slot_masks[index] |= 1 << bit
+                self.user_masks[bit] |= 1 << index
+            if start + offset < 0 or end + offset >= self.num_slots:
+                ok = False
+        return ok
+
+    def add_users(self, users: Iterable[User]):
+        """Register User records used when reporting who is free"""
+        for user in users:
+            self.users[user.id] = user
+
+    # ---------- queries ----------
+
+    def participant_count(self, index: int) -> int:
+        """Number of members free in a slot"""
+        return self.slot_masks[index].bit_count()
+
+    def counts(self) -> List[int]:
+        """Participant count for every slot, in slot order"""
+        return [mask.bit_count() for mask in self.slot_masks]
+
+    def available_user_ids(self, index: int) -> List[UUID]:
+        """IDs of the members free in a slot"""
+        return [self.user_ids[bit] for bit in _iter_bits(self.slot_masks[index])]
+
+    def available_users(self, index: int) -> List[User]:
+        """User records of the members free in a slot (registered users only)"""
+        return [
+            self.users[user_id]
+            for user_id in self.available_user_ids(index)
+            if user_id in self.users
+        ]
+
+    def user_slots(self, user_id: UUID) -> List[int]:
+        """Slot indices a user is free in"""
+        bit = self._user_bits.get(user_id)
+        if bit is None:
+            return []
+        return list(_iter_bits(self.user_masks[bit]))
+
+    def common_slots(self, user_ids: Iterable[UUID]) -> List[int]:
+        """Slot indices in which every given user is free"""
+        mask = -1
+        for user_id in user_ids:
+            bit = self._user_bits.get(user_id)
+            if bit is None:
+                return []
+            mask &= self.user_masks[bit]
+        if mask == -1:
+            return []
+        return list(_iter_bits(mask))
+
+    def iter_counts(self) -> Iterator[Tuple[int, int]]:
+        """(slot index, participant count) of every occupied slot, in order"""
+        return (
+            (index, mask.bit_count())
+            for index, mask in enumerate(self.slot_masks)
+            if mask
+        )
+
+    def best_slot_indices(self, limit: int = 10) -> List[int]:
+        """Indices of the most attended slots, earliest first on ties"""
+        return AvailabilityCalculator.find_best_indices(self.iter_counts(), limit)
+
+    def to_availability_slot(self, index: int) -> AvailabilitySlot:
+        """Materialise a slot as an AvailabilitySlot"""
+        available_date, available_time = self.slot_datetime(index)
+        return AvailabilitySlot(
+            available_date=available_date,
+            available_time=available_time,
+            participant_count=self.participant_count(index),
+            available_users=self.available_users(index),
+        )
+
+    def best_slots(self, limit: int = 10) -> List[AvailabilitySlot]:
+        """Best meeting slots, same ordering as AvailabilityCalculator.find_best_times"""
+        return [self.to_availability_slot(i) for i in self.best_slot_indices(limit)]
+
+    def occupied_indices(self) -> Iterator[int]:
+        """Indices of slots with at least one member free, in date and time order"""
+        return (index for index, mask in enumerate(self.slot_masks) if mask)
+
+    def iter_summary(self) -> Iterator[AvailabilitySlot]:
+        """Lazily materialise every slot with at least one member free"""
+        return (self.to_availability_slot(index) for index in self.occupied_indices())
+
+    def summary(self) -> List[AvailabilitySlot]:
+        """Every slot with at least one member free, in date and time order"""
+        return list(self.iter_summary())
+
+    def to_matrix(self) -> np.ndarray:
+        """Dense boolean (days x slots_per_day x users) availability matrix"""
+        if not self.user_masks:
+            return np.zeros((self.num_days, self.slots_per_day, 0), dtype=bool)
+        nbytes = (self.num_slots + 7) // 8
+        packed = np.frombuffer(
+            b"".join(mask.to_bytes(nbytes, "little") for mask in self.user_masks),
+            dtype=np.uint8,
+        ).reshape(len(self.user_masks), nbytes)
+        bits = np.unpackbits(packed, axis=1, bitorder="little")[:, : self.num_slots]
+        return bits.T.reshape(
+            self.num_days, self.slots_per_day, len(self.user_masks)
+        ).astype(bool)
+
+    def to_time_window(
+        self, day: int, start: int, end: int, attendee_bits: Iterable[int]
+    ) -> TimeWindow:
+        """Materialise slots [start, end) of a day attended by the given members"""
+        available_date, start_time = self.slot_datetime(
+            day * self.slots_per_day + start
+        )
+        end_minutes = end * self.slot_minutes
+        end_time = (
+            time.max  # window runs to the end of the day
+            if end_minutes >= 24 * 60
+            else time(end_minutes // 60, end_minutes % 60)
+        )
+        user_ids = [self.user_ids[bit] for bit in attendee_bits]
+        return TimeWindow(
+            available_date=available_date,
+            start_time=start_time,
+            end_time=end_time,
+            participant_count=len(user_ids),
+            available_user_ids=user_ids,
+            available_users=[self.users[u] for u in user_ids if u in self.users],
+        )
+
+    # ---------- constructors ----------
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Dict[str, Any]],
+        users: Iterable[User] = (),
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Optional["AvailabilityGrid"]:
+        """Build a grid from raw ``user_availability`` rows.
+
+        Only ``user_id``, ``available_date`` and ``available_time`` are read.
+        Dates, times and IDs are parsed once per distinct value. Without an
+        explicit range the grid spans the dates present in the rows; returns
+        None when there is nothing to index.
+        """
+        dates: Dict[str, date] = {}
+        times: Dict[str, time] = {}
+        user_ids: Dict[str, UUID] = {}
+        parsed = []
+        for row in rows:
+            date_str = row["available_date"]
+            available_date = dates.get(date_str)
+            if available_date is None:
+                available_date = dates[date_str] = date.fromisoformat(date_str)
+            time_str = row["available_time"]
+            available_time = times.get(time_str)
+            if available_time is None:
+                available_time = times[time_str] = time.fromisoformat(time_str)
+            user_str = str(row["user_id"])
+            user_id = user_ids.get(user_str)
+            if user_id is None:
+                user_id = user_ids[user_str] = UUID(user_str)
+            parsed.append((user_id, available_date, available_time))
+
+        if start_date is None or end_date is None:
+            if not dates:
+                return None
+            start_date = start_date or min(dates.values())
+            end_date = end_date or max(dates.values())
+
+        grid = cls(start_date, end_date)
+        grid.add_users(users)
+        for user_id, available_date, available_time in parsed:
+            grid.add_availability(user_id, available_date, available_time)
+        return grid
+
+    @classmethod
+    def from_compact(
+        cls,
+        compact: Iterable["CompactAvailability"],
+        users: Iterable[User] = (),
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Optional["AvailabilityGrid"]:
+        """Build a grid from range-encoded rows, without expanding them to records"""
+        compact = [c for c in compact if c.start_date and c.slot_ranges]
+        if start_date is None or end_date is None:
+            first = last = None
+            for c in compact:
+                # Ranges are sorted, so the first and last bound the dates
+                ranges = list(iter_slot_ranges(c.slot_ranges))
+                low = c.start_date.toordinal() + ranges[0][0] // c.slots_per_day
+                high = c.start_date.toordinal() + ranges[-1][1] // c.slots_per_day
+                first = low if first is None else min(first, low)
+                last = high if last is None else max(last, high)
+            if first is None:
+                return None
+            start_date = start_date or date.fromordinal(first)
+            end_date = end_date or date.fromordinal(last)
+
+        grid = cls(start_date, end_date)
+        grid.add_users(users)
+        for c in compact:
+            grid.add_compact(c)
+        return grid
+
+    @classmethod
+    def from_availability(
+        cls,
+        availability: Iterable["UserAvailability"],
+        users: Iterable[User] = (),
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Optional["AvailabilityGrid"]:
+        """Build a grid from UserAvailability records (e.g. Event.availability_data)"""
+        availability = [
+            av for av in availability if av.available_date and av.available_time
+        ]
+        if start_date is None or end_date is None:
+            if not availability:
+                return None
+            start_date = start_date or min(av.available_date for av in availability)
+            end_date = end_date or max(av.available_date for av in availability)
+
+        grid = cls(start_date, end_date)
+        grid.add_users(users)
+        for av in availability:
+            grid.add_availability(av.user_id, av.available_date, av.available_time)
+        return grid
+
+
+class AvailabilityTally:
+    """Incrementally maintained slot counts for one event.
+
+    Wraps an AvailabilityGrid and keeps every slot's participant count plus a
+    count -> slots index, so a resubmission costs O(changed slots) and the
+    best slots are read from the highest non-empty count level.
+    """
+
+    def __init__(self, grid: AvailabilityGrid):
+        self.grid = grid
+        self.counts = grid.counts()
+        self.levels: Dict[int, Set[int]] = defaultdict(set)
+        for index, count in enumerate(self.counts):
+            if count:
+                self.levels[count].add(index)
+        self.max_count = max(self.counts, default=0)
+        self._window_index: Optional[WindowIndex] = None
+
+    def _move(self, index: int, delta: int):
+        count = self.counts[index]
+        if count:
+            self.levels[count].discard(index)
+        count += delta
+        self.counts[index] = count
+        if count:
+            self.levels[count].add(index)
+        if count > self.max_count:
+            self.max_count = count
+        while self.max_count and not self.levels[self.max_count]:
+            self.max_count -= 1
+
+    def apply(self, user_id: UUID, added: Iterable[int], removed: Iterable[int]):
+        """Apply a +1/-1 delta for one user's added and removed slots"""
+        self._window_index = None
+        for index in added:
+            self.grid.add(user_id, index)
+            self._move(index, 1)
+        for index in removed:
+            self.grid.remove(user_id, index)
+            self._move(index, -1)
+
+    def set_user_availability(
+        self, user_id: UUID, slots: Iterable[Tuple[date, time]]
+    ) -> bool:
+        """Replace a user's slots, applying only the difference.
+
+        Returns False (leaving the tally untouched) if a slot falls outside the
+        grid, in which case the caller should rebuild from scratch.
+        """
+        new_slots = set()
+        for available_date, available_time in slots:
+            index = self.grid.slot_index(available_date, available_time)
+            if index is None:
+                return False
+            new_slots.add(index)
+        old_slots = set(self.grid.user_slots(user_id))
+        self.apply(user_id, new_slots - old_slots, old_slots - new_slots)
+        return True
+
+    def window_index(self) -> "WindowIndex":
+        """Prefix-sum index over the grid, rebuilt after the next change"""
+        if self._window_index is None:
+            self._window_index = WindowIndex(self.grid)
+        return self._window_index
+
+    def best_slot_indices(self, limit: int = 10) -> List[int]:
+        """Indices of the most attended slots, earliest first on ties"""
+        indices = []
+        for count in range(self.max_count, 0, -1):
+            if len(indices) >= limit:
+                break
+            level = self.levels.get(count)
+            if level:
+                indices.extend(heapq.nsmallest(limit - len(indices), level))
+        return indices
+
+    def best_window(self) -> Optional[TimeWindow]:
+        """Best single-slot-minimum window, matching AvailabilityCalculator.best_window.
+
+        Takes the earliest top-count slot of each day and extends it while its
+        attendees stay free, using mask checks instead of the dense matrix.
+        """
+        grid = self.grid
+        candidates = {}
+        for index in self.levels.get(self.max_count, ()):
+            day = index // grid.slots_per_day
+            if day not in candidates or index < candidates[day]:
+                candidates[day] = index
+
+        best = None
+        for day, index in candidates.items():
+            attendees = grid.slot_masks[index]
+            end = index + 1
+            day_end = (day + 1) * grid.slots_per_day
+            while end < day_end and grid.slot_masks[end] & attendees == attendees:
+                end += 1
+            key = (-(end - index), index)
+            if best is None or key < best[0]:
+                best = (key, day, index, end, attendees)
+
+        if best is None:
+            return None
+        _, day, index, end, attendees = best
+        offset = day * grid.slots_per_day
+        return grid.to_time_window(
+            day,
+            index - offset,
+            end - offset,
+            _iter_bits(attendees),
+        )
+
+
+class WindowIndex:
+    """Per-member prefix sums of an AvailabilityGrid, for window queries.
+
+    ``cumulative[d, s, u]`` is how many of the first ``s`` slots of day ``d``
+    member ``u`` is free for, so whether they are free for a whole window is
+    one subtraction. Building is O(grid); each query is then a vectorised
+    pass over the selected days, for any duration, weekday or time-of-day
+    filter. The index is a snapshot: rebuild it after the grid changes.
+    """
+
+    def __init__(self, grid: AvailabilityGrid):
+        self.grid = grid
+        self.matrix = grid.to_matrix()
+        # A member is free for at most slots_per_day slots a day
+        self.cumulative = np.zeros(
+            (grid.num_days, grid.slots_per_day + 1, len(grid.user_ids)),
+            dtype=np.int16,
+        )
+        np.cumsum(self.matrix, axis=1, out=self.cumulative[:, 1:])
+        # Weekday of each grid day, Monday is 0
+        self.weekdays = (grid.start_date.weekday() + np.arange(grid.num_days)) % 7
+
+    def _slot_bounds(
+        self, start_time: Optional[time], end_time: Optional[time]
+    ) -> Tuple[int, int]:
+        """Slot range [lo, hi) of a day covered by the time-of-day filter"""
+        slot_minutes = self.grid.slot_minutes
+        lo = 0
+        if start_time:
+            lo = -(-(start_time.hour * 60 + start_time.minute) // slot_minutes)
+        hi = self.grid.slots_per_day
+        if end_time and end_time != time.max:
+            hi = min(hi, (end_time.hour * 60 + end_time.minute) // slot_minutes)
+        return lo, hi
+
+    def best_windows(
+        self,
+        min_duration_minutes: int = 60,
+        min_attendance: int = 1,
+        top_k: int = 3,
+        weekdays: Optional[Iterable[int]] = None,
+        start_time: Optional[time] = None,
+        end_time: Optional[time] = None,
+    ) -> List[TimeWindow]:
+        """Top-k contiguous windows per day, ordered by date then rank.
+
+        Only days whose weekday (Monday is 0) is in ``weekdays`` and slots
+        between ``start_time`` and ``end_time`` are considered. Each chosen
+        window is extended while all of its attendees stay free, up to
+        ``end_time``, and windows on the same day never overlap.
+        """
+        grid = self.grid
+        lo, hi = self._slot_bounds(start_time, end_time)
+        width = max(1, -(-min_duration_minutes // grid.slot_minutes))
+        if width > hi - lo or not grid.user_ids or top_k <= 0:
+            return []
+
+        days = np.arange(grid.num_days)
+        if weekdays is not None:
+            days = days[np.isin(self.weekdays, list(weekdays))]
+        if not len(days):
+            return []
+
+        cumulative = self.cumulative[days, lo : hi + 1]
+        # full[i, s, u]: member u is free for [lo + s, lo + s + width) on days[i]
+        full = (cumulative[:, width:] - cumulative[:, :-width]) == width
+        attendance = full.sum(axis=2)
+
+        windows = []
+        min_attendance = max(1, min_attendance)
+        for row in np.flatnonzero(attendance.max(axis=1) >= min_attendance):
+            day = int(days[row])
+            day_attendance = attendance[row]
+            taken = np.zeros(hi - lo, dtype=bool)
+            found = 0
+            for start in np.argsort(-day_attendance, kind="stable"):
+                count = int(day_attendance[start])
+                if count < min_attendance or found >= top_k:
+                    break
+                if taken[start : start + width].any():
+                    continue
+                attendees = full[row, start]
+                end = start + width
+                while (
+                    end < hi - lo
+                    and not taken[end]
+                    and self.matrix[day, lo + end, attendees].all()
+                ):
+                    end += 1
+                taken[start:end] = True
+                windows.append(
+                    grid.to_time_window(
+                        day, int(lo + start), int(lo + end), np.flatnonzero(attendees)
+                    )
+                )
+                found += 1
+
+        return windows
+
+    def best_window(
+        self,
+        min_duration_minutes: int = 60,
+        min_attendance: int = 1,
+        weekdays: Optional[Iterable[int]] = None,
+        start_time: Optional[time] = None,
+        end_time: Optional[time] = None,
+    ) -> Optional[TimeWindow]:
+        """Best window across the selected days, ranked like
+        AvailabilityCalculator.best_window"""
+        windows = self.best_windows(
+            min_duration_minutes, min_attendance, 1, weekdays, start_time, end_time
+        )
+        if not windows:
+            return None
+        return min(
+            windows,
+            key=lambda w: (
+                -w.participant_count,
+                -w.duration_minutes,
+                w.available_date,
+                w.start_time,
+            ),
+        )
+
+
+def parse_webapp_slots(
+    date_times: Iterable[Dict[str, str]],
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> List[Tuple[date, time]]:
+    """Parse a dragselector ``dateTimes`` payload in one pass.
+
+    Each distinct date and time string is parsed once. Slots outside
+    start_date..end_date are dropped, duplicates are removed and the result is
+    sorted by date and time. Raises ValueError on a malformed entry.
+    """
+    dates: Dict[str, Optional[date]] = {}
+    times: Dict[str, time] = {}
+    slots = set()
+    for datetime_data in date_times:
+        date_str = datetime_data["date"]
+        available_date = dates.get(date_str, False)
+        if available_date is False:
+            # '20/07/2025', day first
+            day, month, year = date_str.split("/")
+            available_date = date(int(year), int(month), int(day))
+            if (start_date and available_date < start_date) or (
+                end_date and available_date > end_date
+            ):
+                available_date = None
+            dates[date_str] = available_date
+        if available_date is None:
+            continue
+
+        time_str = datetime_data["time"]
+        available_time = times.get(time_str)
+        if available_time is None:
+            available_time = times[time_str] = parse_time_string(time_str)
+        slots.add((available_date, available_time))
+    return sorted(slots)
+
+
+def availability_rows(
+    event_id: UUID, user_id: UUID, slots: Iterable[Tuple[date, time]]
+) -> List[Dict[str, Any]]:
+    """Insert-ready ``user_availability`` dicts, same shape as UserAvailability.to_dict"""
+    event_str = str(event_id)
+    user_str = str(user_id)
+    created_at = datetime.now().isoformat()
+    return [
+        {
+            "id": str(uuid4()),
+            "event_id": event_str,
+            "user_id": user_str,
+            "available_date": available_date.isoformat(),
+            "available_time": available_time.isoformat(),
+            "created_at": created_at,
+        }
+        for available_date, available_time in slots
+    ]
+
+
+def encode_slot_ranges(indices: Iterable[int]) -> str:
+    """Run-length encode slot indices as inclusive ranges, e.g. "0-3,8,10-11" """
+    parts = []
+    start = prev = None
+    for index in sorted(set(indices)):
+        if prev is not None and index == prev + 1:
+            prev = index
+            continue
+        if start is not None:
+            parts.append(str(start) if start == prev else f"{start}-{prev}")
+        start = prev = index
+    if start is not None:
+        parts.append(str(start) if start == prev else f"{start}-{prev}")
+    return ",".join(parts)
+
+
+def iter_slot_ranges(encoded: str) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) inclusive ranges from an encode_slot_ranges string"""
+    if not encoded:
+        return
+    for part in encoded.split(","):
+        start, _, end = part.partition("-")
+        yield int(start), int(end or start)
+
+
+def decode_slot_ranges(encoded: str) -> List[int]:
+    """Slot indices from an encode_slot_ranges string"""
+    return [
+        index
+        for start, end in iter_slot_ranges(encoded)
+        for index in range(start, end + 1)
+    ]
+
+
+@dataclass(slots=True)
+class CompactAvailability:
+    """All of one user's availability for an event, stored as a single row.
+
+    Slots are indices on a grid that starts at midnight of ``start_date`` with
+    ``slot_minutes`` granularity, run-length encoded in ``slot_ranges``.
+    """
+
+    event_id: UUID = None
+    user_id: UUID = None
+    start_date: date = None
+    slot_minutes: int = SLOT_MINUTES
+    slot_ranges: str = ""
+    updated_at: Optional[datetime] = None
+
+    def __post_init__(self):
+        if self.updated_at is None:
+            self.updated_at = datetime.now()
+
+    @property
+    def slots_per_day(self) -> int:
+        return 24 * 60 // self.slot_minutes
+
+    def slot_indices(self) -> List[int]:
+        """Slot indices relative to start_date"""
+        return decode_slot_ranges(self.slot_ranges)
+
+    def slots(self) -> List[Tuple[date, time]]:
+        """(date, time) pairs the user is available in"""
+        origin = self.start_date.toordinal()
+        result = []
+        for index in self.slot_indices():
+            day, slot = divmod(index, self.slots_per_day)
+            minutes = slot * self.slot_minutes
+            result.append(
+                (date.fromordinal(origin + day), time(minutes // 60, minutes % 60))
+            )
+        return result
+
+    def to_user_availability(self) -> List["UserAvailability"]:
+        """Expand into per-slot UserAvailability records"""
+        return [
+            UserAvailability(
+                event_id=self.event_id,
+                user_id=self.user_id,
+                available_date=available_date,
+                available_time=available_time,
+                created_at=self.updated_at,
+            )
+            for available_date, available_time in self.slots()
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for database operations"""
+        return {
+            "event_id": str(self.event_id),
+            "user_id": str(self.user_id),
+            "start_date": self.start_date.isoformat() if self.start_date else None,
+            "slot_minutes": self.slot_minutes,
+            "slot_ranges": self.slot_ranges,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompactAvailability":
+        """Create CompactAvailability instance from dictionary"""
+        return cls(
+            event_id=_parse_uuid(data["event_id"]),
+            user_id=_parse_uuid(data["user_id"]),
+            start_date=_optional(_parse_date, data.get("start_date")),
+            slot_minutes=data.get("slot_minutes") or SLOT_MINUTES,
+            slot_ranges=data.get("slot_ranges") or "",
+            updated_at=_optional(_timestamp, data.get("updated_at")),
+        )
+
+    @classmethod
+    def from_slots(
+        cls,
+        event_id: UUID,
+        user_id: UUID,
+        slots: Iterable[Tuple[date, time]],
+        start_date: Optional[date] = None,
+        slot_minutes: int = SLOT_MINUTES,
+    ) -> "CompactAvailability":
+        """Encode (date, time) slots; the grid starts at start_date or the first slot"""
+        slots = list(slots)
+        if start_date is None:
+            start_date = min((d for d, _ in slots), default=date.today())
+        origin = start_date.toordinal()
+        slots_per_day = 24 * 60 // slot_minutes
+        indices = []
+        for available_date, available_time in slots:
+            day = available_date.toordinal() - origin
+            if day < 0:
+                raise ValueError(f"{available_date} is before {start_date}")
+            minutes = available_time.hour * 60 + available_time.minute
+            indices.append(day * slots_per_day + minutes // slot_minutes)
+        return cls(
+            event_id=event_id,
+            user_id=user_id,
+            start_date=start_date,
+            slot_minutes=slot_minutes,
+            slot_ranges=encode_slot_ranges(indices),
+        )
+
 
 # Helper functions for data transformation
 def parse_time_string(time_str: str) -> time:
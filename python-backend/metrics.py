@@ -0,0 +1,318 @@
+import functools
+import inspect
+import threading
+import time
+import types
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from icecream import ic
+
+# Latency buckets in seconds, from a cache hit up to a stuck PostgREST call
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in values
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels: str, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((labels, list(row)) for labels, row in self._values.items())
+        lines = []
+        for labels, row in values:
+            cumulative = 0
+            bounds = [str(b) for b in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                label_text = _format_labels(self.labelnames, labels, le=bound)
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {row[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds the metrics and stats callbacks rendered by /metrics"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._stats: List[Tuple[str, str, Callable[[], Dict[str, Any]]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix: str, help: str, collect: Callable[[], Dict]):
+        """Expose each numeric value of a stats() dict as a gauge"""
+        with self._lock:
+            self._stats.append((prefix, help, collect))
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+            stats = list(self._stats)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for prefix, help, collect in stats:
+            try:
+                values = collect()
+            except Exception as e:
+                ic(f"Error collecting {prefix} stats: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# HELP {name} {help}: {key}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS = REGISTRY.register(
+    Histogram(
+        "meetwhenah_handler_duration_seconds",
+        "Time spent in a bot handler",
+        ["handler"],
+    )
+)
+HANDLER_ERRORS = REGISTRY.register(
+    Counter("meetwhenah_handler_errors_total", "Bot handlers that raised", ["handler"])
+)
+STORAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "meetwhenah_storage_duration_seconds",
+        "Time spent in a storage method, including nested storage calls",
+        ["method"],
+    )
+)
+STORAGE_ERRORS = REGISTRY.register(
+    Counter(
+        "meetwhenah_storage_errors_total", "Storage methods that raised", ["method"]
+    )
+)
+TELEGRAM_SECONDS = REGISTRY.register(
+    Histogram(
+        "meetwhenah_telegram_api_duration_seconds",
+        "Time spent in a Telegram Bot API request",
+        ["method"],
+    )
+)
+TELEGRAM_ERRORS = REGISTRY.register(
+    Counter(
+        "meetwhenah_telegram_api_errors_total",
+        "Telegram Bot API requests that failed",
+        ["method"],
+    )
+)
+UPDATE_QUERIES = REGISTRY.register(
+    Histogram(
+        "meetwhenah_update_queries",
+        "Storage round trips made while handling one update",
+        ["kind"],
+        buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55),
+    )
+)
+
+
+@contextmanager
+def track(histogram: Histogram, errors: Counter, label: str):
+    """Record the latency of the block, counting it as an error if it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        errors.inc(label)
+        raise
+    finally:
+        histogram.observe(label, value=time.perf_counter() - started)
+
+
+def timed(histogram: Histogram, errors: Counter, label: str, function):
+    """Wrap a sync or async function to record its latency and failures
+
+    For a generator function the time runs until the generator is exhausted
+    or closed, not just until it is created.
+    """
+    if inspect.isgeneratorfunction(function):
+
+        @functools.wraps(function)
+        def timed_generator(*args, **kwargs):
+            with track(histogram, errors, label):
+                return (yield from function(*args, **kwargs))
+
+        return timed_generator
+
+    if inspect.iscoroutinefunction(function):
+
+        @functools.wraps(function)
+        async def timed_async(*args, **kwargs):
+            with track(histogram, errors, label):
+                return await function(*args, **kwargs)
+
+        return timed_async
+
+    @functools.wraps(function)
+    def timed_sync(*args, **kwargs):
+        with track(histogram, errors, label):
+            return function(*args, **kwargs)
+
+    return timed_sync
+
+
+def instrument_bot(bot):
+    """Time every handler registered on a TeleBot or AsyncTeleBot so far"""
+    for handlers in (
+        bot.message_handlers,
+        bot.inline_handlers,
+        bot.callback_query_handlers,
+    ):
+        for handler in handlers:
+            function = handler["function"]
+            handler["function"] = timed(
+                HANDLER_SECONDS, HANDLER_ERRORS, function.__name__, function
+            )
+
+
+def instrument_storage(storage):
+    """Time every public method of a Storage instance
+
+    The wrappers are set on the instance, so AsyncStorage (which looks methods
+    up on the wrapped backend per call) is covered as well. A @contextmanager
+    method (unit_of_work) is timed over the whole block it manages.
+    """
+    for name in dir(type(storage)):
+        if name.startswith("_"):
+            continue
+        method = getattr(storage, name)
+        if not callable(method):
+            continue
+        generator = getattr(method, "__wrapped__", None)
+        if inspect.isgeneratorfunction(generator):
+            generator = types.MethodType(generator, storage)
+            wrapped = contextmanager(
+                timed(STORAGE_SECONDS, STORAGE_ERRORS, name, generator)
+            )
+        else:
+            wrapped = timed(STORAGE_SECONDS, STORAGE_ERRORS, name, method)
+        setattr(storage, name, wrapped)
+    return storage
+
+
+_telegram_instrumented = False
+
+
+def instrument_telegram_api():
+    """Time every Bot API request made by TeleBot and AsyncTeleBot
+
+    Wraps the request functions in telebot's apihelper and asyncio_helper,
+    which every API method (and a CUSTOM_REQUEST_SENDER) goes through.
+    """
+    global _telegram_instrumented
+    if _telegram_instrumented:
+        return
+    _telegram_instrumented = True
+
+    from telebot import apihelper, asyncio_helper
+
+    make_request = apihelper._make_request
+    process_request = asyncio_helper._process_request
+
+    @functools.wraps(make_request)
+    def timed_make_request(token, method_name, *args, **kwargs):
+        with track(TELEGRAM_SECONDS, TELEGRAM_ERRORS, method_name):
+            return make_request(token, method_name, *args, **kwargs)
+
+    @functools.wraps(process_request)
+    async def timed_process_request(token, url, *args, **kwargs):
+        with track(TELEGRAM_SECONDS, TELEGRAM_ERRORS, url.rsplit("/", 1)[-1]):
+            return await process_request(token, url, *args, **kwargs)
+
+    apihelper._make_request = timed_make_request
+    asyncio_helper._process_request = timed_process_request
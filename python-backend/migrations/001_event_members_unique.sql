@@ -0,0 +1,21 @@
+-- One event_members row per (event, user), so repeated join clicks can be
+-- upserts with on_conflict=event_id,user_id (see SupabaseDB._upsert_member).
+
+-- Keep the earliest row of any duplicated membership (rows without a
+-- joined_at sort last, so every duplicate has exactly one survivor)
+delete from event_members
+where id in (
+    select id
+    from (
+        select id,
+               row_number() over (
+                   partition by event_id, user_id
+                   order by joined_at nulls last, id
+               ) as position
+        from event_members
+    ) ranked
+    where position > 1
+);
+
+alter table event_members
+    add constraint event_members_event_user unique (event_id, user_id);
@@ -0,0 +1,48 @@
+-- Replace one user's availability rows for an event in a single atomic call
+-- (see SupabaseDB._replace_availability_rows).
+
+-- Keep the earliest row of any duplicated slot
+delete from user_availability a
+using user_availability b
+where a.event_id = b.event_id
+  and a.user_id = b.user_id
+  and a.available_date = b.available_date
+  and a.available_time = b.available_time
+  and a.id::text > b.id::text;
+
+alter table user_availability
+    add constraint user_availability_slot
+    unique (event_id, user_id, available_date, available_time);
+
+-- p_slots: [{"available_date": "2025-07-01", "available_time": "09:30:00"}, ...]
+create or replace function replace_user_availability(
+    p_event_id uuid,
+    p_user_id uuid,
+    p_slots jsonb
+) returns setof user_availability
+language plpgsql
+as $$
+begin
+    -- Saves by the same user for the same event run one after the other
+    perform pg_advisory_xact_lock(hashtext(p_event_id::text || p_user_id::text));
+
+    delete from user_availability ua
+    where ua.event_id = p_event_id
+      and ua.user_id = p_user_id
+      and (ua.available_date, ua.available_time) not in (
+          select (s ->> 'available_date')::date, (s ->> 'available_time')::time
+          from jsonb_array_elements(p_slots) s
+      );
+
+    insert into user_availability
+        (id, event_id, user_id, available_date, available_time, created_at)
+    select gen_random_uuid(), p_event_id, p_user_id,
+           (s ->> 'available_date')::date, (s ->> 'available_time')::time, now()
+    from jsonb_array_elements(p_slots) s
+    on conflict (event_id, user_id, available_date, available_time) do nothing;
+
+    return query
+        select * from user_availability
+        where event_id = p_event_id and user_id = p_user_id;
+end
+$$;
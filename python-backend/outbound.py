@@ -0,0 +1,369 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from icecream import ic
+
+from cache import TTLCache
+
+# Telegram allows about 30 messages/s overall and about 1/s into a single chat
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out reservations instead of blocking
+
+    ``reserve`` always takes a token, possibly borrowed from the future, and
+    returns how long the caller must wait before using it. That lets the same
+    bucket serve both ``time.sleep`` and ``asyncio.sleep`` callers.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token; returns the seconds to wait before it may be used"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds: float):
+        """Hold back every reservation for the given time (e.g. after a 429)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds Telegram asked us to back off for, if the error is a 429"""
+    if getattr(error, "error_code", None) != 429:
+        return None
+    parameters = (getattr(error, "result_json", None) or {}).get("parameters") or {}
+    return float(parameters.get("retry_after", 1))
+
+
+class _OutboundBase:
+    """Rate limiting and edit bookkeeping shared by the sync and async senders"""
+
+    def __init__(
+        self,
+        bot,
+        global_rate: float = OUTBOUND_GLOBAL_RATE,
+        chat_rate: float = OUTBOUND_CHAT_RATE,
+        chat_burst: float = OUTBOUND_CHAT_BURST,
+        max_retries: int = OUTBOUND_MAX_RETRIES,
+    ):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate)
+        self._chats = TTLCache(maxsize=10000, ttl=600)
+        # Edit key -> latest payload waiting to be sent, or None while in flight
+        self._edits: Dict[Hashable, Optional[Dict[str, Any]]] = {}
+        # Edit key -> fingerprint of the text and markup the message now shows
+        self._shown = TTLCache(maxsize=10000, ttl=600)
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.unchanged = 0
+
+    def _chat_bucket(self, chat_key: Hashable) -> TokenBucket:
+        with self._lock:
+            bucket = self._chats.get(chat_key)
+            if bucket is None:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+                self._chats.set(chat_key, bucket)
+            return bucket
+
+    def _reserve(self, chat_key: Hashable) -> float:
+        return max(self._global.reserve(), self._chat_bucket(chat_key).reserve())
+
+    def _throttled(self, chat_key: Hashable, error: Exception, attempt: int):
+        """Back-off for a retryable error, or None if it should be raised"""
+        delay = retry_after(error)
+        if delay is None or attempt >= self.max_retries:
+            return None
+        with self._lock:
+            self.throttled += 1
+        ic(f"Telegram asked us to retry after {delay}s")
+        self._chat_bucket(chat_key).pause(delay)
+        return delay
+
+    def _begin_edit(self, key: Hashable, payload: Dict[str, Any]) -> bool:
+        """Register an edit; False if an in-flight sender will deliver it"""
+        with self._lock:
+            if key in self._edits:
+                # Only the newest text matters; replace whatever was waiting
+                if self._edits[key] is not None:
+                    self.coalesced += 1
+                self._edits[key] = payload
+                return False
+            self._edits[key] = payload
+            return True
+
+    def _next_edit(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Latest payload to send for key, or None once nothing is waiting"""
+        with self._lock:
+            payload = self._edits.get(key)
+            if payload is None:
+                self._edits.pop(key, None)
+                return None
+            self._edits[key] = None
+            return payload
+
+    def _abandon_edit(self, key: Hashable):
+        with self._lock:
+            self._edits.pop(key, None)
+
+    @staticmethod
+    def _fingerprint(payload: Dict[str, Any]) -> Tuple:
+        markup = payload.get("reply_markup")
+        if markup is not None and hasattr(markup, "to_json"):
+            markup = markup.to_json()
+        return (payload.get("text"), payload.get("parse_mode"), markup)
+
+    def _unchanged(self, key: Hashable, payload: Dict[str, Any]) -> bool:
+        """Whether the message already shows this text and markup"""
+        if self._shown.get(key) != self._fingerprint(payload):
+            return False
+        with self._lock:
+            self.unchanged += 1
+        return True
+
+    def _edit_done(self, key: Hashable, payload: Dict[str, Any]):
+        self._shown.set(key, self._fingerprint(payload))
+
+    def _not_modified(self, error: Exception) -> bool:
+        """Telegram's answer to an edit that would not change the message"""
+        description = str(getattr(error, "description", None) or error)
+        if "message is not modified" not in description:
+            return False
+        with self._lock:
+            self.unchanged += 1
+        return True
+
+    @staticmethod
+    def _edit_key(chat_id, message_id, inline_message_id) -> Hashable:
+        if inline_message_id:
+            return ("inline", inline_message_id)
+        return ("chat", chat_id, message_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for sent, coalesced and throttled calls"""
+        with self._lock:
+            return {
+                "sent": self.sent,
+                "coalesced": self.coalesced,
+                "throttled": self.throttled,
+                "unchanged": self.unchanged,
+                "pending_edits": len(self._edits),
+            }
+
+
+class OutboundSender(_OutboundBase):
+    """Rate-limited wrapper around TeleBot's send_message and edit_message_text
+
+    send_message blocks the calling thread until the global and per-chat
+    buckets allow it. edit_message_text never waits: it hands the edit to a
+    flusher thread that keeps only the newest payload per message and sends
+    it once the buckets allow. The webhook worker (and the event's dispatch
+    key) is released at once, so a burst of edits to one message collapses
+    into about one send per token.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (send at, sequence, edit key) for every key waiting in self._edits
+        self._due = []
+        self._sequence = itertools.count()
+        self._attempts: Dict[Hashable, int] = {}
+        self._in_flight = 0
+        self._wake = threading.Condition(self._lock)
+        self._flusher: Optional[threading.Thread] = None
+
+    def _call(self, chat_key: Hashable, method, **kwargs):
+        attempt = 0
+        while True:
+            time.sleep(self._reserve(chat_key))
+            try:
+                result = method(**kwargs)
+                with self._lock:
+                    self.sent += 1
+                return result
+            except Exception as e:
+                delay = self._throttled(chat_key, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self._call(
+            chat_id, self.bot.send_message, chat_id=chat_id, text=text, **kwargs
+        )
+
+    def edit_message_text(
+        self, text, chat_id=None, message_id=None, inline_message_id=None, **kwargs
+    ):
+        """Queue an edit of a message and return at once
+
+        A newer edit of the same message replaces one still waiting; edits
+        that would not change the message are dropped.
+        """
+        key = self._edit_key(chat_id, message_id, inline_message_id)
+        payload = dict(
+            text=text,
+            chat_id=chat_id,
+            message_id=message_id,
+            inline_message_id=inline_message_id,
+            **kwargs,
+        )
+        if self._unchanged(key, payload) or not self._begin_edit(key, payload):
+            return None
+        # The token is taken now, so the send time is known up front
+        self._schedule(key, self._reserve(key))
+        return None
+
+    def _schedule(self, key: Hashable, delay: float):
+        with self._wake:
+            heapq.heappush(
+                self._due, (time.monotonic() + delay, next(self._sequence), key)
+            )
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush, name="outbound-edits", daemon=True
+                )
+                self._flusher.start()
+            self._wake.notify_all()
+
+    def _flush(self):
+        while True:
+            with self._wake:
+                while True:
+                    if self._due:
+                        delay = self._due[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._wake.wait(delay)
+                    else:
+                        self._wake.wait()
+                _, _, key = heapq.heappop(self._due)
+                payload = self._edits.pop(key)
+                self._in_flight += 1
+            try:
+                self._send_edit(key, payload)
+            finally:
+                with self._wake:
+                    self._in_flight -= 1
+                    self._wake.notify_all()
+
+    def _send_edit(self, key: Hashable, payload: Dict[str, Any]):
+        if self._unchanged(key, payload):
+            return
+        try:
+            try:
+                self.bot.edit_message_text(**payload)
+                with self._lock:
+                    self.sent += 1
+            except Exception as e:
+                if not self._not_modified(e):
+                    raise
+            self._edit_done(key, payload)
+            self._attempts.pop(key, None)
+        except Exception as e:
+            attempt = self._attempts.get(key, 0)
+            delay = self._throttled(key, e, attempt)
+            if delay is None:
+                self._attempts.pop(key, None)
+                ic(f"Error editing message: {e}")
+                return
+            self._attempts[key] = attempt + 1
+            with self._lock:
+                if key in self._edits:
+                    # A newer edit is already waiting and supersedes this one
+                    return
+                self._edits[key] = payload
+            self._schedule(key, self._reserve(key))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued edit was sent; False on timeout"""
+        with self._wake:
+            return self._wake.wait_for(
+                lambda: not self._edits and not self._in_flight, timeout
+            )
+
+
+class AsyncOutboundSender(_OutboundBase):
+    """Asyncio counterpart of OutboundSender for AsyncTeleBot"""
+
+    async def _call(self, chat_key: Hashable, method, **kwargs):
+        attempt = 0
+        while True:
+            await asyncio.sleep(self._reserve(chat_key))
+            try:
+                result = await method(**kwargs)
+                with self._lock:
+                    self.sent += 1
+                return result
+            except Exception as e:
+                delay = self._throttled(chat_key, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await self._call(
+            chat_id, self.bot.send_message, chat_id=chat_id, text=text, **kwargs
+        )
+
+    async def edit_message_text(
+        self, text, chat_id=None, message_id=None, inline_message_id=None, **kwargs
+    ):
+        """Edit a message; returns None if it was superseded or unchanged"""
+        key = self._edit_key(chat_id, message_id, inline_message_id)
+        payload = dict(
+            text=text,
+            chat_id=chat_id,
+            message_id=message_id,
+            inline_message_id=inline_message_id,
+            **kwargs,
+        )
+        if self._unchanged(key, payload) or not self._begin_edit(key, payload):
+            return None
+        result = None
+        try:
+            while True:
+                payload = self._next_edit(key)
+                if payload is None:
+                    return result
+                if self._unchanged(key, payload):
+                    continue
+                try:
+                    result = await self._call(
+                        key, self.bot.edit_message_text, **payload
+                    )
+                except Exception as e:
+                    if not self._not_modified(e):
+                        raise
+                self._edit_done(key, payload)
+        except Exception:
+            self._abandon_edit(key)
+            raise
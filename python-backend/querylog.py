@@ -0,0 +1,101 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from icecream import ic
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a tracked block made more round trips than its budget"""
+
+
+class QueryLog:
+    """Round trips and rows returned by the storage layer within one scope"""
+
+    def __init__(self, name: str = "update", budget: Optional[int] = None):
+        self.name = name
+        self.budget = budget
+        self.round_trips = 0
+        self.rows = 0
+        self.queries: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, signature: str, rows: int = 0):
+        with self._lock:
+            self.round_trips += 1
+            self.rows += rows
+            self.queries[signature] += 1
+
+    @property
+    def duplicates(self) -> Dict[str, int]:
+        """Queries sent more than once with identical filters"""
+        with self._lock:
+            return {query: n for query, n in self.queries.items() if n > 1}
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.round_trips > self.budget
+
+    def summary(self) -> str:
+        text = f"{self.name}: {self.round_trips} queries, {self.rows} rows"
+        if self.budget is not None:
+            text += f" (budget {self.budget})"
+        return text
+
+
+_current: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+
+
+def brief(value: Any, limit: int = 80) -> str:
+    """Short repr for query signatures, so bulk payloads stay readable"""
+    text = repr(value)
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def current_log() -> Optional[QueryLog]:
+    return _current.get()
+
+
+def record_query(signature: str, rows: int = 0):
+    """Count one round trip against the active log, if any"""
+    log = _current.get()
+    if log is not None:
+        log.record(signature, rows)
+
+
+@contextmanager
+def track_queries(
+    name: str = "update",
+    budget: Optional[int] = None,
+    strict: bool = True,
+    allow_duplicates: bool = True,
+) -> Iterator[QueryLog]:
+    """Account for every storage round trip made inside the block
+
+    Repeated identical queries are reported on exit. Going over ``budget``,
+    or repeating a query when ``allow_duplicates`` is False, raises
+    QueryBudgetExceeded on exit when ``strict``, so a test wrapping
+    ``bot.process_new_updates`` fails even though telebot swallows handler
+    errors; otherwise it is only reported.
+    """
+    log = QueryLog(name, budget)
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+
+    duplicates = log.duplicates
+    if duplicates:
+        ic(f"Repeated queries in {log.name}: {duplicates}")
+    problems = []
+    if log.over_budget:
+        problems.append(log.summary())
+    if duplicates and not allow_duplicates:
+        problems.append(f"{log.name}: repeated queries {sorted(duplicates)}")
+    if problems:
+        if strict:
+            raise QueryBudgetExceeded("; ".join(problems))
+        ic(f"Query budget exceeded: {'; '.join(problems)}")
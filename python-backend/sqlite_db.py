@@ -0,0 +1,465 @@
+import sqlite3
+import threading
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+from uuid import UUID
+from datetime import datetime, date, time
+from icecream import ic
+
+from storage import Storage
+from querylog import brief, current_log, record_query
+
+from classes import (
+    User,
+    Event,
+    EventMember,
+    UserAvailability,
+    TelegramGroup,
+    EventGroupShare,
+    AvailabilityGrid,
+    parse_webapp_slots,
+    availability_rows,
+)
+
+# Mirrors the Supabase tables, with the indexes our access paths need
+SCHEMA = """
+create table if not exists users (
+    id text primary key,
+    tele_id text not null unique,
+    tele_username text,
+    display_name text,
+    initialised integer not null default 0,
+    callout_cleared integer not null default 1,
+    created_at text,
+    updated_at text
+);
+
+create table if not exists events (
+    id text primary key,
+    event_id text not null unique,
+    event_name text not null default '',
+    event_details text,
+    creator_id text references users(id),
+    start_date text,
+    end_date text,
+    display_text text,
+    best_date text,
+    best_start_time text,
+    best_end_time text,
+    max_participants integer not null default 0,
+    created_at text,
+    updated_at text
+);
+
+create table if not exists event_members (
+    id text primary key,
+    event_id text not null references events(id) on delete cascade,
+    user_id text not null references users(id) on delete cascade,
+    joined_at text,
+    unique (event_id, user_id)
+);
+create index if not exists event_members_user on event_members (user_id);
+
+create table if not exists user_availability (
+    id text primary key,
+    event_id text not null references events(id) on delete cascade,
+    user_id text not null references users(id) on delete cascade,
+    available_date text not null,
+    available_time text not null,
+    created_at text,
+    unique (event_id, user_id, available_date, available_time)
+);
+
+create table if not exists telegram_groups (
+    id text primary key,
+    group_id text not null unique,
+    group_name text,
+    group_type text not null default 'group',
+    created_at text
+);
+
+create table if not exists event_group_shares (
+    id text primary key,
+    event_id text not null references events(id) on delete cascade,
+    group_id text not null references telegram_groups(id) on delete cascade,
+    inline_message_id text,
+    shared_at text
+);
+create index if not exists event_group_shares_event on event_group_shares (event_id);
+"""
+
+USER_BOOLEANS = ("initialised", "callout_cleared")
+
+
+def _user_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """SQLite stores booleans as integers"""
+    for column in USER_BOOLEANS:
+        if column in row and row[column] is not None:
+            row[column] = bool(row[column])
+    return row
+
+
+class SQLiteDB(Storage):
+    """Database interface for meetWhenAh backed by a local SQLite file
+
+    Same method surface and caching as SupabaseDB, for running the bot, load
+    tests and benchmarks offline. Pass ":memory:" for a throwaway database.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        super().__init__()
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("pragma foreign_keys = on")
+        if path != ":memory:":
+            self.conn.execute("pragma journal_mode = wal")
+        self.conn.executescript(SCHEMA)
+        # One connection shared by every thread, so serialise access to it
+        self._lock = threading.RLock()
+
+    def _query(self, sql: str, params: Iterable[Any] = ()) -> List[Dict[str, Any]]:
+        params = tuple(params)
+        with self._lock:
+            rows = [dict(row) for row in self.conn.execute(sql, params)]
+        if current_log() is not None:
+            record_query(f"{sql} {brief(params)}", len(rows))
+        return rows
+
+    def _execute(self, sql: str, params: Iterable[Any] = ()) -> int:
+        params = tuple(params)
+        with self._lock, self.conn:
+            count = self.conn.execute(sql, params).rowcount
+        if current_log() is not None:
+            record_query(f"{sql} {brief(params)}", count)
+        return count
+
+    def _insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        columns = ", ".join(data)
+        placeholders = ", ".join("?" for _ in data)
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"insert into {table} ({columns}) values ({placeholders})",
+                tuple(data.values()),
+            )
+        record_query(f"insert into {table} {brief(tuple(data.values()))}", 1)
+        return data
+
+    def _update(self, table: str, data: Dict[str, Any], row_id: UUID) -> int:
+        assignments = ", ".join(f"{column} = ?" for column in data)
+        return self._execute(
+            f"update {table} set {assignments} where id = ?",
+            (*data.values(), str(row_id)),
+        )
+
+    # ==================== USER OPERATIONS ====================
+
+    def _insert_user(self, user: User) -> User:
+        return User.from_dict(_user_row(self._insert("users", user.to_dict())))
+
+    def _fetch_user(self, column: str, value: str) -> Optional[User]:
+        rows = self._query(f"select * from users where {column} = ?", (value,))
+        return User.from_dict(_user_row(rows[0])) if rows else None
+
+    def _fetch_users(self, user_ids: List[str]) -> List[User]:
+        placeholders = ", ".join("?" for _ in user_ids)
+        rows = self._query(
+            f"select * from users where id in ({placeholders})", user_ids
+        )
+        return [User.from_dict(_user_row(row)) for row in rows]
+
+    def _write_user(self, user: User) -> User:
+        user.updated_at = datetime.now()
+        data = user.to_dict()
+        if not self._update("users", data, user.id):
+            raise Exception("Failed to update user")
+        return User.from_dict(_user_row(data))
+
+    # ==================== EVENT OPERATIONS ====================
+
+    def create_event(self, event: Event) -> Event:
+        """Create a new event"""
+        try:
+            return Event.from_dict(self._insert("events", event.to_dict()))
+        except Exception as e:
+            ic(f"Error creating event: {e}")
+            raise
+
+    def _fetch_event(
+        self, column: str, value: str, load: Iterable[str]
+    ) -> Optional[Event]:
+        """Fetch an event by column with the relations in ``load`` populated"""
+        rows = self._query(f"select * from events where {column} = ?", (value,))
+        if not rows:
+            return None
+        event = Event.from_dict(rows[0])
+        if "members" in load:
+            event.members = self.get_event_members(event.id)
+        if "availability" in load:
+            event.availability_data = self.get_event_availability(event.id)
+        self._defer_relations(event, load)
+        return event
+
+    def update_event(self, event: Event) -> Event:
+        """Update existing event"""
+        try:
+            event.updated_at = datetime.now()
+            data = event.to_dict()
+            if not self._update("events", data, event.id):
+                raise Exception("Failed to update event")
+            return Event.from_dict(data)
+        except Exception as e:
+            ic(f"Error updating event: {e}")
+            raise
+        finally:
+            self.invalidate_event(event.id)
+
+    def update_event_best_timing(
+        self,
+        event_id: UUID,
+        best_date: date,
+        best_start_time: time,
+        best_end_time: time,
+        max_participants: int,
+    ):
+        """Update event's best timing calculation"""
+        try:
+            update_data = {
+                "best_date": best_date.isoformat(),
+                "best_start_time": best_start_time.isoformat(),
+                "best_end_time": best_end_time.isoformat(),
+                "max_participants": max_participants,
+                "updated_at": datetime.now().isoformat(),
+            }
+            self._update("events", update_data, event_id)
+            rows = self._query("select * from events where id = ?", (str(event_id),))
+            return rows[0] if rows else None
+        except Exception as e:
+            ic(f"Error updating event best timing: {e}")
+            raise
+        finally:
+            self.invalidate_event(event_id)
+
+    # ==================== EVENT MEMBER OPERATIONS ====================
+
+    def _fetch_member_ids(self, event_id: UUID) -> List[str]:
+        rows = self._query(
+            "select user_id from event_members where event_id = ? order by rowid",
+            (str(event_id),),
+        )
+        return [row["user_id"] for row in rows]
+
+    def _upsert_member(self, member: EventMember):
+        data = member.to_dict()
+        self._execute(
+            f"insert or ignore into event_members ({', '.join(data)})"
+            f" values ({', '.join('?' for _ in data)})",
+            data.values(),
+        )
+
+    def _delete_member(self, event_id: UUID, user_id: UUID):
+        self._execute(
+            "delete from event_members where event_id = ? and user_id = ?",
+            (str(event_id), str(user_id)),
+        )
+
+    def get_user_events(self, user_id: UUID) -> List[Event]:
+        """Get all events a user is member of"""
+        try:
+            rows = self._query(
+                "select events.* from event_members"
+                " join events on events.id = event_members.event_id"
+                " where event_members.user_id = ?",
+                (str(user_id),),
+            )
+            return [Event.from_dict(row) for row in rows]
+        except Exception as e:
+            ic(f"Error getting user events: {e}")
+            return []
+
+    # ==================== AVAILABILITY OPERATIONS ====================
+
+    def set_user_availability(
+        self,
+        event_id: UUID,
+        user_id: UUID,
+        availability_data: List[Dict[str, str]],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> List[UserAvailability]:
+        """Set user's availability for an event (replaces existing)
+
+        Slots outside start_date..end_date (the event's range, when given) are
+        ignored. The change is applied as a diff in a single transaction.
+        """
+        try:
+            slots = parse_webapp_slots(availability_data, start_date, end_date)
+            keys = (str(event_id), str(user_id))
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "create temp table if not exists wanted_slots"
+                    " (available_date text, available_time text)"
+                )
+                self.conn.execute("delete from wanted_slots")
+                self.conn.executemany(
+                    "insert into wanted_slots values (?, ?)",
+                    [(d.isoformat(), t.isoformat()) for d, t in slots],
+                )
+                self.conn.execute(
+                    "delete from user_availability where event_id = ? and user_id = ?"
+                    " and (available_date, available_time) not in"
+                    " (select available_date, available_time from wanted_slots)",
+                    keys,
+                )
+                self.conn.executemany(
+                    "insert or ignore into user_availability (id, event_id, user_id,"
+                    " available_date, available_time, created_at)"
+                    " values (:id, :event_id, :user_id, :available_date,"
+                    " :available_time, :created_at)",
+                    availability_rows(event_id, user_id, slots),
+                )
+            # One local transaction, the equivalent of a single round trip
+            record_query(f"set availability {brief(keys)}", len(slots))
+
+            # Apply only the difference to the maintained counts
+            self._update_tally(event_id, user_id, slots)
+            return self.get_user_availability(event_id, user_id)
+        except Exception as e:
+            # The stored rows are now unknown, so recount on next use
+            self.invalidate_availability(event_id)
+            ic(f"Error setting user availability: {e}")
+            raise
+        finally:
+            self.invalidate_event(event_id)
+
+    def clear_user_availability(self, event_id: UUID, user_id: UUID) -> bool:
+        """Clear all availability for a user in an event"""
+        try:
+            self._execute(
+                "delete from user_availability where event_id = ? and user_id = ?",
+                (str(event_id), str(user_id)),
+            )
+            self._update_tally(event_id, user_id, [])
+            return True
+        except Exception as e:
+            self.invalidate_availability(event_id)
+            ic(f"Error clearing user availability: {e}")
+            return False
+        finally:
+            self.invalidate_event(event_id)
+
+    def get_event_availability(self, event_id: UUID) -> List[UserAvailability]:
+        """Get all availability data for an event"""
+        try:
+            rows = self._query(
+                "select * from user_availability where event_id = ?", (str(event_id),)
+            )
+            return [UserAvailability.from_dict(row) for row in rows]
+        except Exception as e:
+            ic(f"Error getting event availability: {e}")
+            return []
+
+    def get_user_availability(
+        self, event_id: UUID, user_id: UUID
+    ) -> List[UserAvailability]:
+        """Get availability data for specific user in an event"""
+        try:
+            rows = self._query(
+                "select * from user_availability where event_id = ? and user_id = ?"
+                " order by available_date, available_time",
+                (str(event_id), str(user_id)),
+            )
+            return [UserAvailability.from_dict(row) for row in rows]
+        except Exception as e:
+            ic(f"Error getting user availability: {e}")
+            return []
+
+    def get_availability_grid(
+        self,
+        event_id: UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Optional[AvailabilityGrid]:
+        """Load an event's availability into a bitset grid (no user records)"""
+        try:
+            rows = self._query(
+                "select user_id, available_date, available_time"
+                " from user_availability where event_id = ?",
+                (str(event_id),),
+            )
+            return AvailabilityGrid.from_rows(rows, [], start_date, end_date)
+        except Exception as e:
+            ic(f"Error getting availability grid: {e}")
+            return None
+
+    # ==================== TELEGRAM GROUP OPERATIONS ====================
+
+    def get_or_create_telegram_group(
+        self, group_id: str, group_name: str = None, group_type: str = "group"
+    ) -> TelegramGroup:
+        """Get existing Telegram group or create new one"""
+        try:
+            rows = self._query(
+                "select * from telegram_groups where group_id = ?", (group_id,)
+            )
+            if rows:
+                return TelegramGroup.from_dict(rows[0])
+
+            new_group = TelegramGroup(
+                group_id=group_id, group_name=group_name, group_type=group_type
+            )
+            return TelegramGroup.from_dict(
+                self._insert("telegram_groups", new_group.to_dict())
+            )
+        except Exception as e:
+            ic(f"Error getting/creating telegram group: {e}")
+            raise
+
+    def add_event_group_share(
+        self, event_id: UUID, group_id: UUID, inline_message_id: str = None
+    ) -> EventGroupShare:
+        """Record that an event was shared in a group"""
+        try:
+            share = EventGroupShare(
+                event_id=event_id,
+                group_id=group_id,
+                inline_message_id=inline_message_id,
+            )
+            return EventGroupShare.from_dict(
+                self._insert("event_group_shares", share.to_dict())
+            )
+        except Exception as e:
+            ic(f"Error adding event group share: {e}")
+            raise
+
+    def get_event_shares(
+        self, event_id: UUID
+    ) -> List[Tuple[TelegramGroup, EventGroupShare]]:
+        """Get all group shares for an event"""
+        try:
+            rows = self._query(
+                "select event_group_shares.*, telegram_groups.id as g_id,"
+                " telegram_groups.group_id as g_group_id,"
+                " telegram_groups.group_name as g_group_name,"
+                " telegram_groups.group_type as g_group_type,"
+                " telegram_groups.created_at as g_created_at"
+                " from event_group_shares"
+                " join telegram_groups on telegram_groups.id = event_group_shares.group_id"
+                " where event_group_shares.event_id = ?",
+                (str(event_id),),
+            )
+            shares = []
+            for row in rows:
+                group = TelegramGroup.from_dict(
+                    {key[2:]: value for key, value in row.items() if key[:2] == "g_"}
+                )
+                shares.append((group, EventGroupShare.from_dict(row)))
+            return shares
+        except Exception as e:
+            ic(f"Error getting event shares: {e}")
+            return []
+
+    # ==================== UTILITY METHODS ====================
+
+    def _write_event_fields(self, event_id: UUID, values: Dict[str, Any]):
+        """Update the given columns of an event row in one request"""
+        self._update("events", values, event_id)
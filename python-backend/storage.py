@@ -0,0 +1,1117 @@
+import asyncio
+import contextlib
+import contextvars
+import copy
+import functools
+import itertools
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Tuple
+from uuid import UUID
+from datetime import datetime, date, time
+from dotenv import load_dotenv
+from icecream import ic
+
+from cache import TTLCache
+from metrics import instrument_storage
+
+from classes import (
+    User,
+    Event,
+    EventMember,
+    EventMembership,
+    UserAvailability,
+    TelegramGroup,
+    EventGroupShare,
+    AvailabilitySlot,
+    AvailabilityCalculator,
+    AvailabilityGrid,
+    AvailabilityTally,
+    TimeWindow,
+    SLOT_MINUTES,
+    EVENT_RELATIONS,
+)
+
+load_dotenv()
+
+
+class UnitOfWork:
+    """Identity map and pending event writes for one update
+
+    Created by ``Storage.unit_of_work``. Each event is loaded at most once and
+    the same instance is handed to every caller in the block, so changes to
+    scalar fields must be made on that instance. Event column writes are
+    merged per event and sent as one update when the block ends.
+    """
+
+    def __init__(self, storage: "Storage"):
+        self.storage = storage
+        self.events: Dict[UUID, Event] = {}
+        self.event_uuids: Dict[str, UUID] = {}
+        self.dirty: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def event(self, event_uuid: Optional[UUID]) -> Optional[Event]:
+        with self._lock:
+            return self.events.get(event_uuid) if event_uuid else None
+
+    def remember(self, event: Optional[Event]) -> Optional[Event]:
+        """Add a loaded event to the map, keeping the first instance seen"""
+        if not event:
+            return event
+        with self._lock:
+            event = self.events.setdefault(event.id, event)
+            self.event_uuids[event.event_id] = event.id
+            return event
+
+    def refresh_relations(
+        self, event_uuid: UUID, relations: Iterable[str] = EVENT_RELATIONS
+    ):
+        """Reload a mapped event's relations lazily after a write touched them"""
+        with self._lock:
+            event = self.events.get(event_uuid)
+        if event:
+            keep = [
+                relation for relation in EVENT_RELATIONS if relation not in relations
+            ]
+            self.storage._defer_relations(event, keep)
+
+    def stage(self, event_uuid: UUID, fields: Dict[str, Any]):
+        with self._lock:
+            self.dirty.setdefault(event_uuid, {}).update(fields)
+
+    def flush(self):
+        """Write every dirty event with a single update each"""
+        with self._lock:
+            dirty, self.dirty = self.dirty, {}
+        for event_uuid, fields in dirty.items():
+            try:
+                self.storage._write_event_fields(
+                    event_uuid, self.storage._event_values(fields)
+                )
+            except Exception as e:
+                ic(f"Error flushing event {event_uuid}: {e}")
+                raise
+            finally:
+                self.storage.invalidate_event(event_uuid, display=False)
+
+
+_unit: contextvars.ContextVar[Optional[UnitOfWork]] = contextvars.ContextVar(
+    "unit_of_work", default=None
+)
+
+
+class Storage(ABC):
+    """Backend-independent part of the meetWhenAh database interface
+
+    Subclasses implement the primitive reads and writes (the abstract
+    methods, so an incomplete backend fails when created); the event aggregate
+    cache, the maintained availability tallies and everything computed from
+    them (best times, windows, display text) live here and are shared.
+    Writes in subclasses must call ``invalidate_event`` and keep tallies in
+    step via ``_update_tally`` / ``invalidate_availability``.
+    """
+
+    def __init__(self):
+        # Per-event slot counts kept up to date by availability writes made
+        # here; the TTL bounds staleness from writes by the webapp API or
+        # another process, which this process never sees
+        self._tallies = TTLCache(
+            maxsize=int(os.getenv("TALLY_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("TALLY_CACHE_TTL", "60")),
+        )
+        self._tally_lock = threading.RLock()
+
+        # Hydrated Event aggregates, keyed by UUID with an event_id -> UUID alias
+        self._event_cache = TTLCache(
+            maxsize=int(os.getenv("EVENT_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("EVENT_CACHE_TTL", "30")),
+        )
+        self._event_uuids = TTLCache(maxsize=self._event_cache.maxsize * 4, ttl=None)
+
+        # Display text is rendered once per event version; every write that
+        # can change the text moves the event to a new version
+        self._version_counter = itertools.count()
+        self._display_versions = TTLCache(
+            maxsize=self._event_cache.maxsize * 4, ttl=None
+        )
+        self._rendered = TTLCache(
+            maxsize=self._event_cache.maxsize, ttl=self._event_cache.ttl
+        )
+
+        # Users by UUID (as str), a tele_id -> UUID alias, and tele_ids known
+        # not to exist, which expire sooner in case a user is created elsewhere
+        self._user_cache = TTLCache(
+            maxsize=int(os.getenv("USER_CACHE_SIZE", "2048")),
+            ttl=float(os.getenv("USER_CACHE_TTL", "300")),
+        )
+        self._user_ids = TTLCache(maxsize=self._user_cache.maxsize * 2, ttl=None)
+        self._unknown_users = TTLCache(
+            maxsize=self._user_cache.maxsize,
+            ttl=float(os.getenv("USER_NEGATIVE_TTL", "30")),
+        )
+
+        # Member ids per event, kept current by add/remove_event_member; the
+        # TTL bounds staleness from members the webapp API adds directly
+        self._memberships = TTLCache(
+            maxsize=self._event_cache.maxsize * 4,
+            ttl=float(os.getenv("MEMBERSHIP_CACHE_TTL", "120")),
+        )
+        self._membership_lock = threading.Lock()
+
+    # ==================== USER OPERATIONS ====================
+
+    def create_user(self, user: User) -> User:
+        """Create a new user"""
+        try:
+            created = self._insert_user(user)
+        except Exception as e:
+            ic(f"Error creating user: {e}")
+            raise
+        self._store_user(created)
+        return copy.copy(created)
+
+    def get_user_by_tele_id(self, tele_id: str) -> Optional[User]:
+        """Get user by Telegram ID"""
+        user_id = self._user_ids.get(tele_id)
+        if user_id:
+            user = self._user_cache.get(user_id)
+            if user:
+                return copy.copy(user)
+        elif self._unknown_users.get(tele_id):
+            return None
+        else:
+            self._user_cache.record_miss()
+        return self._load_user("tele_id", tele_id)
+
+    def get_user_by_id(self, user_id: UUID) -> Optional[User]:
+        """Get user by UUID"""
+        user = self._user_cache.get(str(user_id))
+        if user:
+            return copy.copy(user)
+        return self._load_user("id", str(user_id))
+
+    def get_users_by_ids(self, user_ids: Iterable[UUID]) -> List[User]:
+        """Get several users by UUID, fetching the uncached ones in one query"""
+        users, missing = [], []
+        for user_id in dict.fromkeys(str(user_id) for user_id in user_ids):
+            user = self._user_cache.get(user_id)
+            if user:
+                users.append(copy.copy(user))
+            else:
+                missing.append(user_id)
+        if not missing:
+            return users
+
+        generation = self._user_cache.generation()
+        try:
+            fetched = self._fetch_users(missing)
+        except Exception as e:
+            ic(f"Error getting users by id: {e}")
+            return users
+        for user in fetched:
+            self._cache_user(user, generation)
+            users.append(copy.copy(user))
+        return users
+
+    def update_user(self, user: User) -> User:
+        """Update existing user"""
+        previous = self._user_cache.get(str(user.id))
+        try:
+            updated = self._write_user(user)
+        except Exception as e:
+            # The stored row is now unknown, so read it again next time
+            self.invalidate_user(user.id)
+            ic(f"Error updating user: {e}")
+            raise
+        self._store_user(updated)
+        if previous is None or (previous.tele_username, previous.display_name) != (
+            updated.tele_username,
+            updated.display_name,
+        ):
+            # Member lists show the name, so re-render the user's events
+            for event in self.get_user_events(updated.id):
+                self.invalidate_event(event.id, relations=("members",))
+        return copy.copy(updated)
+
+    def _load_user(self, column: str, value: str) -> Optional[User]:
+        """Fetch a user by column and cache the result, including a miss"""
+        generation = self._user_cache.generation()
+        unknown_generation = self._unknown_users.generation()
+        try:
+            user = self._fetch_user(column, value)
+        except Exception as e:
+            ic(f"Error getting user by {column}: {e}")
+            return None
+        if not user:
+            if column == "tele_id":
+                self._unknown_users.set(value, True, unknown_generation)
+            return None
+        self._cache_user(user, generation)
+        return copy.copy(user)
+
+    def _cache_user(self, user: User, generation: Optional[int] = None):
+        """Cache a user read from the backend unless it was written meanwhile"""
+        if self._user_cache.set(str(user.id), user, generation) and user.tele_id:
+            self._user_ids.set(user.tele_id, str(user.id))
+
+    def _store_user(self, user: User):
+        """Write-through after create/update; rejects older in-flight reads"""
+        self._user_cache.invalidate(str(user.id))
+        self._cache_user(user)
+        if user.tele_id:
+            self._unknown_users.invalidate(user.tele_id)
+
+    def invalidate_user(self, user_id: UUID, tele_id: Optional[str] = None):
+        """Drop a cached user (e.g. after an external write)"""
+        self._user_cache.invalidate(str(user_id))
+        if tele_id:
+            self._unknown_users.invalidate(tele_id)
+
+    def user_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the user cache, plus negative lookups"""
+        stats = self._user_cache.stats()
+        stats["negative_hits"] = self._unknown_users.hits
+        stats["negative_size"] = len(self._unknown_users)
+        return stats
+
+    @abstractmethod
+    def _fetch_user(self, column: str, value: str) -> Optional[User]:
+        """Fetch one user by "id" or "tele_id", or None if there is none"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _fetch_users(self, user_ids: List[str]) -> List[User]:
+        """Fetch several users by UUID in one request"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _insert_user(self, user: User) -> User:
+        """Insert a user row and return it as stored"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _write_user(self, user: User) -> User:
+        """Update a user row and return it as stored"""
+        raise NotImplementedError
+
+    def get_or_create_user(self, tele_id: str, tele_username: str = None) -> User:
+        """Get existing user or create new one"""
+        user = self.get_user_by_tele_id(tele_id)
+        if user:
+            return user
+
+        new_user = User(
+            tele_id=tele_id,
+            tele_username=tele_username,
+            initialised=True,
+            callout_cleared=True,
+        )
+        return self.create_user(new_user)
+
+    # ==================== EVENT OPERATIONS ====================
+
+    @abstractmethod
+    def create_event(self, event: Event) -> Event:
+        """Create a new event"""
+        raise NotImplementedError
+
+    def get_event_by_event_id(
+        self, event_id: str, load: Iterable[str] = EVENT_RELATIONS
+    ) -> Optional[Event]:
+        """Get event by event_id (16-character string)
+
+        Relations named in ``load`` ("members", "availability") are fetched in
+        the same request; the rest are loaded on first access.
+        """
+        unit = self._current_unit()
+        if unit:
+            event = unit.event(unit.event_uuids.get(event_id))
+            return event or unit.remember(self._event_by_event_id(event_id, load))
+        return self._event_by_event_id(event_id, load)
+
+    def _event_by_event_id(self, event_id: str, load: Iterable[str]) -> Optional[Event]:
+        event_uuid = self._event_uuids.get(event_id)
+        cached = self._event_cache.get(event_uuid) if event_uuid else None
+        if cached and all(cached.is_loaded(relation) for relation in load):
+            return self._copy_event(cached)
+        if not event_uuid:
+            self._event_cache.record_miss()
+
+        try:
+            return self._load_event("event_id", event_id, load, cached)
+        except Exception as e:
+            ic(f"Error getting event by event_id: {e}")
+            return None
+
+    def get_event_by_id(
+        self, event_id: UUID, load: Iterable[str] = EVENT_RELATIONS
+    ) -> Optional[Event]:
+        """Get event by UUID (see get_event_by_event_id for ``load``)"""
+        unit = self._current_unit()
+        if unit:
+            event = unit.event(event_id)
+            return event or unit.remember(self._event_by_id(event_id, load))
+        return self._event_by_id(event_id, load)
+
+    def _event_by_id(self, event_id: UUID, load: Iterable[str]) -> Optional[Event]:
+        cached = self._event_cache.get(event_id)
+        if cached and all(cached.is_loaded(relation) for relation in load):
+            return self._copy_event(cached)
+
+        try:
+            return self._load_event("id", str(event_id), load, cached)
+        except Exception as e:
+            ic(f"Error getting event by id: {e}")
+            return None
+
+    def _load_event(
+        self,
+        column: str,
+        value: str,
+        load: Iterable[str],
+        cached: Optional[Event] = None,
+    ) -> Optional[Event]:
+        """Fetch an event with the requested relations embedded and cache it"""
+        load = tuple(load)
+        generation = self._event_cache.generation()
+        membership_generation = self._memberships.generation()
+        event = self._fetch_event(column, value, load)
+        if not event:
+            return None
+        if "members" in load:
+            self._seed_membership(event, membership_generation)
+
+        if cached:
+            # Keep relations the cached copy already had (it is still valid)
+            if not event.is_loaded("members") and cached.is_loaded("members"):
+                event.members = list(cached.members)
+            if not event.is_loaded("availability") and cached.is_loaded("availability"):
+                event.availability_data = list(cached.availability_data)
+        self._cache_event(event, generation)
+        return self._copy_event(event)
+
+    @abstractmethod
+    def _fetch_event(
+        self, column: str, value: str, load: Iterable[str]
+    ) -> Optional[Event]:
+        """Fetch an event by column with the relations in ``load`` populated
+
+        Relations not in ``load`` should be deferred with ``_defer_relations``.
+        """
+        raise NotImplementedError
+
+    def _defer_relations(self, event: Event, load: Iterable[str]):
+        """Load the relations not in ``load`` on first access"""
+        if "members" not in load:
+            event.defer("members", lambda: self.get_event_members(event.id))
+        if "availability" not in load:
+            event.defer("availability", lambda: self.get_event_availability(event.id))
+
+    def _cache_event(self, event: Event, generation: int):
+        """Cache a hydrated event unless it was written to while loading"""
+        if self._event_cache.set(event.id, event, generation):
+            self._event_uuids.set(event.event_id, event.id)
+
+    @staticmethod
+    def _copy_event(event: Event) -> Event:
+        """Copy of a cached event that callers can mutate freely"""
+        clone = copy.copy(event)
+        clone._loaders = dict(event._loaders)
+        if event.is_loaded("members"):
+            clone.members = list(event.members)
+        if event.is_loaded("availability"):
+            clone.availability_data = list(event.availability_data)
+        return clone
+
+    def invalidate_event(
+        self,
+        event_id: UUID,
+        relations: Iterable[str] = EVENT_RELATIONS,
+        display: bool = True,
+    ):
+        """Drop an event's cached aggregate after a write
+
+        ``relations`` names what the write changed, so an event held by the
+        active unit of work only reloads those. ``display`` is False for
+        writes of the rendered text itself, which leave its version alone.
+        """
+        self._event_cache.invalidate(event_id)
+        if display:
+            self._display_versions.set(event_id, next(self._version_counter))
+        unit = self._current_unit()
+        if unit:
+            unit.refresh_relations(event_id, relations)
+
+    # ==================== UNIT OF WORK ====================
+
+    @contextlib.contextmanager
+    def unit_of_work(self) -> Iterator[UnitOfWork]:
+        """Scope one update: load each event once and batch its writes
+
+        Inside the block get_event_by_* return one shared instance per event
+        and update_event_display_text stages its column writes, which are
+        flushed as a single update per event when the block exits. Nested
+        blocks join the outer one.
+        """
+        unit = self._current_unit()
+        if unit:
+            yield unit
+            return
+        unit = UnitOfWork(self)
+        token = _unit.set(unit)
+        try:
+            yield unit
+        finally:
+            _unit.reset(token)
+            unit.flush()
+
+    def _current_unit(self) -> Optional[UnitOfWork]:
+        unit = _unit.get()
+        return unit if unit is not None and unit.storage is self else None
+
+    def _save_event_fields(self, event_id: UUID, fields: Dict[str, Any]):
+        """Write display columns now, or at the end of the active unit of work"""
+        unit = self._current_unit()
+        if unit:
+            unit.stage(event_id, fields)
+            return
+        try:
+            self._write_event_fields(event_id, self._event_values(fields))
+        finally:
+            self.invalidate_event(event_id, display=False)
+
+    @staticmethod
+    def _event_values(fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Column values for an event update, with updated_at stamped"""
+        values = {
+            key: value.isoformat() if isinstance(value, (date, time)) else value
+            for key, value in fields.items()
+        }
+        values["updated_at"] = datetime.now().isoformat()
+        return values
+
+    def event_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the event aggregate cache"""
+        return self._event_cache.stats()
+
+    @abstractmethod
+    def update_event(self, event: Event) -> Event:
+        """Update existing event"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_event_best_timing(
+        self,
+        event_id: UUID,
+        best_date: date,
+        best_start_time: time,
+        best_end_time: time,
+        max_participants: int,
+    ):
+        """Update event's best timing calculation"""
+        raise NotImplementedError
+
+    # ==================== EVENT MEMBER OPERATIONS ====================
+
+    def add_event_member(self, event_id: UUID, user_id: UUID) -> EventMember:
+        """Add user to event (a no-op if they already are a member)"""
+        member = EventMember(event_id=event_id, user_id=user_id)
+        try:
+            self._upsert_member(member)
+        except Exception as e:
+            self._memberships.invalidate(str(event_id))
+            ic(f"Error adding event member: {e}")
+            raise
+        else:
+            self._update_membership(event_id, lambda index: index.with_member(user_id))
+        finally:
+            self.invalidate_event(event_id, relations=("members",))
+        return member
+
+    def remove_event_member(self, event_id: UUID, user_id: UUID) -> bool:
+        """Remove user from event"""
+        try:
+            self._delete_member(event_id, user_id)
+        except Exception as e:
+            self._memberships.invalidate(str(event_id))
+            ic(f"Error removing event member: {e}")
+            return False
+        else:
+            self._update_membership(
+                event_id, lambda index: index.without_member(user_id)
+            )
+        finally:
+            self.invalidate_event(event_id, relations=("members",))
+        return True
+
+    def is_user_event_member(self, event_id: UUID, user_id: UUID) -> bool:
+        """Check if user is member of event"""
+        index = self.get_event_membership(event_id)
+        return index is not None and user_id in index
+
+    def get_event_members(self, event_id: UUID) -> List[User]:
+        """Get all members of an event, in join order"""
+        index = self.get_event_membership(event_id)
+        if not index:
+            return []
+        users = {str(user.id): user for user in self.get_users_by_ids(index.user_ids)}
+        return [users[user_id] for user_id in index.user_ids if user_id in users]
+
+    def get_event_membership(self, event_id: UUID) -> Optional[EventMembership]:
+        """Member ids of an event, loaded once and then kept up to date"""
+        key = str(event_id)
+        index = self._memberships.get(key)
+        if index is not None:
+            return index
+
+        generation = self._memberships.generation()
+        try:
+            index = EventMembership(event_id, self._fetch_member_ids(event_id))
+        except Exception as e:
+            ic(f"Error getting event members: {e}")
+            return None
+        self._memberships.set(key, index, generation)
+        return index
+
+    def invalidate_membership(self, event_id: UUID):
+        """Drop an event's member index (e.g. after the webapp changed members)"""
+        self._memberships.invalidate(str(event_id))
+        self.invalidate_event(event_id, relations=("members",))
+
+    def _update_membership(self, event_id: UUID, change):
+        """Apply a write to the cached index, rejecting older in-flight loads"""
+        key = str(event_id)
+        with self._membership_lock:
+            index = self._memberships.invalidate(key)
+            if index is not None:
+                self._memberships.set(key, change(index))
+
+    def _seed_membership(self, event: Event, generation: int):
+        """Index the members of an event that was fetched with them embedded"""
+        user_generation = self._user_cache.generation()
+        for user in event.members:
+            self._cache_user(user, user_generation)
+        self._memberships.set(
+            str(event.id),
+            EventMembership(event.id, (user.id for user in event.members)),
+            generation,
+        )
+
+    @abstractmethod
+    def _fetch_member_ids(self, event_id: UUID) -> List[str]:
+        """Fetch the user ids of an event's members in join order"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _upsert_member(self, member: EventMember):
+        """Insert a member row, ignoring one that already exists"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _delete_member(self, event_id: UUID, user_id: UUID):
+        """Delete a member row"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user_events(self, user_id: UUID) -> List[Event]:
+        """Get all events a user is member of"""
+        raise NotImplementedError
+
+    # ==================== AVAILABILITY OPERATIONS ====================
+
+    @abstractmethod
+    def set_user_availability(
+        self,
+        event_id: UUID,
+        user_id: UUID,
+        availability_data: List[Dict[str, str]],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> List[UserAvailability]:
+        """Set user's availability for an event (replaces existing)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear_user_availability(self, event_id: UUID, user_id: UUID) -> bool:
+        """Clear all availability for a user in an event"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_event_availability(self, event_id: UUID) -> List[UserAvailability]:
+        """Get all availability data for an event"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user_availability(
+        self, event_id: UUID, user_id: UUID
+    ) -> List[UserAvailability]:
+        """Get availability data for specific user in an event"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_availability_grid(
+        self,
+        event_id: UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Optional[AvailabilityGrid]:
+        """Load an event's availability into a bitset grid (no user records)"""
+        raise NotImplementedError
+
+    def _grid_slots(
+        self, grid: AvailabilityGrid, indices: List[int]
+    ) -> List[AvailabilitySlot]:
+        """Materialise grid slots, fetching only the users that appear in them"""
+        user_ids = set()
+        for index in indices:
+            user_ids.update(grid.available_user_ids(index))
+        grid.add_users(self.get_users_by_ids(user_ids - grid.users.keys()))
+        return [grid.to_availability_slot(index) for index in indices]
+
+    def iter_availability_summary(
+        self, event_id: UUID, batch_size: int = 256
+    ) -> Iterator[AvailabilitySlot]:
+        """Stream the aggregated availability summary in date and time order
+
+        Slots are built ``batch_size`` at a time, fetching only the users that
+        first appear in each batch, so the full slot list is never held.
+        """
+        grid = self.get_availability_grid(event_id)
+        if not grid:
+            return
+        indices = grid.occupied_indices()
+        while True:
+            batch = list(itertools.islice(indices, batch_size))
+            if not batch:
+                return
+            yield from self._grid_slots(grid, batch)
+
+    def find_best_times(
+        self, event_id: UUID, limit: int = 10
+    ) -> List[AvailabilitySlot]:
+        """Best slots streamed from the stored availability, without a tally
+
+        Only (slot index, count) pairs go through the bounded heap; slots and
+        their users are built for the winners alone.
+        """
+        grid = self.get_availability_grid(event_id)
+        if not grid:
+            return []
+        indices = AvailabilityCalculator.find_best_indices(grid.iter_counts(), limit)
+        return self._grid_slots(grid, indices)
+
+    def get_availability_summary(self, event_id: UUID) -> List[AvailabilitySlot]:
+        """Get aggregated availability summary for an event"""
+        return list(self.iter_availability_summary(event_id))
+
+    def get_availability_tally(
+        self,
+        event_id: UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Optional[AvailabilityTally]:
+        """Get the maintained slot counts for an event, building them on first use
+
+        The grid always spans the event's dates (looked up if not given), so
+        a later slot on a day nobody had picked yet still fits the tally.
+        """
+        with self._tally_lock:
+            tally = self._tallies.get(event_id)
+            if tally:
+                return tally
+            generation = self._tallies.generation()
+
+        if not start_date or not end_date:
+            event = self.get_event_by_id(event_id, load=())
+            if not event:
+                return None
+            start_date = start_date or event.start_date
+            end_date = end_date or event.end_date
+        grid = self.get_availability_grid(event_id, start_date, end_date)
+        if not grid:
+            if not start_date or not end_date:
+                return None
+            grid = AvailabilityGrid(start_date, end_date)
+
+        with self._tally_lock:
+            # Another caller may have built it meanwhile; keep the first one
+            tally = self._tallies.get(event_id)
+            if tally:
+                return tally
+            tally = AvailabilityTally(grid)
+            # Not kept if a write invalidated the event while the grid loaded
+            self._tallies.set(event_id, tally, generation)
+            return tally
+
+    def _update_tally(
+        self, event_id: UUID, user_id: UUID, slots: List[Tuple[date, time]]
+    ):
+        """Apply a user's new slots to the event's tally, if one is maintained"""
+        with self._tally_lock:
+            tally = self._tallies.get(event_id)
+            if tally and not tally.set_user_availability(user_id, slots):
+                # Slot outside the tally's grid, rebuild on next use
+                self._tallies.invalidate(event_id)
+
+    def invalidate_availability(self, event_id: UUID):
+        """Drop the maintained counts for an event (e.g. after an external write)"""
+        with self._tally_lock:
+            self._tallies.invalidate(event_id)
+        self.invalidate_event(event_id, relations=("availability",))
+
+    def calculate_best_meeting_times(
+        self, event_id: UUID, limit: int = 10
+    ) -> List[AvailabilitySlot]:
+        """Calculate and return best meeting times for an event"""
+        tally = self.get_availability_tally(event_id)
+        if not tally:
+            return []
+        with self._tally_lock:
+            indices = tally.best_slot_indices(limit)
+        return self._grid_slots(tally.grid, indices)
+
+    def find_best_windows(
+        self,
+        event_id: UUID,
+        min_duration_minutes: int = SLOT_MINUTES,
+        min_attendance: int = 1,
+        top_k: int = 1,
+        weekdays: Optional[Iterable[int]] = None,
+        start_time: Optional[time] = None,
+        end_time: Optional[time] = None,
+    ) -> List[TimeWindow]:
+        """Find the top-k contiguous meeting windows per day for an event
+
+        Optionally only on the given weekdays (Monday is 0) and between
+        start_time and end_time. Answered from the tally's prefix-sum index,
+        which is kept until the event's availability changes.
+        """
+        tally = self.get_availability_tally(event_id)
+        if not tally:
+            return []
+        with self._tally_lock:
+            windows = tally.window_index().best_windows(
+                min_duration_minutes,
+                min_attendance,
+                top_k,
+                weekdays,
+                start_time,
+                end_time,
+            )
+        return self._resolve_window_users(tally.grid, windows)
+
+    def find_best_window(
+        self,
+        event_id: UUID,
+        min_duration_minutes: int = SLOT_MINUTES,
+        weekdays: Optional[Iterable[int]] = None,
+        start_time: Optional[time] = None,
+        end_time: Optional[time] = None,
+    ) -> Optional[TimeWindow]:
+        """Find the single best meeting window for an event, see find_best_windows"""
+        tally = self.get_availability_tally(event_id)
+        if not tally:
+            return None
+        with self._tally_lock:
+            window = tally.window_index().best_window(
+                min_duration_minutes,
+                weekdays=weekdays,
+                start_time=start_time,
+                end_time=end_time,
+            )
+        if window:
+            self._resolve_window_users(tally.grid, [window])
+        return window
+
+    def _resolve_window_users(
+        self, grid: AvailabilityGrid, windows: List[TimeWindow]
+    ) -> List[TimeWindow]:
+        """Fill in User records for the attendees of each window"""
+        user_ids = set()
+        for window in windows:
+            user_ids.update(window.available_user_ids)
+        grid.add_users(self.get_users_by_ids(user_ids - grid.users.keys()))
+        for window in windows:
+            window.available_users = [
+                grid.users[user_id]
+                for user_id in window.available_user_ids
+                if user_id in grid.users
+            ]
+        return windows
+
+    # ==================== TELEGRAM GROUP OPERATIONS ====================
+
+    @abstractmethod
+    def get_or_create_telegram_group(
+        self, group_id: str, group_name: str = None, group_type: str = "group"
+    ) -> TelegramGroup:
+        """Get existing Telegram group or create new one"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_event_group_share(
+        self, event_id: UUID, group_id: UUID, inline_message_id: str = None
+    ) -> EventGroupShare:
+        """Record that an event was shared in a group"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_event_shares(
+        self, event_id: UUID
+    ) -> List[Tuple[TelegramGroup, EventGroupShare]]:
+        """Get all group shares for an event"""
+        raise NotImplementedError
+
+    # ==================== UTILITY METHODS ====================
+
+    @abstractmethod
+    def _write_event_fields(self, event_id: UUID, values: Dict[str, Any]):
+        """Update the given columns of an event row in one request"""
+        raise NotImplementedError
+
+    def display_version(self, event_id: UUID) -> int:
+        """Current version of an event's rendered display text"""
+        version = self._display_versions.get(event_id)
+        if version is None:
+            version = next(self._version_counter)
+            self._display_versions.set(event_id, version)
+        return version
+
+    def _cached_display_text(
+        self, event_id: UUID, min_duration_minutes: int
+    ) -> Optional[str]:
+        """The last rendered text, if the event has not changed since"""
+        rendered = self._rendered.get((event_id, min_duration_minutes))
+        if rendered and rendered[0] == self.display_version(event_id):
+            return rendered[1]
+        return None
+
+    def update_event_display_text(
+        self, event_id: UUID, min_duration_minutes: int = SLOT_MINUTES
+    ) -> str:
+        """Update and return the display text for an event
+
+        The text is re-rendered only when the event's version moved since the
+        last render, and only columns whose value changed are written.
+        """
+        try:
+            version = self.display_version(event_id)
+            cached = self._cached_display_text(event_id, min_duration_minutes)
+            if cached is not None:
+                return cached
+
+            # Members come from the membership index and user cache on access
+            event = self.get_event_by_id(event_id, load=())
+            if not event:
+                return ""
+
+            # Calculate best window (best slot extended while its attendees stay free)
+            best_window = None
+            tally = self.get_availability_tally(
+                event_id, event.start_date, event.end_date
+            )
+            if tally:
+                with self._tally_lock:
+                    if min_duration_minutes <= tally.grid.slot_minutes:
+                        best_window = tally.best_window()
+                    else:
+                        best_window = tally.window_index().best_window(
+                            min_duration_minutes
+                        )
+            fields = {}
+            if best_window:
+                self._resolve_window_users(tally.grid, [best_window])
+                fields = {
+                    "best_date": best_window.available_date,
+                    "best_start_time": best_window.start_time,
+                    "best_end_time": best_window.end_time,
+                    "max_participants": best_window.participant_count,
+                }
+            changed = {
+                key: value
+                for key, value in fields.items()
+                if getattr(event, key) != value
+            }
+            for key, value in changed.items():
+                setattr(event, key, value)
+
+            # Generate display text
+            display_text = event.generate_display_text()
+            if display_text != event.display_text:
+                event.display_text = changed["display_text"] = display_text
+
+            # Best timing and text go out as one update (at the end of the
+            # unit of work, if one is active), and not at all if unchanged
+            if changed:
+                self._save_event_fields(event_id, changed)
+            self._rendered.set(
+                (event_id, min_duration_minutes), (version, display_text)
+            )
+
+            return display_text
+        except Exception as e:
+            ic(f"Error updating event display text: {e}")
+            return ""
+
+
+def create_storage(backend: Optional[str] = None) -> Storage:
+    """Build the storage backend named by STORAGE_BACKEND
+
+    "supabase" (default) needs SUPABASE_URL/SUPABASE_ANON_KEY; "sqlite" uses
+    the file at SQLITE_PATH and "memory" a private in-memory SQLite database,
+    so the bot and benchmarks can run offline.
+    """
+    backend = backend or os.getenv("STORAGE_BACKEND", "supabase")
+    if backend == "supabase":
+        from supabase_db import SupabaseDB
+
+        return SupabaseDB()
+    if backend in ("sqlite", "memory"):
+        from sqlite_db import SQLiteDB
+
+        path = ":memory:" if backend == "memory" else os.getenv("SQLITE_PATH")
+        return SQLiteDB(path or "meetwhenah.db")
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+def _delegate(name: str):
+    """Build an async method that runs Storage.<name> on the worker pool"""
+
+    async def method(self, *args, **kwargs):
+        return await self._run(getattr(self.sync, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = getattr(Storage, name).__doc__
+    return method
+
+
+class AsyncStorage:
+    """Asyncio counterpart of Storage with the same method surface
+
+    Each call runs the synchronous backend on a bounded thread pool, so a slow
+    query no longer blocks the event loop and independent queries can be
+    awaited together with asyncio.gather. Caches and tallies are shared with
+    the wrapped backend.
+    """
+
+    def __init__(self, sync_db: Storage, max_workers: Optional[int] = None):
+        self.sync = sync_db
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("DB_MAX_WORKERS", "16")),
+            thread_name_prefix="storage",
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Carry context variables (such as the active query log) to the thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    @contextlib.asynccontextmanager
+    async def unit_of_work(self):
+        """Async counterpart of Storage.unit_of_work; the flush runs on the pool"""
+        unit = self.sync._current_unit()
+        if unit:
+            yield unit
+            return
+        unit = UnitOfWork(self.sync)
+        token = _unit.set(unit)
+        try:
+            yield unit
+        finally:
+            _unit.reset(token)
+            await self._run(unit.flush)
+
+    # ==================== USER OPERATIONS ====================
+
+    create_user = _delegate("create_user")
+    get_user_by_tele_id = _delegate("get_user_by_tele_id")
+    get_user_by_id = _delegate("get_user_by_id")
+    get_users_by_ids = _delegate("get_users_by_ids")
+    update_user = _delegate("update_user")
+    get_or_create_user = _delegate("get_or_create_user")
+
+    # ==================== EVENT OPERATIONS ====================
+
+    create_event = _delegate("create_event")
+    get_event_by_event_id = _delegate("get_event_by_event_id")
+    get_event_by_id = _delegate("get_event_by_id")
+    invalidate_event = _delegate("invalidate_event")
+    event_cache_stats = _delegate("event_cache_stats")
+    update_event = _delegate("update_event")
+    update_event_best_timing = _delegate("update_event_best_timing")
+
+    # ==================== EVENT MEMBER OPERATIONS ====================
+
+    add_event_member = _delegate("add_event_member")
+    remove_event_member = _delegate("remove_event_member")
+    is_user_event_member = _delegate("is_user_event_member")
+    get_event_members = _delegate("get_event_members")
+    get_event_membership = _delegate("get_event_membership")
+    invalidate_membership = _delegate("invalidate_membership")
+    get_user_events = _delegate("get_user_events")
+
+    # ==================== AVAILABILITY OPERATIONS ====================
+
+    set_user_availability = _delegate("set_user_availability")
+    clear_user_availability = _delegate("clear_user_availability")
+    get_event_availability = _delegate("get_event_availability")
+    get_user_availability = _delegate("get_user_availability")
+    get_availability_grid = _delegate("get_availability_grid")
+    get_availability_summary = _delegate("get_availability_summary")
+    find_best_times = _delegate("find_best_times")
+    get_availability_tally = _delegate("get_availability_tally")
+    invalidate_availability = _delegate("invalidate_availability")
+    calculate_best_meeting_times = _delegate("calculate_best_meeting_times")
+    find_best_windows = _delegate("find_best_windows")
+    find_best_window = _delegate("find_best_window")
+
+    # ==================== TELEGRAM GROUP OPERATIONS ====================
+
+    get_or_create_telegram_group = _delegate("get_or_create_telegram_group")
+    add_event_group_share = _delegate("add_event_group_share")
+    get_event_shares = _delegate("get_event_shares")
+
+    # ==================== UTILITY METHODS ====================
+
+    display_version = _delegate("display_version")
+
+    async def update_event_display_text(
+        self, event_id: UUID, min_duration_minutes: int = SLOT_MINUTES
+    ) -> str:
+        """Update and return the display text for an event"""
+        cached = self.sync._cached_display_text(event_id, min_duration_minutes)
+        if cached is not None:
+            return cached
+
+        # Warm the member index and the tally (over the event's dates) in
+        # parallel; the update hits both
+        event = await self.get_event_by_id(event_id, load=())
+        if not event:
+            return ""
+        await asyncio.gather(
+            self.get_event_members(event_id),
+            self.get_availability_tally(event_id, event.start_date, event.end_date),
+        )
+        return await self._run(
+            self.sync.update_event_display_text, event_id, min_duration_minutes
+        )
+
+
+# Global database instances, created on first import of ``db``/``async_db`` so
+# that importing Storage or create_storage alone does not need a backend
+_instances: Dict[str, Any] = {}
+
+
+def __getattr__(name: str):
+    if name in ("db", "async_db"):
+        if not _instances:
+            _instances["db"] = instrument_storage(create_storage())
+            _instances["async_db"] = AsyncStorage(_instances["db"])
+        return _instances[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,21 +1,27 @@
 import os
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Iterable, Tuple
 from uuid import UUID
 from datetime import datetime, date, time
 from supabase import create_client, Client
 from dotenv import load_dotenv
 from icecream import ic
 
+from storage import Storage
+from querylog import brief, current_log, record_query
+
 from classes import (
     User,
     Event,
     EventMember,
     UserAvailability,
+    CompactAvailability,
     TelegramGroup,
     EventGroupShare,
-    AvailabilitySlot,
-    AvailabilityCalculator,
+    AvailabilityGrid,
+    EVENT_RELATIONS,
     parse_time_string,
+    parse_webapp_slots,
+    availability_rows,
     time_to_string,
     generate_time_slots,
     generate_date_range,
@@ -23,11 +29,93 @@ from classes import (
 
 load_dotenv()
 
-
-class SupabaseDB:
+# Embedded resources for each Event relation, so one PostgREST request hydrates
+# the event row together with whichever relations the caller asks for
+EVENT_RELATION_SELECTS = {
+    "members": "event_members(user_id, joined_at, users(*))",
+    "availability": "user_availability(*)",
+}
+
+# AVAILABILITY_STORAGE picks how availability is stored: "rows" keeps one
+# user_availability row per slot, "compact" one user_availability_compact row
+# per (event, user) holding run-length slot ranges (see CompactAvailability).
+#
+#   create table user_availability_compact (
+#       event_id uuid references events(id) on delete cascade,
+#       user_id uuid references users(id) on delete cascade,
+#       start_date date not null,
+#       slot_minutes smallint not null default 30,
+#       slot_ranges text not null default '',
+#       updated_at timestamptz default now(),
+#       primary key (event_id, user_id)
+#   );
+# Repeated joins are upserts on (event_id, user_id), which PostgREST only
+# accepts with a matching unique constraint (migrations/001_event_members_unique.sql).
+# Without it PostgREST answers 42P10 and joins fall back to a select first.
+MISSING_CONFLICT_TARGET = "42P10"
+# PostgREST's answer when a called function does not exist
+MISSING_FUNCTION = "PGRST202"
+
+AVAILABILITY_STORAGE_TABLES = {
+    "rows": "user_availability",
+    "compact": "user_availability_compact",
+}
+
+
+class _AccountedQuery:
+    """Proxy over a PostgREST builder chain that records each execute()
+
+    The chain of calls becomes the query's signature, so two identical
+    requests within one tracked update show up as a repeat (see querylog).
+    The signature is only rendered while a log is active.
+    """
+
+    __slots__ = ("_target", "_calls")
+
+    def __init__(self, target, calls: Tuple):
+        self._target = target
+        self._calls = calls
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+        if name == "execute":
+            return self._execute
+        if not callable(attr):
+            # Builder properties such as .not_
+            return _AccountedQuery(attr, self._calls + ((name, None, None),))
+
+        def chained(*args, **kwargs):
+            call = (name, args, kwargs)
+            return _AccountedQuery(attr(*args, **kwargs), self._calls + (call,))
+
+        return chained
+
+    def signature(self) -> str:
+        table, *calls = self._calls
+        parts = [table]
+        for name, args, kwargs in calls:
+            if args is None:
+                parts.append(name)
+                continue
+            shown = [brief(arg) for arg in args]
+            shown += [f"{key}={brief(value)}" for key, value in sorted(kwargs.items())]
+            parts.append(f"{name}({', '.join(shown)})")
+        return ".".join(parts)
+
+    def _execute(self):
+        response = self._target.execute()
+        if current_log() is not None:
+            data = getattr(response, "data", None)
+            rows = len(data) if isinstance(data, list) else int(bool(data))
+            record_query(self.signature(), rows)
+        return response
+
+
+class SupabaseDB(Storage):
     """Database interface for meetWhenAh using Supabase"""
 
     def __init__(self):
+        super().__init__()
         self.url = os.getenv("SUPABASE_URL")
         self.key = os.getenv("SUPABASE_ANON_KEY")
 
@@ -38,82 +126,57 @@ class SupabaseDB:
 
         self.client: Client = create_client(self.url, self.key)
 
-    # ==================== USER OPERATIONS ====================
+        self.availability_storage = os.getenv("AVAILABILITY_STORAGE", "rows")
+        if self.availability_storage not in AVAILABILITY_STORAGE_TABLES:
+            raise ValueError(
+                "AVAILABILITY_STORAGE must be one of "
+                + ", ".join(AVAILABILITY_STORAGE_TABLES)
+            )
+        self.availability_table = AVAILABILITY_STORAGE_TABLES[self.availability_storage]
+        # Cleared on the first join that finds the unique constraint missing
+        self._member_upsert = True
+        # Cleared on the first save that finds replace_user_availability missing
+        self._availability_rpc = True
 
-    def create_user(self, user: User) -> User:
-        """Create a new user"""
-        try:
-            result = self.client.table("users").insert(user.to_dict()).execute()
-            if result.data:
-                return User.from_dict(result.data[0])
-            raise Exception("Failed to create user")
-        except Exception as e:
-            ic(f"Error creating user: {e}")
-            raise
+    def _table(self, name: str) -> _AccountedQuery:
+        """Start a query on a table; its round trip is counted per update"""
+        return _AccountedQuery(self.client.table(name), (name,))
 
-    def get_user_by_tele_id(self, tele_id: str) -> Optional[User]:
-        """Get user by Telegram ID"""
-        try:
-            result = (
-                self.client.table("users").select("*").eq("tele_id", tele_id).execute()
-            )
-            if result.data:
-                return User.from_dict(result.data[0])
-            return None
-        except Exception as e:
-            ic(f"Error getting user by tele_id: {e}")
-            return None
+    def _rpc(self, function: str, params: Dict[str, Any]) -> _AccountedQuery:
+        """Call a database function; its round trip is counted per update"""
+        return _AccountedQuery(self.client.rpc(function, params), (f"rpc.{function}",))
 
-    def get_user_by_id(self, user_id: UUID) -> Optional[User]:
-        """Get user by UUID"""
-        try:
-            result = (
-                self.client.table("users").select("*").eq("id", str(user_id)).execute()
-            )
-            if result.data:
-                return User.from_dict(result.data[0])
-            return None
-        except Exception as e:
-            ic(f"Error getting user by id: {e}")
-            return None
+    # ==================== USER OPERATIONS ====================
 
-    def update_user(self, user: User) -> User:
-        """Update existing user"""
-        try:
-            user.updated_at = datetime.now()
-            result = (
-                self.client.table("users")
-                .update(user.to_dict())
-                .eq("id", str(user.id))
-                .execute()
-            )
-            if result.data:
-                return User.from_dict(result.data[0])
-            raise Exception("Failed to update user")
-        except Exception as e:
-            ic(f"Error updating user: {e}")
-            raise
+    def _insert_user(self, user: User) -> User:
+        result = self._table("users").insert(user.to_dict()).execute()
+        if result.data:
+            return User.from_dict(result.data[0])
+        raise Exception("Failed to create user")
+
+    def _fetch_user(self, column: str, value: str) -> Optional[User]:
+        result = self._table("users").select("*").eq(column, value).execute()
+        return User.from_dict(result.data[0]) if result.data else None
 
-    def get_or_create_user(self, tele_id: str, tele_username: str = None) -> User:
-        """Get existing user or create new one"""
-        user = self.get_user_by_tele_id(tele_id)
-        if user:
-            return user
-
-        new_user = User(
-            tele_id=tele_id,
-            tele_username=tele_username,
-            initialised=True,
-            callout_cleared=True,
+    def _fetch_users(self, user_ids: List[str]) -> List[User]:
+        result = self._table("users").select("*").in_("id", user_ids).execute()
+        return [User.from_dict(data) for data in result.data]
+
+    def _write_user(self, user: User) -> User:
+        user.updated_at = datetime.now()
+        result = (
+            self._table("users").update(user.to_dict()).eq("id", str(user.id)).execute()
         )
-        return self.create_user(new_user)
+        if result.data:
+            return User.from_dict(result.data[0])
+        raise Exception("Failed to update user")
 
     # ==================== EVENT OPERATIONS ====================
 
     def create_event(self, event: Event) -> Event:
         """Create a new event"""
         try:
-            result = self.client.table("events").insert(event.to_dict()).execute()
+            result = self._table("events").insert(event.to_dict()).execute()
             if result.data:
                 return Event.from_dict(result.data[0])
             raise Exception("Failed to create event")
@@ -121,51 +184,52 @@ class SupabaseDB:
             ic(f"Error creating event: {e}")
             raise
 
-    def get_event_by_event_id(self, event_id: str) -> Optional[Event]:
-        """Get event by event_id (16-character string)"""
-        try:
-            result = (
-                self.client.table("events")
-                .select("*")
-                .eq("event_id", event_id)
-                .execute()
-            )
-            if result.data:
-                event = Event.from_dict(result.data[0])
-                # Load members and availability data
-                event.members = self.get_event_members(event.id)
-                event.availability_data = self.get_event_availability(event.id)
-                return event
-            return None
-        except Exception as e:
-            ic(f"Error getting event by event_id: {e}")
+    def _relation_select(self, relation: str) -> str:
+        """Embedded select for an Event relation under the configured storage"""
+        if relation == "availability":
+            return f"{self.availability_table}(*)"
+        return EVENT_RELATION_SELECTS[relation]
+
+    def _fetch_event(
+        self, column: str, value: str, load: Iterable[str]
+    ) -> Optional[Event]:
+        """Fetch an event with the requested relations embedded"""
+        select = ", ".join(["*"] + [self._relation_select(r) for r in load])
+        result = self._table("events").select(select).eq(column, value).execute()
+        if not result.data:
             return None
 
-    def get_event_by_id(self, event_id: UUID) -> Optional[Event]:
-        """Get event by UUID"""
-        try:
-            result = (
-                self.client.table("events")
-                .select("*")
-                .eq("id", str(event_id))
-                .execute()
+        return self._event_from_aggregate(result.data[0], load)
+
+    def _event_from_aggregate(
+        self, row: Dict[str, Any], load: Iterable[str] = EVENT_RELATIONS
+    ) -> Event:
+        """Decode an events row with embedded relations, deferring the rest"""
+        event = Event.from_dict(row)
+        if "members" in load:
+            # Embeds come back unordered; use join order, like _fetch_member_ids
+            members = sorted(
+                row.get("event_members") or [],
+                key=lambda member: (member.get("joined_at") or "", member["user_id"]),
             )
-            if result.data:
-                event = Event.from_dict(result.data[0])
-                event.members = self.get_event_members(event.id)
-                event.availability_data = self.get_event_availability(event.id)
-                return event
-            return None
-        except Exception as e:
-            ic(f"Error getting event by id: {e}")
-            return None
+            event.members = [
+                User.from_dict(member["users"])
+                for member in members
+                if member.get("users")
+            ]
+        if "availability" in load:
+            event.availability_data = self._decode_availability(
+                row.get(self.availability_table) or []
+            )
+        self._defer_relations(event, load)
+        return event
 
     def update_event(self, event: Event) -> Event:
         """Update existing event"""
         try:
             event.updated_at = datetime.now()
             result = (
-                self.client.table("events")
+                self._table("events")
                 .update(event.to_dict())
                 .eq("id", str(event.id))
                 .execute()
@@ -176,6 +240,8 @@ class SupabaseDB:
         except Exception as e:
             ic(f"Error updating event: {e}")
             raise
+        finally:
+            self.invalidate_event(event.id)
 
     def update_event_best_timing(
         self,
@@ -195,7 +261,7 @@ class SupabaseDB:
                 "updated_at": datetime.now().isoformat(),
             }
             result = (
-                self.client.table("events")
+                self._table("events")
                 .update(update_data)
                 .eq("id", str(event_id))
                 .execute()
@@ -204,77 +270,59 @@ class SupabaseDB:
         except Exception as e:
             ic(f"Error updating event best timing: {e}")
             raise
+        finally:
+            self.invalidate_event(event_id)
 
     # ==================== EVENT MEMBER OPERATIONS ====================
 
-    def add_event_member(self, event_id: UUID, user_id: UUID) -> EventMember:
-        """Add user to event"""
-        try:
-            member = EventMember(event_id=event_id, user_id=user_id)
-            result = (
-                self.client.table("event_members").insert(member.to_dict()).execute()
-            )
-            if result.data:
-                return EventMember.from_dict(result.data[0])
-            raise Exception("Failed to add event member")
-        except Exception as e:
-            ic(f"Error adding event member: {e}")
-            raise
-
-    def remove_event_member(self, event_id: UUID, user_id: UUID) -> bool:
-        """Remove user from event"""
-        try:
-            result = (
-                self.client.table("event_members")
-                .delete()
-                .eq("event_id", str(event_id))
-                .eq("user_id", str(user_id))
-                .execute()
-            )
-            return True
-        except Exception as e:
-            ic(f"Error removing event member: {e}")
-            return False
-
-    def is_user_event_member(self, event_id: UUID, user_id: UUID) -> bool:
-        """Check if user is member of event"""
-        try:
-            result = (
-                self.client.table("event_members")
-                .select("id")
-                .eq("event_id", str(event_id))
-                .eq("user_id", str(user_id))
-                .execute()
-            )
-            return len(result.data) > 0
-        except Exception as e:
-            ic(f"Error checking event membership: {e}")
-            return False
-
-    def get_event_members(self, event_id: UUID) -> List[User]:
-        """Get all members of an event"""
-        try:
-            result = (
-                self.client.table("event_members")
-                .select("user_id, users(*)")
-                .eq("event_id", str(event_id))
-                .execute()
-            )
+    def _fetch_member_ids(self, event_id: UUID) -> List[str]:
+        result = (
+            self._table("event_members")
+            .select("user_id")
+            .eq("event_id", str(event_id))
+            .order("joined_at")
+            .order("user_id")
+            .execute()
+        )
+        return [row["user_id"] for row in result.data]
+
+    def _upsert_member(self, member: EventMember):
+        # A repeated join click leaves the existing row alone
+        if self._member_upsert:
+            try:
+                self._table("event_members").upsert(
+                    member.to_dict(),
+                    on_conflict="event_id,user_id",
+                    ignore_duplicates=True,
+                ).execute()
+                return
+            except Exception as e:
+                if getattr(e, "code", None) != MISSING_CONFLICT_TARGET:
+                    raise
+                ic(f"event_members has no (event_id, user_id) constraint: {e}")
+                self._member_upsert = False
+
+        existing = (
+            self._table("event_members")
+            .select("id")
+            .eq("event_id", str(member.event_id))
+            .eq("user_id", str(member.user_id))
+            .limit(1)
+            .execute()
+        )
+        if not existing.data:
+            self._table("event_members").insert(member.to_dict()).execute()
 
-            members = []
-            for row in result.data:
-                if row.get("users"):
-                    members.append(User.from_dict(row["users"]))
-            return members
-        except Exception as e:
-            ic(f"Error getting event members: {e}")
-            return []
+    def _delete_member(self, event_id: UUID, user_id: UUID):
+        self._table("event_members").delete().eq("event_id", str(event_id)).eq(
+            "user_id", str(user_id)
+        ).execute()
 
     def get_user_events(self, user_id: UUID) -> List[Event]:
         """Get all events a user is member of"""
         try:
             result = (
-                self.client.table("event_members")
+                self._table("event_members")
                 .select("event_id, events(*)")
                 .eq("user_id", str(user_id))
                 .execute()
@@ -292,61 +340,159 @@ class SupabaseDB:
     # ==================== AVAILABILITY OPERATIONS ====================
 
     def set_user_availability(
-        self, event_id: UUID, user_id: UUID, availability_data: List[Dict[str, str]]
+        self,
+        event_id: UUID,
+        user_id: UUID,
+        availability_data: List[Dict[str, str]],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
     ) -> List[UserAvailability]:
-        """Set user's availability for an event (replaces existing)"""
+        """Set user's availability for an event (replaces existing)
+
+        Slots outside start_date..end_date (the event's range, when given) are
+        ignored.
+        """
         try:
-            # First, remove existing availability
-            self.clear_user_availability(event_id, user_id)
-
-            # Then add new availability
-            availabilities = []
-            for datetime_data in availability_data:
-                availability = UserAvailability.from_webapp_data(
-                    event_id, user_id, datetime_data
-                )
-                availabilities.append(availability)
+            slots = parse_webapp_slots(availability_data, start_date, end_date)
 
-            if availabilities:
-                availability_dicts = [av.to_dict() for av in availabilities]
+            if self.availability_storage == "compact":
+                # One upsert replaces the user's whole row
+                compact = CompactAvailability.from_slots(event_id, user_id, slots)
                 result = (
-                    self.client.table("user_availability")
-                    .insert(availability_dicts)
+                    self._table(self.availability_table)
+                    .upsert(compact.to_dict(), on_conflict="event_id,user_id")
                     .execute()
-                )
-                if result.data:
-                    return [UserAvailability.from_dict(data) for data in result.data]
-
+                ).data
+            else:
+                result = self._replace_availability_rows(event_id, user_id, slots)
+
+            # Apply only the difference to the maintained counts
+            self._update_tally(event_id, user_id, slots)
+            if result:
+                return self._decode_availability(result)
             return []
         except Exception as e:
+            # The stored rows are now unknown, so recount on next use
+            self.invalidate_availability(event_id)
             ic(f"Error setting user availability: {e}")
             raise
+        finally:
+            self.invalidate_event(event_id)
+
+    def _replace_availability_rows(
+        self,
+        event_id: UUID,
+        user_id: UUID,
+        slots: List[Tuple[date, time]],
+    ) -> List[Dict[str, Any]]:
+        """Replace the user's slot rows; returns their rows afterwards
+
+        One atomic round trip through the replace_user_availability function
+        (migrations/002_replace_user_availability.sql), which only deletes and
+        inserts the slots that changed.
+        """
+        if self._availability_rpc:
+            try:
+                return (
+                    self._rpc(
+                        "replace_user_availability",
+                        {
+                            "p_event_id": str(event_id),
+                            "p_user_id": str(user_id),
+                            "p_slots": [
+                                {
+                                    "available_date": available_date.isoformat(),
+                                    "available_time": available_time.isoformat(),
+                                }
+                                for available_date, available_time in slots
+                            ],
+                        },
+                    ).execute()
+                ).data or []
+            except Exception as e:
+                if getattr(e, "code", None) != MISSING_FUNCTION:
+                    raise
+                ic(f"replace_user_availability is not installed: {e}")
+                self._availability_rpc = False
+        return self._apply_availability_diff(event_id, user_id, slots)
+
+    def _apply_availability_diff(
+        self,
+        event_id: UUID,
+        user_id: UUID,
+        slots: List[Tuple[date, time]],
+    ) -> List[Dict[str, Any]]:
+        """Fallback for databases without replace_user_availability
+
+        Reads the user's rows, inserts new slots, then deletes stale ones.
+        This takes three round trips and is not atomic.
+        """
+        current = (
+            self._table("user_availability")
+            .select("*")
+            .eq("event_id", str(event_id))
+            .eq("user_id", str(user_id))
+            .execute()
+        )
+        wanted = set(slots)
+
+        kept, stale_ids = [], []
+        for row in current.data:
+            slot = (
+                date.fromisoformat(row["available_date"]),
+                time.fromisoformat(row["available_time"]),
+            )
+            if slot in wanted:
+                # Keep the existing row (and drop any duplicates of it)
+                kept.append(row)
+                wanted.discard(slot)
+            else:
+                stale_ids.append(row["id"])
+
+        inserted = []
+        if wanted:
+            inserted = (
+                self._table("user_availability")
+                .insert(
+                    availability_rows(
+                        event_id, user_id, [slot for slot in slots if slot in wanted]
+                    )
+                )
+                .execute()
+            ).data or []
+        if stale_ids:
+            self._table("user_availability").delete().in_("id", stale_ids).execute()
+        return kept + inserted
+
+    def _delete_user_availability(self, event_id: UUID, user_id: UUID):
+        """Delete a user's availability rows for an event"""
+        self._table(self.availability_table).delete().eq("event_id", str(event_id)).eq(
+            "user_id", str(user_id)
+        ).execute()
 
     def clear_user_availability(self, event_id: UUID, user_id: UUID) -> bool:
         """Clear all availability for a user in an event"""
         try:
-            result = (
-                self.client.table("user_availability")
-                .delete()
-                .eq("event_id", str(event_id))
-                .eq("user_id", str(user_id))
-                .execute()
-            )
+            self._delete_user_availability(event_id, user_id)
+            self._update_tally(event_id, user_id, [])
             return True
         except Exception as e:
+            self.invalidate_availability(event_id)
             ic(f"Error clearing user availability: {e}")
             return False
+        finally:
+            self.invalidate_event(event_id)
 
     def get_event_availability(self, event_id: UUID) -> List[UserAvailability]:
         """Get all availability data for an event"""
         try:
             result = (
-                self.client.table("user_availability")
+                self._table(self.availability_table)
                 .select("*")
                 .eq("event_id", str(event_id))
                 .execute()
             )
-            return [UserAvailability.from_dict(data) for data in result.data]
+            return self._decode_availability(result.data)
         except Exception as e:
             ic(f"Error getting event availability: {e}")
             return []
@@ -357,60 +503,63 @@ class SupabaseDB:
         """Get availability data for specific user in an event"""
         try:
             result = (
-                self.client.table("user_availability")
+                self._table(self.availability_table)
                 .select("*")
                 .eq("event_id", str(event_id))
                 .eq("user_id", str(user_id))
                 .execute()
             )
-            return [UserAvailability.from_dict(data) for data in result.data]
+            return self._decode_availability(result.data)
         except Exception as e:
             ic(f"Error getting user availability: {e}")
             return []
 
-    def get_availability_summary(self, event_id: UUID) -> List[AvailabilitySlot]:
-        """Get aggregated availability summary for an event"""
+    def _decode_availability(
+        self, rows: List[Dict[str, Any]]
+    ) -> List[UserAvailability]:
+        """Per-slot records from rows of the configured availability table"""
+        if self.availability_storage == "compact":
+            return [
+                availability
+                for row in rows
+                for availability in CompactAvailability.from_dict(
+                    row
+                ).to_user_availability()
+            ]
+        return [UserAvailability.from_dict(data) for data in rows]
+
+    def get_availability_grid(
+        self,
+        event_id: UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Optional[AvailabilityGrid]:
+        """Load an event's availability into a bitset grid (no user records)"""
         try:
-            # Get availability with user data
+            if self.availability_storage == "compact":
+                result = (
+                    self._table(self.availability_table)
+                    .select("event_id, user_id, start_date, slot_minutes, slot_ranges")
+                    .eq("event_id", str(event_id))
+                    .execute()
+                )
+                return AvailabilityGrid.from_compact(
+                    [CompactAvailability.from_dict(row) for row in result.data],
+                    [],
+                    start_date,
+                    end_date,
+                )
+
             result = (
-                self.client.table("user_availability")
-                .select("available_date, available_time, user_id, users(*)")
+                self._table("user_availability")
+                .select("user_id, available_date, available_time")
                 .eq("event_id", str(event_id))
                 .execute()
             )
-
-            # Group by date and time
-            availability_map = {}
-            for row in result.data:
-                key = (row["available_date"], row["available_time"])
-                if key not in availability_map:
-                    availability_map[key] = []
-                if row.get("users"):
-                    availability_map[key].append(User.from_dict(row["users"]))
-
-            # Convert to AvailabilitySlot objects
-            slots = []
-            for (date_str, time_str), users in availability_map.items():
-                slots.append(
-                    AvailabilitySlot(
-                        available_date=date.fromisoformat(date_str),
-                        available_time=time.fromisoformat(time_str),
-                        participant_count=len(users),
-                        available_users=users,
-                    )
-                )
-
-            return slots
+            return AvailabilityGrid.from_rows(result.data, [], start_date, end_date)
         except Exception as e:
-            ic(f"Error getting availability summary: {e}")
-            return []
-
-    def calculate_best_meeting_times(
-        self, event_id: UUID, limit: int = 10
-    ) -> List[AvailabilitySlot]:
-        """Calculate and return best meeting times for an event"""
-        availability_slots = self.get_availability_summary(event_id)
-        return AvailabilityCalculator.find_best_times(availability_slots, limit)
+            ic(f"Error getting availability grid: {e}")
+            return None
 
     # ==================== TELEGRAM GROUP OPERATIONS ====================
 
@@ -420,7 +569,7 @@ class SupabaseDB:
         """Get existing Telegram group or create new one"""
         try:
             result = (
-                self.client.table("telegram_groups")
+                self._table("telegram_groups")
                 .select("*")
                 .eq("group_id", group_id)
                 .execute()
@@ -433,9 +582,7 @@ class SupabaseDB:
                 group_id=group_id, group_name=group_name, group_type=group_type
             )
             result = (
-                self.client.table("telegram_groups")
-                .insert(new_group.to_dict())
-                .execute()
+                self._table("telegram_groups").insert(new_group.to_dict()).execute()
             )
             if result.data:
                 return TelegramGroup.from_dict(result.data[0])
@@ -454,11 +601,7 @@ class SupabaseDB:
                 group_id=group_id,
                 inline_message_id=inline_message_id,
             )
-            result = (
-                self.client.table("event_group_shares")
-                .insert(share.to_dict())
-                .execute()
-            )
+            result = self._table("event_group_shares").insert(share.to_dict()).execute()
             if result.data:
                 return EventGroupShare.from_dict(result.data[0])
             raise Exception("Failed to create event group share")
@@ -472,7 +615,7 @@ class SupabaseDB:
         """Get all group shares for an event"""
         try:
             result = (
-                self.client.table("event_group_shares")
+                self._table("event_group_shares")
                 .select("*, telegram_groups(*)")
                 .eq("event_id", str(event_id))
                 .execute()
@@ -491,46 +634,6 @@ class SupabaseDB:
 
     # ==================== UTILITY METHODS ====================
 
-    def update_event_display_text(self, event_id: UUID) -> str:
-        """Update and return the display text for an event"""
-        try:
-            event = self.get_event_by_id(event_id)
-            if not event:
-                return ""
-
-            # Calculate best times
-            best_slots = self.calculate_best_meeting_times(event_id, 1)
-            if best_slots:
-                best_slot = best_slots[0]
-                self.update_event_best_timing(
-                    event_id,
-                    best_slot.available_date,
-                    best_slot.available_time,
-                    best_slot.available_time,  # For now, just use same time
-                    best_slot.participant_count,
-                )
-                event.best_date = best_slot.available_date
-                event.best_start_time = best_slot.available_time
-                event.best_end_time = best_slot.available_time
-                event.max_participants = best_slot.participant_count
-
-            # Generate display text
-            display_text = event.generate_display_text()
-
-            # Update in database
-            update_data = {
-                "display_text": display_text,
-                "updated_at": datetime.now().isoformat(),
-            }
-            self.client.table("events").update(update_data).eq(
-                "id", str(event_id)
-            ).execute()
-
-            return display_text
-        except Exception as e:
-            ic(f"Error updating event display text: {e}")
-            return ""
-
-
-# Create global database instance
-db = SupabaseDB()
+    def _write_event_fields(self, event_id: UUID, values: Dict[str, Any]):
+        """Update the given columns of an event row in one request"""
+        self._table("events").update(values).eq("id", str(event_id)).execute()
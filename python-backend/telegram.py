@@ -1,6 +1,7 @@
 from dotenv import load_dotenv
 import telebot
 from telebot import types
+from telebot.async_telebot import AsyncTeleBot
 from telebot.util import quick_markup
 import logging
 import os
@@ -11,16 +12,24 @@ from typing import Union
 import uvicorn
 import time
 import json
+import asyncio
+import contextlib
+import functools
+import inspect
 from icecream import ic
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, time as day_time
 import random
 import string
 import urllib.parse
 import re
 
 # Import new Supabase classes
-from supabase_db import db
-from classes import User, Event
+from storage import db, async_db
+from classes import User, Event, DISPLAY_TEXT_LIMIT
+from workers import UpdateWorkerPool
+from outbound import OutboundSender, AsyncOutboundSender
+from querylog import track_queries
+import metrics
 
 
 load_dotenv()
@@ -36,11 +45,32 @@ WEBHOOK_URL_PATH = "/%s/" % (TOKEN)
 
 logger = telebot.logger
 telebot.logger.setLevel(logging.DEBUG)
+metrics.instrument_telegram_api()
 
 bot = telebot.TeleBot(
     TOKEN, parse_mode="HTML", threaded=False
 )  # You can set parse_mode by default. HTML or MARKDOWN
-app = fastapi.FastAPI(docs=None, redoc_url=None)
+# Every send and edit goes through the rate limiter so bursts of joins on one
+# invite collapse into the latest text instead of hitting 429s
+outbound = OutboundSender(bot)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # update_pool is set up further down, under WEBHOOK STUFF
+    if os.getenv("BOT_MODE") == "webhook":
+        update_pool.start()
+        bot.remove_webhook()
+        bot.set_webhook(
+            url=WEBHOOK_URL_BASE + WEBHOOK_URL_PATH, secret_token=WEBHOOK_SECRET
+        )
+    yield
+    # Finish queued updates, then the edits they queued, before the process exits
+    update_pool.shutdown(drain=True, timeout=WEBHOOK_DRAIN_TIMEOUT)
+    outbound.flush(timeout=WEBHOOK_DRAIN_TIMEOUT)
+
+
+app = fastapi.FastAPI(docs=None, redoc_url=None, lifespan=lifespan)
 app.type = "00"
 
 
@@ -50,13 +80,262 @@ def index():
     return ""
 
 
+# """######################################SHARED BUILDERS"""
+# Message texts and markups used by both the threaded bot and the asyncio bot
+
+WELCOME_MESSAGE = """<b>meet when ah? –</b> Say hello to efficient planning and wave goodbye to "so when r we meeting ah?". 
+This bot is for the trip that <b>will</b> make it out of the groupchat. 
+
+Click <b>Create Event</b> to get started <b>now</b>!
+
+Need help? Type /help for more info on commands!
+	"""  # Create events in private messages using /event, and send your invites to the group!
+
+HELP_MESSAGE = """New to <b>meet when ah?</b> <b>DM</b> me <b>/start</b> to create a new event!
+	
+	"""
+
+
+def welcome_markup():
+    markup = types.ReplyKeyboardMarkup(row_width=1)
+    web_app_info = types.WebAppInfo(url=DATEPICKER_URL)
+    web_app_button = types.KeyboardButton(text="Create Event", web_app=web_app_info)
+    markup.add(web_app_button)
+    return markup
+
+
+# Extra Calculate buttons: option -> (button text, description, find_best_window args)
+CALCULATE_OPTIONS = {
+    "2h": ("Best 2h", "2-hour window", {"min_duration_minutes": 120}),
+    "weekend": (
+        "Weekend 3h",
+        "3-hour weekend window",
+        {"min_duration_minutes": 180, "weekdays": (5, 6)},
+    ),
+    "evening": (
+        "Full evening",
+        "full evening (1800 - 2200)",
+        {
+            "min_duration_minutes": 240,
+            "start_time": day_time(18),
+            "end_time": day_time(22),
+        },
+    ),
+}
+
+
+def event_markup(event_id):
+    """Join / Calculate buttons shown under a shared event"""
+    markup = types.InlineKeyboardMarkup().add(
+        types.InlineKeyboardButton("Join event", callback_data=event_id),
+        types.InlineKeyboardButton(
+            "Calculate Best Timing",
+            callback_data=str("Calculate " + event_id),
+        ),
+    )
+    markup.row(
+        *(
+            types.InlineKeyboardButton(
+                text, callback_data=f"Calculate {event_id} {option}"
+            )
+            for option, (text, _, _) in CALCULATE_OPTIONS.items()
+        )
+    )
+    return markup
+
+
+def unit_of_work(handler):
+    """Run a handler in one storage unit of work, so each event it touches is
+    loaded once and its display text and best timing are written together"""
+    if inspect.iscoroutinefunction(handler):
+
+        @functools.wraps(handler)
+        async def async_wrapper(*args, **kwargs):
+            async with async_db.unit_of_work():
+                return await handler(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        with db.unit_of_work():
+            return handler(*args, **kwargs)
+
+    return wrapper
+
+
+def callback_event_id(data):
+    """Event id carried by a Join or Calculate callback"""
+    return str(data).split()[1] if "Calculate" in str(data) else str(data)
+
+
+def calculate_option(data):
+    """(description, find_best_window args) carried by a Calculate callback
+
+    The option is a CALCULATE_OPTIONS key or a number of minutes, e.g.
+    "Calculate <event_id> 90". None for the plain Calculate button.
+    """
+    parts = str(data).split()
+    if len(parts) < 3:
+        return None
+    option = parts[2]
+    if option in CALCULATE_OPTIONS:
+        _, description, query = CALCULATE_OPTIONS[option]
+        return description, query
+    if option.isdigit() and int(option) > 0:
+        return f"{option}-minute window", {"min_duration_minutes": int(option)}
+    return None
+
+
+def window_text(description, window):
+    """Line appended to the event text for a Calculate option"""
+    if not window:
+        return f"\n\nBest {description}: none found yet"
+    return (
+        f"\n\nBest {description}: {window.available_date.strftime('%-d %b %Y')}"
+        f" [{window.start_time.strftime('%H%M')} - {window.end_time.strftime('%H%M')}]"
+        f", {window.participant_count} free"
+    )
+
+
+def update_dispatch_key(update):
+    """Ordering key for an update: its event where we can tell, else its chat"""
+    if update.callback_query:
+        return ("event", callback_event_id(update.callback_query.data))
+    if update.inline_query:
+        # Inline queries only read, and Telegram drops answers after about
+        # 10s, so they must not queue behind an event's joins
+        return ("chat", update.inline_query.from_user.id)
+    if update.message:
+        # telebot only sets web_app_data on messages that carry it
+        web_app_data = getattr(update.message, "web_app_data", None)
+        if web_app_data:
+            try:
+                event_id = json.loads(web_app_data.data).get("event_id")
+            except ValueError:
+                event_id = None
+            if event_id:
+                return ("event", event_id)
+        return ("chat", update.message.chat.id)
+    return None
+
+
+def start_callout(username, where="direct"):
+    return f"\n <b>@{username}, please do /start in a {where} message with me at @meetwhenah_bot. Click the join button again when you are done!</b>"
+
+
+def api_error_message(error_data):
+    """User-facing text for an error response from the webapp API"""
+    error_msg = error_data.get("error", "Unknown error occurred")
+    details = error_data.get("details", "")
+    debug_info = error_data.get("debug_info", {})
+    event_id = error_data.get("event_id", "Unknown")
+
+    full_error_msg = f"❌ Error saving availability: {error_msg}"
+    if details:
+        full_error_msg += f"\n\nDetails: {details}"
+    if debug_info:
+        # Extract useful debug info for user
+        user_name = debug_info.get("user_name", "Unknown")
+        full_error_msg += f"\n\nDebug: User detected as '{user_name}'"
+
+    full_error_msg += f"\n\nEvent ID: {event_id}"
+    full_error_msg += "\n\nPlease try again, or contact support if this persists."
+    return full_error_msg
+
+
+def submission_confirmation(event, user_info):
+    """Confirmation text and Calculate markup after an availability submission"""
+    confirmation_message = (
+        f"✅ Your availability has been saved for <b>{event.event_name}</b>!\n\n"
+        f"👤 User: {user_info['name']}\n"
+        f"📅 Event: {event.event_name}\n"
+        f"💾 Data saved successfully to database"
+    )
+    markup = types.InlineKeyboardMarkup()
+    calculate_button = types.InlineKeyboardButton(
+        text="Calculate Best Times", callback_data=f"Calculate {event.event_id}"
+    )
+    markup.add(calculate_button)
+    return confirmation_message, markup
+
+
+def submission_error_message(response_data):
+    error_msg = response_data.get("error", "Unknown error occurred")
+    details = response_data.get("details", "")
+    debug_info = response_data.get("debug_info", {})
+
+    full_error_msg = f"❌ Error saving availability: {error_msg}"
+    if details:
+        full_error_msg += f"\n\nDetails: {details}"
+    if debug_info:
+        full_error_msg += f"\n\nDebug info: {debug_info}"
+    return full_error_msg
+
+
+def new_event_from_webapp(event_data, creator):
+    """Build an Event from datepicker data, or None if the dates are missing"""
+    start_date = event_data["start"]
+    end_date = event_data["end"]
+    if start_date is None or end_date is None:
+        return None
+
+    return Event(
+        event_id="".join(random.choices(string.ascii_letters + string.digits, k=16)),
+        event_name=event_data["event_name"],
+        event_details=event_data["event_details"],
+        creator_id=creator.id,
+        start_date=datetime.strptime(start_date, "%Y-%m-%d").date(),
+        end_date=datetime.strptime(end_date, "%Y-%m-%d").date(),
+    )
+
+
+def share_markup(event):
+    markup = types.InlineKeyboardMarkup()
+    share_button = types.InlineKeyboardButton(
+        text="Share Event",
+        switch_inline_query=event.event_name + ":" + event.event_id,
+    )
+    markup.add(share_button)
+    return markup
+
+
+def availability_markup(event):
+    """Keyboard that opens the dragselector for an event"""
+    data = {
+        "event_id": event.event_id,
+        "start": event.start_date.strftime("%Y-%m-%d"),
+        "end": event.end_date.strftime("%Y-%m-%d"),
+        "event_name": event.event_name,
+    }
+
+    markup = types.ReplyKeyboardMarkup(row_width=1)
+    url = create_web_app_url(DRAGSELECTOR_URL, data=data)
+    print(url)
+    web_app_info = types.WebAppInfo(url=url)
+    web_app_button = types.KeyboardButton(text="Set availability", web_app=web_app_info)
+    markup.add(web_app_button)
+    return markup
+
+
+def create_web_app_url(base_url, data):
+    # base_url = 'https://your-web-app.com/'
+    # Assuming 'data' is a dictionary, convert it to a query string
+
+    query_string = urllib.parse.urlencode(data)
+    ic(query_string)
+    ic(data)
+    return f"{base_url}?{query_string}"
+
+
 # """######################################COMMANDS"""
+BOT_COMMANDS = [
+    telebot.types.BotCommand("/start", "Starts the bot!"),
+    telebot.types.BotCommand("/help", "Help"),
+    # telebot.types.BotCommand("/event", "Creates a new event")
+]
 bot.set_my_commands(
-    commands=[
-        telebot.types.BotCommand("/start", "Starts the bot!"),
-        telebot.types.BotCommand("/help", "Help"),
-        # telebot.types.BotCommand("/event", "Creates a new event")
-    ],
+    commands=BOT_COMMANDS,
     # scope=telebot.types.BotCommandScopeChat(12345678)  # use for personal command for users
     # scope=telebot.types.BotCommandScopeAllPrivateChats()  # use for all private chats
 )
@@ -64,14 +343,6 @@ bot.set_my_commands(
 
 @bot.message_handler(commands=["start"])
 def send_welcome(message):
-    reply_message = """<b>meet when ah? –</b> Say hello to efficient planning and wave goodbye to "so when r we meeting ah?". 
-This bot is for the trip that <b>will</b> make it out of the groupchat. 
-
-Click <b>Create Event</b> to get started <b>now</b>!
-
-Need help? Type /help for more info on commands!
-	"""  # Create events in private messages using /event, and send your invites to the group!
-
     if message.chat.type == "private":
         # Use new Supabase user management
         user = db.get_or_create_user(
@@ -87,28 +358,21 @@ Need help? Type /help for more info on commands!
             user.callout_cleared = True
             db.update_user(user)
 
-        markup = types.ReplyKeyboardMarkup(row_width=1)
-        web_app_info = types.WebAppInfo(url=DATEPICKER_URL)
-        web_app_button = types.KeyboardButton(text="Create Event", web_app=web_app_info)
-        markup.add(web_app_button)
-
-        bot.reply_to(message, reply_message, reply_markup=markup)
+        bot.reply_to(message, WELCOME_MESSAGE, reply_markup=welcome_markup())
 
     else:
-        bot.reply_to(message, reply_message)
+        bot.reply_to(message, WELCOME_MESSAGE)
 
 
 @bot.message_handler(commands=["help"])
 def help(message):
-    reply_message = """New to <b>meet when ah?</b> <b>DM</b> me <b>/start</b> to create a new event!
-	
-	"""
-    bot.reply_to(message, reply_message)
+    bot.reply_to(message, HELP_MESSAGE)
 
 
 @bot.message_handler(content_types=["web_app_data"])
+@unit_of_work
 def handle_webapp(message):
-    bot.send_message(
+    outbound.send_message(
         message.chat.id, "Processing your submission...", reply_markup=types.ReplyKeyboardRemove()
     )
     web_app_data = json.loads(message.web_app_data.data)
@@ -130,39 +394,23 @@ def handle_webapp(message):
         # This is raw dragselector data that should go to API first
         # This should not happen anymore, but handle it just in case
         ic("Received raw dragselector data - this should go through API first")
-        bot.send_message(message.chat.id, "❌ Internal error: dragselector data received directly")
+        outbound.send_message(message.chat.id, "❌ Internal error: dragselector data received directly")
     else:
         ic("Unknown webapp data format:", web_app_data)
-        bot.send_message(message.chat.id, "❌ Unknown data format received")
+        outbound.send_message(message.chat.id, "❌ Unknown data format received")
 
 
 def handle_api_error_response(message, error_data):
     """Handle error response from the webapp API"""
     try:
         ic("Processing API error response:", error_data)
-        
-        error_msg = error_data.get("error", "Unknown error occurred")
-        details = error_data.get("details", "")
-        debug_info = error_data.get("debug_info", {})
-        event_id = error_data.get("event_id", "Unknown")
-        
-        full_error_msg = f"❌ Error saving availability: {error_msg}"
-        if details:
-            full_error_msg += f"\n\nDetails: {details}"
-        if debug_info:
-            # Extract useful debug info for user
-            user_name = debug_info.get("user_name", "Unknown")
-            full_error_msg += f"\n\nDebug: User detected as '{user_name}'"
-            
-        full_error_msg += f"\n\nEvent ID: {event_id}"
-        full_error_msg += "\n\nPlease try again, or contact support if this persists."
-        
+        full_error_msg = api_error_message(error_data)
         ic("Sending error message to user:", full_error_msg)
-        bot.send_message(message.chat.id, full_error_msg)
+        outbound.send_message(message.chat.id, full_error_msg)
         
     except Exception as e:
         ic(f"Error handling API error response: {e}")
-        bot.send_message(message.chat.id, f"❌ Multiple errors occurred. Please try again later.")
+        outbound.send_message(message.chat.id, f"❌ Multiple errors occurred. Please try again later.")
 
 
 def handle_availability_submission(message, response_data):
@@ -175,44 +423,27 @@ def handle_availability_submission(message, response_data):
             user_info = response_data["user"]
             
             # Get the event to show confirmation
-            event = db.get_event_by_event_id(event_id)
+            event = db.get_event_by_event_id(event_id, load=("members",))
             if event:
-                confirmation_message = (
-                    f"✅ Your availability has been saved for <b>{event.event_name}</b>!\n\n"
-                    f"👤 User: {user_info['name']}\n"
-                    f"📅 Event: {event.event_name}\n"
-                    f"💾 Data saved successfully to database"
-                )
-                bot.send_message(message.chat.id, confirmation_message)
+                # The webapp API wrote the rows directly, so drop our cached counts
+                db.invalidate_availability(event.id)
+
+                confirmation_message, markup = submission_confirmation(event, user_info)
+                outbound.send_message(message.chat.id, confirmation_message)
                 
                 # Optionally show updated event info
                 display_text = event.generate_display_text()
-                markup = types.InlineKeyboardMarkup()
-                calculate_button = types.InlineKeyboardButton(
-                    text="Calculate Best Times",
-                    callback_data=f"Calculate {event.event_id}"
-                )
-                markup.add(calculate_button)
-                bot.send_message(message.chat.id, display_text, reply_markup=markup)
+                outbound.send_message(message.chat.id, display_text, reply_markup=markup)
             else:
-                bot.send_message(message.chat.id, "✅ Availability saved, but couldn't load event details.")
+                outbound.send_message(message.chat.id, "✅ Availability saved, but couldn't load event details.")
         else:
-            error_msg = response_data.get("error", "Unknown error occurred")
-            details = response_data.get("details", "")
-            debug_info = response_data.get("debug_info", {})
-            
-            full_error_msg = f"❌ Error saving availability: {error_msg}"
-            if details:
-                full_error_msg += f"\n\nDetails: {details}"
-            if debug_info:
-                full_error_msg += f"\n\nDebug info: {debug_info}"
-                
+            full_error_msg = submission_error_message(response_data)
             ic("Error response data:", response_data)
-            bot.send_message(message.chat.id, full_error_msg)
+            outbound.send_message(message.chat.id, full_error_msg)
             
     except Exception as e:
         ic(f"Error handling availability submission: {e}")
-        bot.send_message(message.chat.id, f"❌ Error processing your submission: {str(e)}")
+        outbound.send_message(message.chat.id, f"❌ Error processing your submission: {str(e)}")
 
 
 def handle_event_creation(message, event_data):
@@ -220,19 +451,6 @@ def handle_event_creation(message, event_data):
     try:
         ic("Processing event creation:", event_data)
         
-        event_name = event_data["event_name"]
-        event_details = event_data["event_details"]
-        start_date = event_data["start"]
-        end_date = event_data["end"]
-
-        if start_date is None or end_date is None:
-            bot.send_message(message.chat.id, "❌ Please enter valid dates")
-            return
-
-        # Parse dates
-        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-        end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-
         # Get or create user
         creator = db.get_or_create_user(
             tele_id=str(message.chat.id),
@@ -242,16 +460,10 @@ def handle_event_creation(message, event_data):
         )
 
         # Create new event using Supabase classes
-        event = Event(
-            event_id="".join(
-                random.choices(string.ascii_letters + string.digits, k=16)
-            ),
-            event_name=event_name,
-            event_details=event_details,
-            creator_id=creator.id,
-            start_date=start_date,
-            end_date=end_date,
-        )
+        event = new_event_from_webapp(event_data, creator)
+        if event is None:
+            outbound.send_message(message.chat.id, "❌ Please enter valid dates")
+            return
 
         created_event = db.create_event(event)
 
@@ -260,21 +472,17 @@ def handle_event_creation(message, event_data):
         created_event.display_text = display_text
         db.update_event(created_event)
 
-        bot.send_message(
+        outbound.send_message(
             message.chat.id,
             "✅ Event created successfully! You can share it using the button below.",
         )
-        markup = types.InlineKeyboardMarkup()
-        share_button = types.InlineKeyboardButton(
-            text="Share Event",
-            switch_inline_query=created_event.event_name + ":" + created_event.event_id,
+        outbound.send_message(
+            message.chat.id, display_text, reply_markup=share_markup(created_event)
         )
-        markup.add(share_button)
-        bot.send_message(message.chat.id, display_text, reply_markup=markup)
                 
     except Exception as e:
         ic(f"Error handling event creation: {e}")
-        bot.send_message(message.chat.id, "❌ Error creating event. Please try again.")
+        outbound.send_message(message.chat.id, "❌ Error creating event. Please try again.")
 
 
 @bot.inline_handler(lambda query: len(query.query) > 0)
@@ -284,7 +492,7 @@ def query_text(inline_query):
         event_id = inline_query.query.split(":")[1]
 
         # Get event using new Supabase system
-        event = db.get_event_by_event_id(event_id)
+        event = db.get_event_by_event_id(event_id, load=())
         if not event:
             return
 
@@ -294,13 +502,7 @@ def query_text(inline_query):
             id="1",
             title=inline_query.query,
             input_message_content=types.InputTextMessageContent(text),
-            reply_markup=types.InlineKeyboardMarkup().add(
-                types.InlineKeyboardButton("Join event", callback_data=event.event_id),
-                types.InlineKeyboardButton(
-                    "Calculate Best Timing",
-                    callback_data=str("Calculate " + event.event_id),
-                ),
-            ),
+            reply_markup=event_markup(event.event_id),
         )
         bot.answer_inline_query(inline_query.id, [r])
     except Exception as e:
@@ -308,17 +510,8 @@ def query_text(inline_query):
         print(e)
 
 
-def create_web_app_url(base_url, data):
-    # base_url = 'https://your-web-app.com/'
-    # Assuming 'data' is a dictionary, convert it to a query string
-
-    query_string = urllib.parse.urlencode(data)
-    ic(query_string)
-    ic(data)
-    return f"{base_url}?{query_string}"
-
-
 @bot.callback_query_handler(func=lambda call: call)
+@unit_of_work
 def handle_join_event(call):
     new_text = ""
     message_id = call.inline_message_id
@@ -327,30 +520,28 @@ def handle_join_event(call):
         # Calculate best timing for event
         event_id = str(call.data).split()[1]
 
-        event = db.get_event_by_event_id(event_id)
+        event = db.get_event_by_event_id(event_id, load=())
         if not event:
             return
 
-        # Calculate best meeting times using new system
-        best_slots = db.calculate_best_meeting_times(event.id, 1)
-        if best_slots:
-            best_slot = best_slots[0]
-
-            # Update event with best timing
-            db.update_event_best_timing(
-                event.id,
-                best_slot.available_date,
-                best_slot.available_time,
-                best_slot.available_time,  # End time same as start for now
-                best_slot.participant_count,
-            )
-
-        # Update display text
+        # Recalculate best timing and update display text
         new_text = db.update_event_display_text(event.id)
 
+        # Window options are answered from the event's prefix-sum index
+        option = calculate_option(call.data)
+        if option:
+            description, query = option
+            line = window_text(description, db.find_best_window(event.id, **query))
+            if len(new_text) + len(line) > DISPLAY_TEXT_LIMIT:
+                # Show fewer members so the window line still fits
+                new_text = db.get_event_by_id(event.id, load=()).generate_display_text(
+                    limit=DISPLAY_TEXT_LIMIT - len(line)
+                )
+            new_text += line
+
     else:
         # User wants to join event
-        event = db.get_event_by_event_id(str(call.data))
+        event = db.get_event_by_event_id(str(call.data), load=())
         if not event:
             return
 
@@ -375,14 +566,14 @@ def handle_join_event(call):
             # Update display text to ask user to start bot
             event.display_text = (
                 (event.display_text or "")
-                + f"\n <b>@{call.from_user.username}, please do /start in a direct message with me at @meetwhenah_bot. Click the join button again when you are done!</b>"
+                + start_callout(call.from_user.username)
             )
             db.update_event(event)
             new_text = event.display_text
 
         elif user.initialised and not user.callout_cleared:
             # User has started bot, remove callout and add to event
-            old_string = f"\n <b>@{call.from_user.username}, please do /start in a private message with me at @meetwhenah_bot. Click the join button again when you are done!</b>"
+            old_string = start_callout(call.from_user.username, "private")
             if event.display_text:
                 event.display_text = event.display_text.replace(old_string, "")
 
@@ -408,30 +599,10 @@ def handle_join_event(call):
             ic("Asking Availability...")
 
     # Update the inline message
-    bot.edit_message_text(
+    outbound.edit_message_text(
         text=f"{new_text}",
         inline_message_id=message_id,
-        reply_markup=types.InlineKeyboardMarkup().add(
-            types.InlineKeyboardButton(
-                "Join event",
-                callback_data=(
-                    str(call.data).split()[1]
-                    if "Calculate" in str(call.data)
-                    else str(call.data)
-                ),
-            ),
-            types.InlineKeyboardButton(
-                "Calculate Best Timing",
-                callback_data=str(
-                    "Calculate "
-                    + (
-                        str(call.data).split()[1]
-                        if "Calculate" in str(call.data)
-                        else str(call.data)
-                    )
-                ),
-            ),
-        ),
+        reply_markup=event_markup(callback_event_id(call.data)),
     )
 
 
@@ -440,50 +611,380 @@ def ask_availability(tele_id, event_id):
     text = "Click the button below to set your availability!"
 
     # Get event using new Supabase system
-    event = db.get_event_by_event_id(str(event_id))
+    event = db.get_event_by_event_id(str(event_id), load=())
     if not event:
         ic(f"Event not found: {event_id}")
         return
 
-    data = {
-        "event_id": event_id,
-        "start": event.start_date.strftime("%Y-%m-%d"),
-        "end": event.end_date.strftime("%Y-%m-%d"),
-        "event_name": event.event_name,
-    }
+    markup = availability_markup(event)
+    outbound.send_message(tele_id, text, reply_markup=markup)
 
-    markup = types.ReplyKeyboardMarkup(row_width=1)
-    url = create_web_app_url(DRAGSELECTOR_URL, data=data)
-    print(url)
-    web_app_info = types.WebAppInfo(url=url)
-    web_app_button = types.KeyboardButton(text="Set availability", web_app=web_app_info)
-    markup.add(web_app_button)
 
-    bot.send_message(tele_id, text, reply_markup=markup)
+############################# ASYNC BOT ###############################################
+# The same handlers on telebot's asyncio bot. Database calls go through
+# AsyncStorage, so a slow query only suspends its own update and many chats
+# are served concurrently from one process. Start with BOT_ASYNC=1.
+async_bot = AsyncTeleBot(TOKEN, parse_mode="HTML")
+async_outbound = AsyncOutboundSender(async_bot)
+
+
+@async_bot.message_handler(commands=["start"])
+async def send_welcome_async(message):
+    if message.chat.type == "private":
+        user = await async_db.get_or_create_user(
+            tele_id=str(message.from_user.id),
+            tele_username=(
+                str(message.from_user.username) if message.from_user.username else None
+            ),
+        )
+
+        # Update user status if needed
+        if not user.initialised or not user.callout_cleared:
+            user.initialised = True
+            user.callout_cleared = True
+            await async_db.update_user(user)
+
+        await async_bot.reply_to(message, WELCOME_MESSAGE, reply_markup=welcome_markup())
+
+    else:
+        await async_bot.reply_to(message, WELCOME_MESSAGE)
+
+
+@async_bot.message_handler(commands=["help"])
+async def help_async(message):
+    await async_bot.reply_to(message, HELP_MESSAGE)
+
+
+@async_bot.message_handler(content_types=["web_app_data"])
+@unit_of_work
+async def handle_webapp_async(message):
+    await async_outbound.send_message(
+        message.chat.id, "Processing your submission...", reply_markup=types.ReplyKeyboardRemove()
+    )
+    web_app_data = json.loads(message.web_app_data.data)
+    ic("Received webapp data:", web_app_data)
+
+    if "success" in web_app_data and "event_id" in web_app_data:
+        if web_app_data.get("success"):
+            await handle_availability_submission_async(message, web_app_data)
+        else:
+            await handle_api_error_response_async(message, web_app_data)
+    elif "web_app_number" in web_app_data and web_app_data["web_app_number"] == 0:
+        await handle_event_creation_async(message, web_app_data)
+    elif "web_app_number" in web_app_data and web_app_data["web_app_number"] == 1:
+        ic("Received raw dragselector data - this should go through API first")
+        await async_outbound.send_message(message.chat.id, "❌ Internal error: dragselector data received directly")
+    else:
+        ic("Unknown webapp data format:", web_app_data)
+        await async_outbound.send_message(message.chat.id, "❌ Unknown data format received")
+
+
+async def handle_api_error_response_async(message, error_data):
+    """Handle error response from the webapp API"""
+    try:
+        ic("Processing API error response:", error_data)
+        await async_outbound.send_message(message.chat.id, api_error_message(error_data))
+    except Exception as e:
+        ic(f"Error handling API error response: {e}")
+        await async_outbound.send_message(message.chat.id, f"❌ Multiple errors occurred. Please try again later.")
+
+
+async def handle_availability_submission_async(message, response_data):
+    """Handle availability submission response from the webapp API"""
+    try:
+        ic("Processing availability submission:", response_data)
+
+        if response_data.get("success"):
+            event = await async_db.get_event_by_event_id(
+                response_data["event_id"], load=("members",)
+            )
+            if event:
+                # The webapp API wrote the rows directly, so drop our cached counts
+                await async_db.invalidate_availability(event.id)
+
+                confirmation_message, markup = submission_confirmation(
+                    event, response_data["user"]
+                )
+                await async_outbound.send_message(message.chat.id, confirmation_message)
+                await async_outbound.send_message(
+                    message.chat.id, event.generate_display_text(), reply_markup=markup
+                )
+            else:
+                await async_outbound.send_message(message.chat.id, "✅ Availability saved, but couldn't load event details.")
+        else:
+            ic("Error response data:", response_data)
+            await async_outbound.send_message(message.chat.id, submission_error_message(response_data))
+
+    except Exception as e:
+        ic(f"Error handling availability submission: {e}")
+        await async_outbound.send_message(message.chat.id, f"❌ Error processing your submission: {str(e)}")
+
+
+async def handle_event_creation_async(message, event_data):
+    """Handle event creation from the datepicker webapp"""
+    try:
+        ic("Processing event creation:", event_data)
+
+        creator = await async_db.get_or_create_user(
+            tele_id=str(message.chat.id),
+            tele_username=(
+                str(message.from_user.username) if message.from_user.username else None
+            ),
+        )
+
+        event = new_event_from_webapp(event_data, creator)
+        if event is None:
+            await async_outbound.send_message(message.chat.id, "❌ Please enter valid dates")
+            return
+
+        created_event = await async_db.create_event(event)
+        display_text = created_event.generate_display_text()
+        created_event.display_text = display_text
+        await async_db.update_event(created_event)
+
+        await async_outbound.send_message(
+            message.chat.id,
+            "✅ Event created successfully! You can share it using the button below.",
+        )
+        await async_outbound.send_message(
+            message.chat.id, display_text, reply_markup=share_markup(created_event)
+        )
+
+    except Exception as e:
+        ic(f"Error handling event creation: {e}")
+        await async_outbound.send_message(message.chat.id, "❌ Error creating event. Please try again.")
+
+
+@async_bot.inline_handler(lambda query: len(query.query) > 0)
+async def query_text_async(inline_query):
+    try:
+        event_id = inline_query.query.split(":")[1]
+
+        event = await async_db.get_event_by_event_id(event_id, load=())
+        if not event:
+            return
+
+        text = event.display_text or event.generate_display_text()
+        r = types.InlineQueryResultArticle(
+            id="1",
+            title=inline_query.query,
+            input_message_content=types.InputTextMessageContent(text),
+            reply_markup=event_markup(event.event_id),
+        )
+        await async_bot.answer_inline_query(inline_query.id, [r])
+    except Exception as e:
+        ic(f"Error in inline query: {e}")
+
+
+@async_bot.callback_query_handler(func=lambda call: call)
+@unit_of_work
+async def handle_join_event_async(call):
+    new_text = ""
+    message_id = call.inline_message_id
+
+    if "Calculate" in str(call.data):
+        event = await async_db.get_event_by_event_id(callback_event_id(call.data), load=())
+        if not event:
+            return
+
+        option = calculate_option(call.data)
+        if option:
+            description, query = option
+            new_text, window = await asyncio.gather(
+                async_db.update_event_display_text(event.id),
+                async_db.find_best_window(event.id, **query),
+            )
+            line = window_text(description, window)
+            if len(new_text) + len(line) > DISPLAY_TEXT_LIMIT:
+                # Show fewer members so the window line still fits
+                event = await async_db.get_event_by_id(event.id, load=())
+                new_text = await asyncio.to_thread(
+                    event.generate_display_text, DISPLAY_TEXT_LIMIT - len(line)
+                )
+            new_text += line
+        else:
+            new_text = await async_db.update_event_display_text(event.id)
+
+    else:
+        # Event and user lookups are independent, so run them together
+        event, user = await asyncio.gather(
+            async_db.get_event_by_event_id(str(call.data), load=()),
+            async_db.get_user_by_tele_id(str(call.from_user.id)),
+        )
+        if not event:
+            return
+
+        if user and await async_db.is_user_event_member(event.id, user.id):
+            return
+
+        if not user:
+            user = await async_db.create_user(
+                User(
+                    tele_id=str(call.from_user.id),
+                    tele_username=(
+                        str(call.from_user.username) if call.from_user.username else None
+                    ),
+                    initialised=False,
+                    callout_cleared=False,
+                )
+            )
+
+            event.display_text = (event.display_text or "") + start_callout(
+                call.from_user.username
+            )
+            await async_db.update_event(event)
+            new_text = event.display_text
+
+        elif user.initialised and not user.callout_cleared:
+            old_string = start_callout(call.from_user.username, "private")
+            if event.display_text:
+                event.display_text = event.display_text.replace(old_string, "")
+
+            await async_db.add_event_member(event.id, user.id)
+
+            user.callout_cleared = True
+            new_text, _ = await asyncio.gather(
+                async_db.update_event_display_text(event.id),
+                async_db.update_user(user),
+            )
+
+        else:
+            await async_db.add_event_member(event.id, user.id)
+
+            # The DM prompt does not depend on the new display text
+            new_text, _ = await asyncio.gather(
+                async_db.update_event_display_text(event.id),
+                ask_availability_async(call.from_user.id, event.event_id),
+            )
+
+    await async_outbound.edit_message_text(
+        text=f"{new_text}",
+        inline_message_id=message_id,
+        reply_markup=event_markup(callback_event_id(call.data)),
+    )
+
+
+async def ask_availability_async(tele_id, event_id):
+    event = await async_db.get_event_by_event_id(str(event_id), load=())
+    if not event:
+        ic(f"Event not found: {event_id}")
+        return
+
+    await async_outbound.send_message(
+        tele_id,
+        "Click the button below to set your availability!",
+        reply_markup=availability_markup(event),
+    )
+
+
+async def run_async_polling():
+    await async_bot.set_my_commands(commands=BOT_COMMANDS)
+    await async_bot.remove_webhook()
+    await async_bot.infinity_polling(timeout=10)
 
 
 ############################# WEBHOOK STUFF ###############################################
-# bot.remove_webhook()
-# @app.post(f'/{TOKEN}/')
-# def process_webhook(update: dict):
-# 	"""
-# 	Process webhook calls
-# 	"""
-# 	if update:
-# 		update = telebot.types.Update.de_json(update)
-# 		bot.process_new_updates([update])
-# 	else:
-# 		return
-
-# #Set webhook
-# bot.set_webhook(url=WEBHOOK_URL_BASE + WEBHOOK_URL_PATH)
-# #				certificate=open(WEBHOOK_SSL_CERT, 'r'))
+# Run under uvicorn (uvicorn telegram:app) with BOT_MODE=webhook. Telegram gets
+# an immediate 200 and the update is handled by a bounded worker pool; when the
+# queue is full we answer 503 and Telegram redelivers it later.
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "500"))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "25"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Storage round trips allowed per update before it is reported (unset = no limit)
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "0")) or None
+
+
+def update_kind(update):
+    for kind in ("callback_query", "inline_query", "message"):
+        if getattr(update, kind, None) is not None:
+            return kind
+    return "other"
+
+
+def process_update(update):
+    """Handle one update, accounting for the storage round trips it makes"""
+    kind = update_kind(update)
+    with track_queries(kind, budget=QUERY_BUDGET, strict=False) as log:
+        bot.process_new_updates([update])
+    metrics.UPDATE_QUERIES.observe(kind, value=log.round_trips)
+
+
+update_pool = UpdateWorkerPool(
+    process_update,
+    workers=WEBHOOK_WORKERS,
+    queue_size=WEBHOOK_QUEUE_SIZE,
+    name="webhook",
+    # Joins and Calculate clicks rewrite the same inline message, so updates for
+    # one event run in order while different events run in parallel
+    key=update_dispatch_key,
+)
+
+
+@app.post(WEBHOOK_URL_PATH)
+async def process_webhook(request: Request):
+    """
+    Process webhook calls
+    """
+    if (
+        WEBHOOK_SECRET
+        and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET
+    ):
+        return fastapi.Response(status_code=403)
+
+    update = telebot.types.Update.de_json(await request.json())
+    if not update or not update_pool.submit(update):
+        return fastapi.Response(status_code=503)
+    return ""
+
+
+@app.get("/health")
+def health():
+    return {
+        "webhook": update_pool.stats(),
+        "event_cache": db.event_cache_stats(),
+        "user_cache": db.user_cache_stats(),
+        "outbound": outbound.stats(),
+    }
+
+
+############################# METRICS ###############################################
+# Handler, storage and Bot API latencies in Prometheus format. Handlers are
+# wrapped here, after every decorator above has registered them.
+metrics.instrument_bot(bot)
+metrics.instrument_bot(async_bot)
+metrics.REGISTRY.register_stats(
+    "meetwhenah_webhook", "Webhook worker pool", update_pool.stats
+)
+metrics.REGISTRY.register_stats(
+    "meetwhenah_event_cache", "Event cache", db.event_cache_stats
+)
+metrics.REGISTRY.register_stats(
+    "meetwhenah_user_cache", "User cache", db.user_cache_stats
+)
+metrics.REGISTRY.register_stats(
+    "meetwhenah_outbound", "Outbound sender", outbound.stats
+)
+metrics.REGISTRY.register_stats(
+    "meetwhenah_async_outbound", "Async outbound sender", async_outbound.stats
+)
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return fastapi.Response(
+        metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
 
 ############################# POLLING SETUP ###############################################
 if __name__ == "__main__":
-    print("Starting bot with polling...")
-    bot.remove_webhook()
-    bot.infinity_polling(timeout=10, long_polling_timeout=5)
+    if os.getenv("BOT_ASYNC") == "1":
+        print("Starting async bot with polling...")
+        asyncio.run(run_async_polling())
+    else:
+        print("Starting bot with polling...")
+        bot.remove_webhook()
+        bot.infinity_polling(timeout=10, long_polling_timeout=5)
 
 ########################### LAMBDA STUFF #################################################
 # bot.remove_webhook()
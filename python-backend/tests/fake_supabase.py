@@ -0,0 +1,215 @@
+"""In-memory stand-in for the Supabase client, enough for SupabaseDB's queries"""
+
+import copy
+import re
+import uuid
+
+from postgrest.exceptions import APIError
+
+# (table, embedded table) -> (local column, remote column)
+FOREIGN_KEYS = {
+    ("event_members", "users"): ("user_id", "id"),
+    ("event_members", "events"): ("event_id", "id"),
+    ("user_availability", "users"): ("user_id", "id"),
+    ("event_group_shares", "telegram_groups"): ("group_id", "id"),
+    ("events", "event_members"): ("id", "event_id"),
+    ("events", "user_availability"): ("id", "event_id"),
+    ("events", "user_availability_compact"): ("id", "event_id"),
+}
+ONE_TO_MANY = {
+    ("events", "event_members"),
+    ("events", "user_availability"),
+    ("events", "user_availability_compact"),
+}
+
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+
+
+def split_columns(select: str) -> list:
+    """Split a select string on the commas outside embedded parentheses"""
+    columns, depth, current = [], 0, ""
+    for char in select:
+        depth += (char == "(") - (char == ")")
+        if char == "," and depth == 0:
+            columns.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        columns.append(current.strip())
+    return columns
+
+
+class Query:
+    def __init__(self, client, table):
+        self.client, self.table = client, table
+        self.op, self.columns, self.filters, self.payload = "select", "*", [], None
+        self.on_conflict, self.ignore_duplicates = None, False
+
+    def select(self, columns="*", **kwargs):
+        if self.op == "select":
+            self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, lambda x: str(x) == str(value)))
+        return self
+
+    def in_(self, column, values):
+        values = set(map(str, values))
+        self.filters.append((column, lambda x: str(x) in values))
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self.op, self.payload = "upsert", payload
+        self.on_conflict, self.ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def limit(self, count):
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def matches(self, row):
+        return all(test(row.get(column)) for column, test in self.filters)
+
+    def project(self, table, row, select):
+        out = {}
+        for column in split_columns(select):
+            embed = re.match(r"(\w+)(?:!\w+)?\((.*)\)$", column)
+            if embed:
+                name, inner = embed.groups()
+                local, remote = FOREIGN_KEYS[(table, name)]
+                rows = [
+                    self.project(name, other, inner)
+                    for other in self.client.tables.setdefault(name, [])
+                    if str(other.get(remote)) == str(row.get(local))
+                ]
+                if (table, name) in ONE_TO_MANY:
+                    out[name] = rows
+                else:
+                    out[name] = rows[0] if rows else None
+            elif column == "*":
+                out.update(copy.deepcopy(row))
+            else:
+                out[column] = copy.deepcopy(row.get(column))
+        return out
+
+    def execute(self):
+        self.client.calls.append((self.table, self.op))
+        rows = self.client.tables.setdefault(self.table, [])
+        if self.op == "select":
+            return Result(
+                [
+                    self.project(self.table, r, self.columns)
+                    for r in rows
+                    if self.matches(r)
+                ]
+            )
+        if self.op in ("insert", "upsert"):
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            out = []
+            for row in payload:
+                row = dict(row)
+                row.setdefault("id", str(uuid.uuid4()))
+                if (self.table, self.on_conflict) in self.client.missing_constraints:
+                    raise APIError({"code": "42P10", "message": "no unique constraint"})
+                if self.op == "upsert" and self.on_conflict:
+                    keys = self.on_conflict.split(",")
+                    existing = [
+                        r
+                        for r in rows
+                        if all(str(r.get(k)) == str(row.get(k)) for k in keys)
+                    ]
+                    if existing:
+                        if not self.ignore_duplicates:
+                            existing[0].update(
+                                {k: v for k, v in row.items() if k != "id"}
+                            )
+                            out.append(dict(existing[0]))
+                        continue
+                rows.append(row)
+                out.append(dict(row))
+            return Result(out)
+        if self.op == "update":
+            out = []
+            for row in rows:
+                if self.matches(row):
+                    row.update(self.payload)
+                    out.append(dict(row))
+            return Result(out)
+        out = [row for row in rows if self.matches(row)]
+        self.client.tables[self.table] = [r for r in rows if not self.matches(r)]
+        return Result(out)
+
+
+class Call:
+    """A database function call, run against the fake tables"""
+
+    def __init__(self, client, name, params):
+        self.client, self.name, self.params = client, name, params
+
+    def execute(self):
+        self.client.calls.append((self.name, "rpc"))
+        return Result(getattr(self.client, self.name)(**self.params))
+
+
+class FakeClient:
+    """Tables are lists of row dicts; every executed query is logged in calls"""
+
+    def __init__(self):
+        self.tables, self.calls = {}, []
+        # (table, on_conflict) pairs whose unique constraint is not deployed
+        self.missing_constraints = set()
+        # Database functions that have been installed by a migration
+        self.functions = set()
+
+    def table(self, name):
+        return Query(self, name)
+
+    def rpc(self, name, params):
+        if name not in self.functions:
+            raise APIError({"code": "PGRST202", "message": f"{name} not found"})
+        return Call(self, name, params)
+
+    def replace_user_availability(self, p_event_id, p_user_id, p_slots):
+        wanted = {(s["available_date"], s["available_time"]) for s in p_slots}
+
+        def mine(row):
+            return (row["event_id"], row["user_id"]) == (p_event_id, p_user_id)
+
+        rows = self.tables.setdefault("user_availability", [])
+        kept = [
+            row
+            for row in rows
+            if not mine(row) or (row["available_date"], row["available_time"]) in wanted
+        ]
+        have = {(r["available_date"], r["available_time"]) for r in kept if mine(r)}
+        for available_date, available_time in sorted(wanted - have):
+            kept.append(
+                {
+                    "id": str(uuid.uuid4()),
+                    "event_id": p_event_id,
+                    "user_id": p_user_id,
+                    "available_date": available_date,
+                    "available_time": available_time,
+                }
+            )
+        self.tables["user_availability"] = kept
+        return [dict(row) for row in kept if mine(row)]
@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+import telebot
+
+from benchmarks import replay, run
+from benchmarks.harness import measure
+from benchmarks.synthetic import SLOTS_PER_DAY, generate
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_synthetic_density_and_payload():
+    data = generate(users=4, days=3, density=0.25, seed=1)
+    assert len(data.users) == 4
+    assert len(data.rows) >= 4 * 0.25 * 3 * SLOTS_PER_DAY
+    first = str(data.users[0].id)
+    assert len(data.payload) == sum(row["user_id"] == first for row in data.rows)
+
+
+CASES = run.cases(generate(users=3, days=2, density=0.2))
+
+
+@pytest.mark.parametrize("name, fn, number", CASES, ids=[case[0] for case in CASES])
+def test_every_case_runs(name, fn, number):
+    result = measure(fn, number=1, repeat=1)
+    assert result["seconds"] >= 0
+
+
+def test_replay_runs_without_failures(tmp_path):
+    report = tmp_path / "replay.json"
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.replay", "--updates", "60"]
+        + ["--events", "2", "--json", str(report)],
+        cwd=BACKEND,
+        check=True,
+        capture_output=True,
+    )
+    result = json.loads(report.read_text())
+    assert result["updates"] == 60
+    assert result["failed"] == 0
+    assert result["handlers"]
+
+
+def test_synthetic_updates_parse_as_telegram_updates():
+    for raw in replay.synthetic_updates(50, users=5, events=["E" * 16]):
+        update = telebot.types.Update.de_json(raw)
+        assert update.message or update.inline_query or update.callback_query
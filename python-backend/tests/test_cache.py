@@ -0,0 +1,57 @@
+import time
+
+from cache import TTLCache
+
+
+def test_get_set_and_expiry():
+    cache = TTLCache(maxsize=4, ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_load_started_before_invalidate_is_rejected():
+    cache = TTLCache(ttl=None)
+    generation = cache.generation()
+    # A write lands while the loader is still reading the old value
+    cache.invalidate("a")
+    assert not cache.set("a", "stale", generation)
+    assert cache.get("a") is None
+    assert cache.set("a", "fresh", cache.generation())
+    assert cache.get("a") == "fresh"
+
+
+def test_invalidating_other_keys_does_not_reject_a_load():
+    cache = TTLCache(ttl=None)
+    generation = cache.generation()
+    cache.invalidate("b")
+    assert cache.set("a", 1, generation)
+
+
+def test_forgotten_stamps_reject_old_loads():
+    cache = TTLCache(maxsize=2, ttl=None)
+    generation = cache.generation()
+    cache.invalidate("a")
+    for key in range(20):
+        cache.invalidate(key)
+    # The stamp for "a" may be gone, but the load is older than the floor
+    assert not cache.set("a", "stale", generation)
+
+
+def test_clear_rejects_in_flight_loads():
+    cache = TTLCache(ttl=None)
+    generation = cache.generation()
+    cache.clear()
+    assert not cache.set("a", 1, generation)
@@ -0,0 +1,364 @@
+import random
+from datetime import date, time, timedelta
+from uuid import UUID, uuid4
+
+import pytest
+
+from classes import (
+    AvailabilityCalculator,
+    AvailabilityGrid,
+    AvailabilitySlot,
+    AvailabilityTally,
+    CompactAvailability,
+    Event,
+    EventMembership,
+    User,
+    UserAvailability,
+    WindowIndex,
+    decode_slot_ranges,
+    encode_slot_ranges,
+    parse_webapp_slots,
+)
+
+
+def random_grid(seed: int, days: int = 7, users: int = 6) -> AvailabilityGrid:
+    """A grid with a few users free in random runs of slots"""
+    rng = random.Random(seed)
+    start = date(2025, 7, 1)
+    grid = AvailabilityGrid(start, start + timedelta(days=rng.randint(0, days - 1)))
+    for _ in range(rng.randint(1, users)):
+        user_id = uuid4()
+        grid.user_bit(user_id)
+        for _ in range(rng.randint(0, 8)):
+            first = rng.randrange(grid.num_slots)
+            for index in range(first, min(grid.num_slots, first + rng.randint(1, 10))):
+                grid.add(user_id, index)
+    return grid
+
+
+def slot_times(grid: AvailabilityGrid, user_id) -> list:
+    return [grid.slot_datetime(index) for index in grid.user_slots(user_id)]
+
+
+def free_for_window(grid: AvailabilityGrid, day: int, start: int, width: int) -> int:
+    """Members free for every slot of [start, start + width) on a day"""
+    mask = (1 << len(grid.user_ids)) - 1
+    for slot in range(start, start + width):
+        mask &= grid.slot_masks[day * grid.slots_per_day + slot]
+    return bin(mask).count("1")
+
+
+# ==================== GRID ====================
+
+
+def test_slot_index_round_trips():
+    grid = AvailabilityGrid(date(2025, 7, 1), date(2025, 7, 3))
+    for index in (0, 17, grid.num_slots - 1):
+        assert grid.slot_index(*grid.slot_datetime(index)) == index
+    assert grid.slot_index(date(2025, 7, 4), time(9)) is None
+
+
+def test_grid_counts_and_common_slots():
+    grid = AvailabilityGrid(date(2025, 7, 1), date(2025, 7, 1))
+    alice, bob = uuid4(), uuid4()
+    for index in (18, 19, 20):
+        grid.add(alice, index)
+    for index in (19, 20, 21):
+        grid.add(bob, index)
+    assert grid.participant_count(19) == 2
+    assert grid.common_slots([alice, bob]) == [19, 20]
+    assert grid.available_user_ids(21) == [bob]
+    assert grid.user_slots(alice) == [18, 19, 20]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_best_slots_match_the_calculator(seed):
+    grid = random_grid(seed)
+    summary = grid.summary()
+    assert summary == sorted(
+        summary, key=lambda s: (s.available_date, s.available_time)
+    )
+    assert grid.best_slots(5) == AvailabilityCalculator.find_best_times(summary, 5)
+    assert list(grid.iter_summary()) == summary
+    assert AvailabilityCalculator.find_best_times(
+        grid.iter_summary(), 5
+    ) == grid.best_slots(5)
+
+
+def test_find_best_times_keeps_sort_order_on_ties():
+    day = date(2025, 7, 1)
+    slots = [
+        AvailabilitySlot(
+            available_date=day, available_time=time(hour), participant_count=2
+        )
+        for hour in (12, 9, 15, 10)
+    ]
+    best = AvailabilityCalculator.find_best_times(iter(slots), 2)
+    assert [slot.available_time for slot in best] == [time(9), time(10)]
+    assert AvailabilityCalculator.find_best_times(slots, 0) == []
+
+
+def test_find_best_indices_ranks_counts_without_slots():
+    counts = [(7, 2), (3, 1), (9, 2), (4, 2)]
+    assert AvailabilityCalculator.find_best_indices(iter(counts), 2) == [4, 7]
+    assert AvailabilityCalculator.find_best_indices(counts, 0) == []
+
+
+def test_to_matrix_matches_masks():
+    grid = random_grid(3)
+    matrix = grid.to_matrix()
+    for index, mask in enumerate(grid.slot_masks):
+        day, slot = divmod(index, grid.slots_per_day)
+        for bit in range(len(grid.user_ids)):
+            assert matrix[day, slot, bit] == bool(mask >> bit & 1)
+
+
+# ==================== WINDOWS ====================
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_best_windows_match_brute_force(seed):
+    grid = random_grid(seed)
+    duration = random.Random(seed).choice([30, 60, 90, 120])
+    width = duration // grid.slot_minutes
+    windows = AvailabilityCalculator.find_best_windows(grid, duration, top_k=1)
+    by_date = {window.available_date: window for window in windows}
+    for day in range(grid.num_days):
+        best = max(
+            free_for_window(grid, day, start, width)
+            for start in range(grid.slots_per_day - width + 1)
+        )
+        window = by_date.get(grid.start_date + timedelta(days=day))
+        assert (window.participant_count if window else 0) == best
+        if window:
+            assert window.duration_minutes >= duration
+            first = grid.slot_index(window.available_date, window.start_time)
+            slots = range(first, first + window.duration_minutes // grid.slot_minutes)
+            for user_id in window.available_user_ids:
+                assert set(slots) <= set(grid.user_slots(user_id))
+
+
+def test_windows_on_a_day_do_not_overlap():
+    grid = random_grid(5)
+    windows = AvailabilityCalculator.find_best_windows(grid, 60, top_k=3)
+    taken = set()
+    for window in windows:
+        first = grid.slot_index(window.available_date, window.start_time)
+        slots = set(range(first, first + window.duration_minutes // grid.slot_minutes))
+        assert not slots & taken
+        taken |= slots
+
+
+# ==================== TALLY ====================
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_tally_equals_rebuild(seed):
+    rng = random.Random(seed)
+    grid = random_grid(seed)
+    tally = AvailabilityTally(grid)
+    for _ in range(10):
+        user_id = rng.choice(grid.user_ids + [uuid4()])
+        indices = rng.sample(range(grid.num_slots), rng.randint(0, 12))
+        assert tally.set_user_availability(
+            user_id, [grid.slot_datetime(index) for index in indices]
+        )
+
+    rebuilt = AvailabilityGrid(grid.start_date, grid.end_date)
+    for user_id in grid.user_ids:
+        for available_date, available_time in slot_times(grid, user_id):
+            rebuilt.add_availability(user_id, available_date, available_time)
+    fresh = AvailabilityTally(rebuilt)
+
+    assert tally.counts == fresh.counts
+    assert tally.max_count == fresh.max_count
+    assert tally.best_slot_indices(10) == fresh.best_slot_indices(10)
+    assert tally.best_slot_indices(10) == grid.best_slot_indices(10)
+
+
+def test_tally_rejects_slot_outside_grid():
+    grid = AvailabilityGrid(date(2025, 7, 1), date(2025, 7, 1))
+    tally = AvailabilityTally(grid)
+    assert not tally.set_user_availability(uuid4(), [(date(2025, 7, 2), time(9))])
+    assert tally.max_count == 0
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_tally_best_window_matches_calculator(seed):
+    grid = random_grid(seed)
+    tally = AvailabilityTally(grid)
+    assert tally.best_window() == AvailabilityCalculator.best_window(
+        grid, grid.slot_minutes
+    )
+
+
+# ==================== WINDOW INDEX ====================
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_window_index_matches_brute_force(seed):
+    rng = random.Random(seed)
+    grid = random_grid(seed, days=14)
+    index = WindowIndex(grid)
+    weekdays = set(rng.sample(range(7), rng.randint(1, 7)))
+    start_time = time(rng.randrange(0, 20))
+    end_time = time(rng.randrange(start_time.hour + 1, 24))
+    duration = rng.choice([30, 60, 90, 120])
+
+    windows = index.best_windows(duration, 1, 1, weekdays, start_time, end_time)
+    by_date = {window.available_date: window for window in windows}
+    width = duration // grid.slot_minutes
+    lo, hi = start_time.hour * 2, end_time.hour * 2
+    for day in range(grid.num_days):
+        day_date = grid.start_date + timedelta(days=day)
+        best = 0
+        if day_date.weekday() in weekdays:
+            best = max(
+                (
+                    free_for_window(grid, day, s, width)
+                    for s in range(lo, hi - width + 1)
+                ),
+                default=0,
+            )
+        window = by_date.get(day_date)
+        assert (window.participant_count if window else 0) == best
+        if window:
+            assert start_time <= window.start_time
+            assert window.end_time <= end_time
+            assert window.duration_minutes >= duration
+
+
+def test_window_index_is_rebuilt_after_tally_change():
+    grid = random_grid(1)
+    tally = AvailabilityTally(grid)
+    index = tally.window_index()
+    assert tally.window_index() is index
+    tally.set_user_availability(uuid4(), [grid.slot_datetime(0)])
+    assert tally.window_index() is not index
+
+
+# ==================== MODEL ====================
+
+
+def test_from_dict_parses_fields_on_first_read():
+    row = {
+        "id": str(uuid4()),
+        "tele_id": "1",
+        "tele_username": "alice",
+        "created_at": "2025-07-01T09:00:00+00:00",
+    }
+    user = User.from_dict(row)
+    assert not hasattr(user, "__dict__")
+    assert user.id == UUID(row["id"])
+    assert user.created_at.year == 2025
+    assert user.updated_at is None
+    assert User.from_dict(user.to_dict()).to_dict() == user.to_dict()
+
+
+def test_row_without_an_id_is_written_without_one():
+    user = User.from_dict({"tele_id": "1", "tele_username": "alice"})
+    assert user.id is None
+    assert "id" not in user.to_dict()
+    event = Event.from_dict({"event_id": "E" * 16, "event_name": "Lunch"})
+    assert "id" not in event.to_dict()
+
+
+def test_availability_rows_round_trip():
+    availability = UserAvailability(
+        event_id=uuid4(),
+        user_id=uuid4(),
+        available_date=date(2025, 7, 1),
+        available_time=time(9, 30),
+    )
+    again = UserAvailability.from_dict(availability.to_dict())
+    assert again.to_dict() == availability.to_dict()
+    assert again.available_time == time(9, 30)
+
+
+# ==================== EVENT ====================
+
+
+def test_deferred_relation_runs_its_loader_once():
+    event = Event(event_name="Trip", creator_id=uuid4())
+    calls = []
+    event.defer("members", lambda: calls.append(1) or ["member"])
+    assert not event.is_loaded("members")
+    assert event.members == ["member"]
+    assert event.members == ["member"]
+    assert calls == [1]
+
+
+def test_assigning_a_relation_drops_its_loader():
+    event = Event(event_name="Trip", creator_id=uuid4())
+    event.defer("availability", lambda: pytest.fail("loader should not run"))
+    event.availability_data = []
+    assert event.is_loaded("availability")
+    assert event.availability_data == []
+
+
+def test_membership_snapshot_is_immutable():
+    alice, bob = uuid4(), uuid4()
+    membership = EventMembership(uuid4(), [alice])
+    joined = membership.with_member(bob).with_member(bob)
+    assert alice in joined and bob in joined
+    assert len(joined.user_ids) == 2
+    assert bob not in membership
+    assert bob not in joined.without_member(bob)
+
+
+def test_display_text_respects_limit():
+    event = Event(
+        event_name="Trip",
+        creator_id=uuid4(),
+        start_date=date(2025, 7, 1),
+        end_date=date(2025, 7, 3),
+    )
+    event.members = [User(tele_username=f"member{i:04d}") for i in range(500)]
+    text = event.generate_display_text(limit=1000)
+    assert len(text) <= 1000
+    assert text.rstrip().endswith("more")
+    assert "member0000" in text
+
+
+# ==================== CODECS ====================
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_slot_range_codec_round_trips(seed):
+    rng = random.Random(seed)
+    indices = sorted(set(rng.sample(range(2000), rng.randint(0, 200))))
+    assert decode_slot_ranges(encode_slot_ranges(indices)) == indices
+
+
+def test_slot_range_encoding():
+    assert encode_slot_ranges([3, 0, 1, 2, 8, 10, 11, 10]) == "0-3,8,10-11"
+    assert encode_slot_ranges([]) == ""
+    assert decode_slot_ranges("") == []
+
+
+def test_compact_availability_round_trips():
+    event_id, user_id = uuid4(), uuid4()
+    slots = [
+        (date(2025, 7, 1), time(9)),
+        (date(2025, 7, 1), time(9, 30)),
+        (date(2025, 7, 3), time(23, 30)),
+    ]
+    compact = CompactAvailability.from_slots(event_id, user_id, slots, date(2025, 7, 1))
+    again = CompactAvailability.from_dict(compact.to_dict())
+    assert again.slots() == slots
+    assert again.slot_ranges == "18-19,143"
+    assert again.event_id == event_id and again.start_date == date(2025, 7, 1)
+    assert CompactAvailability.from_dict(compact.to_dict()).event_id is again.event_id
+
+
+def test_parse_webapp_slots_filters_and_dedupes():
+    payload = [
+        {"date": "02/07/2025", "time": "0930"},
+        {"date": "01/07/2025", "time": "1000"},
+        {"date": "02/07/2025", "time": "0930"},
+        {"date": "09/07/2025", "time": "1000"},
+    ]
+    assert parse_webapp_slots(payload, date(2025, 7, 1), date(2025, 7, 3)) == [
+        (date(2025, 7, 1), time(10)),
+        (date(2025, 7, 2), time(9, 30)),
+    ]
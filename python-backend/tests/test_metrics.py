@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+import metrics
+from storage import create_storage
+
+
+def storage_calls(method: str) -> int:
+    """Observations recorded for a storage method so far"""
+    return sum(metrics.STORAGE_SECONDS._values.get((method,), [0])[:-1])
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("t_seconds", "test", ["op"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe("read", value=value)
+    assert histogram.samples() == [
+        't_seconds_bucket{op="read",le="0.1"} 1',
+        't_seconds_bucket{op="read",le="1"} 2',
+        't_seconds_bucket{op="read",le="+Inf"} 3',
+        't_seconds_sum{op="read"} 5.55',
+        't_seconds_count{op="read"} 3',
+    ]
+
+
+def test_timed_counts_errors_for_sync_and_async():
+    histogram = metrics.Histogram("t_seconds", "test", ["op"])
+    errors = metrics.Counter("t_errors_total", "test", ["op"])
+
+    def fail():
+        raise ValueError("boom")
+
+    async def succeed():
+        return "ok"
+
+    with pytest.raises(ValueError):
+        metrics.timed(histogram, errors, "fail", fail)()
+    assert asyncio.run(metrics.timed(histogram, errors, "ok", succeed)()) == "ok"
+    assert errors.samples() == ['t_errors_total{op="fail"} 1']
+    assert {labels for labels in histogram._values} == {("fail",), ("ok",)}
+
+
+def test_render_includes_stats_gauges():
+    registry = metrics.Registry()
+    registry.register(metrics.Counter("t_total", "test")).inc()
+    registry.register_stats("t_cache", "Cache", lambda: {"hits": 3, "name": "x"})
+    text = registry.render()
+    assert "# TYPE t_total counter\nt_total 1" in text
+    assert "t_cache_hits 3" in text
+    assert "t_cache_name" not in text
+
+
+def test_instrumented_storage_records_each_method():
+    db = metrics.instrument_storage(create_storage("memory"))
+    before = storage_calls("get_user_by_tele_id")
+    db.get_user_by_tele_id("404")
+    assert storage_calls("get_user_by_tele_id") == before + 1
+
+
+def test_unit_of_work_is_timed_over_its_block():
+    db = metrics.instrument_storage(create_storage("memory"))
+    before = metrics.STORAGE_SECONDS._values.get(("unit_of_work",), [0])[-1]
+    with db.unit_of_work():
+        time.sleep(0.02)
+    after = metrics.STORAGE_SECONDS._values[("unit_of_work",)][-1]
+    assert after - before >= 0.02
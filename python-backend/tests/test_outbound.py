@@ -0,0 +1,134 @@
+import threading
+import time
+
+from outbound import OutboundSender, TokenBucket
+
+
+class RecordingBot:
+    """Stands in for TeleBot, recording every edit it is asked to send"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.edits = []
+        self._lock = threading.Lock()
+
+    def edit_message_text(self, **payload):
+        time.sleep(self.latency)
+        with self._lock:
+            self.edits.append(payload["text"])
+        return True
+
+
+class TooManyRequests(Exception):
+    error_code = 429
+    result_json = {"parameters": {"retry_after": 0.05}}
+
+
+def test_token_bucket_reserves_future_tokens():
+    bucket = TokenBucket(rate=2, capacity=1)
+    assert bucket.reserve() == 0.0
+    assert 0.4 < bucket.reserve() <= 0.5
+    assert 0.9 < bucket.reserve() <= 1.0
+
+
+def test_rapid_edits_coalesce_to_bucket_rate():
+    bot = RecordingBot()
+    sender = OutboundSender(bot, global_rate=1000, chat_rate=4, chat_burst=1)
+    edits = 40
+
+    started = time.monotonic()
+    for number in range(edits):
+        sender.edit_message_text(f"text {number}", inline_message_id="invite")
+        time.sleep(0.01)
+    # Queuing never waits on the bucket
+    queued_in = time.monotonic() - started
+    assert queued_in < 1.0
+
+    assert sender.flush(timeout=5)
+    elapsed = time.monotonic() - started
+    # At most one send per token: the burst plus rate * elapsed
+    assert len(bot.edits) <= 1 + int(4 * elapsed) + 1
+    assert len(bot.edits) < edits / 4
+    assert bot.edits[-1] == f"text {edits - 1}"
+    assert sender.stats()["coalesced"] == edits - len(bot.edits)
+
+
+def test_edits_of_different_messages_are_not_coalesced():
+    bot = RecordingBot()
+    sender = OutboundSender(bot, global_rate=1000, chat_rate=1000, chat_burst=10)
+    for number in range(5):
+        sender.edit_message_text("same", inline_message_id=f"invite-{number}")
+    assert sender.flush(timeout=5)
+    assert len(bot.edits) == 5
+
+
+def test_unchanged_edit_is_skipped():
+    bot = RecordingBot()
+    sender = OutboundSender(bot, global_rate=1000, chat_rate=1000, chat_burst=10)
+    sender.edit_message_text("hello", inline_message_id="invite")
+    assert sender.flush(timeout=5)
+    sender.edit_message_text("hello", inline_message_id="invite")
+    assert sender.flush(timeout=5)
+    assert bot.edits == ["hello"]
+    assert sender.stats()["unchanged"] == 1
+
+
+def test_not_modified_error_counts_as_unchanged():
+    def edit_message_text(**payload):
+        raise Exception("Bad Request: message is not modified")
+
+    bot = RecordingBot()
+    bot.edit_message_text = edit_message_text
+    sender = OutboundSender(bot, global_rate=1000, chat_rate=1000, chat_burst=10)
+    sender.edit_message_text("hello", inline_message_id="invite")
+    assert sender.flush(timeout=5)
+    assert sender.stats()["unchanged"] == 1
+
+
+def test_too_many_requests_is_retried_after_the_pause():
+    attempts = []
+
+    def send_message(**kwargs):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise TooManyRequests()
+        return "sent"
+
+    bot = RecordingBot()
+    bot.send_message = send_message
+    sender = OutboundSender(bot, global_rate=1000, chat_rate=1000, chat_burst=10)
+    assert sender.send_message(1, "hello") == "sent"
+    assert attempts[1] - attempts[0] >= 0.05
+    assert sender.stats()["throttled"] == 1
+
+
+def test_throttled_edit_is_retried_by_the_flusher():
+    bot = RecordingBot()
+    record = bot.edit_message_text
+    failures = [TooManyRequests()]
+
+    def edit_message_text(**payload):
+        if failures:
+            raise failures.pop()
+        return record(**payload)
+
+    bot.edit_message_text = edit_message_text
+    sender = OutboundSender(bot, global_rate=1000, chat_rate=1000, chat_burst=10)
+    assert sender.edit_message_text("hello", inline_message_id="invite") is None
+    assert sender.flush(timeout=5)
+    assert bot.edits == ["hello"]
+    assert sender.stats()["throttled"] == 1
+
+
+def test_each_replaced_edit_counts_as_coalesced_once():
+    bot = RecordingBot()
+    sender = OutboundSender(bot, global_rate=1000, chat_rate=1, chat_burst=1)
+    # The first edit takes the only token, so the next three wait together
+    sender.edit_message_text("first", inline_message_id="invite")
+    assert sender.flush(timeout=5)
+    for text in ("a", "b", "c"):
+        sender.edit_message_text(text, inline_message_id="invite")
+    assert sender.stats()["coalesced"] == 2
+    assert sender.stats()["pending_edits"] == 1
+    assert sender.flush(timeout=5)
+    assert bot.edits == ["first", "c"]
@@ -0,0 +1,38 @@
+import pytest
+
+from querylog import QueryBudgetExceeded, record_query, track_queries
+
+
+def test_queries_are_counted_in_the_active_log():
+    with track_queries(budget=3) as log:
+        record_query("users.select(id=1)", rows=1)
+        record_query("events.select(id=2)", rows=4)
+    assert log.round_trips == 2
+    assert log.rows == 5
+    assert not log.duplicates
+
+
+def test_no_log_outside_a_tracked_block():
+    record_query("users.select(id=1)")
+
+
+def test_over_budget_raises_when_strict():
+    with pytest.raises(QueryBudgetExceeded):
+        with track_queries(budget=1):
+            record_query("a")
+            record_query("b")
+
+
+def test_over_budget_is_only_reported_when_not_strict():
+    with track_queries(budget=1, strict=False) as log:
+        record_query("a")
+        record_query("b")
+    assert log.over_budget
+
+
+def test_repeated_queries_are_reported():
+    with pytest.raises(QueryBudgetExceeded):
+        with track_queries(allow_duplicates=False) as log:
+            record_query("users.select(id=1)")
+            record_query("users.select(id=1)")
+    assert log.duplicates == {"users.select(id=1)": 2}
@@ -0,0 +1,343 @@
+from datetime import date, time
+from time import sleep
+
+import pytest
+
+from classes import AvailabilityCalculator, Event, User, UserAvailability
+from querylog import track_queries
+from storage import Storage, create_storage
+
+
+@pytest.fixture
+def db():
+    return create_storage("memory")
+
+
+@pytest.fixture
+def event(db):
+    creator = db.create_user(User(tele_id="1", tele_username="creator"))
+    return db.create_event(
+        Event(
+            event_id="E" * 16,
+            event_name="Lunch",
+            creator_id=creator.id,
+            start_date=date(2025, 7, 1),
+            end_date=date(2025, 7, 3),
+        )
+    )
+
+
+def make_users(db, count):
+    return [
+        db.create_user(User(tele_id=str(100 + i), tele_username=f"user{i}"))
+        for i in range(count)
+    ]
+
+
+def webapp_slots(day, *times):
+    return [{"date": day, "time": slot} for slot in times]
+
+
+def member_rows(db, event):
+    return db._query(
+        "select user_id from event_members where event_id = ?", (str(event.id),)
+    )
+
+
+def test_incomplete_backend_fails_when_created():
+    class Incomplete(Storage):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+# ==================== MEMBERS ====================
+
+
+def test_duplicate_join_leaves_one_membership_row(db, event):
+    (user,) = make_users(db, 1)
+    db.add_event_member(event.id, user.id)
+    db.add_event_member(event.id, user.id)
+    db.invalidate_membership(event.id)
+    db.add_event_member(event.id, user.id)
+
+    assert len(member_rows(db, event)) == 1
+    assert db.is_user_event_member(event.id, user.id)
+    assert [member.id for member in db.get_event_members(event.id)] == [user.id]
+
+
+def test_members_keep_join_order(db, event):
+    users = make_users(db, 4)
+    for user in reversed(users):
+        db.add_event_member(event.id, user.id)
+    expected = [user.id for user in reversed(users)]
+    assert [m.id for m in db.get_event_members(event.id)] == expected
+
+    db.invalidate_membership(event.id)
+    db.invalidate_event(event.id)
+    loaded = db.get_event_by_id(event.id, load=("members",))
+    assert [m.id for m in loaded.members] == expected
+
+
+def test_members_are_listed(db, event):
+    users = make_users(db, 3)
+    for user in users:
+        db.add_event_member(event.id, user.id)
+    assert {m.id for m in db.get_event_members(event.id)} == {u.id for u in users}
+    assert [e.id for e in db.get_user_events(users[0].id)] == [event.id]
+
+
+def test_removed_member_is_gone(db, event):
+    (user,) = make_users(db, 1)
+    db.add_event_member(event.id, user.id)
+    db.remove_event_member(event.id, user.id)
+    assert not db.is_user_event_member(event.id, user.id)
+    assert member_rows(db, event) == []
+
+
+def test_membership_index_stays_current_without_queries(db, event):
+    alice, bob = make_users(db, 2)
+    db.add_event_member(event.id, alice.id)
+    assert db.is_user_event_member(event.id, alice.id)
+    db.add_event_member(event.id, bob.id)
+    with track_queries(budget=0):
+        assert db.is_user_event_member(event.id, alice.id)
+        assert db.is_user_event_member(event.id, bob.id)
+
+
+# ==================== USERS ====================
+
+
+def test_get_or_create_user_returns_the_existing_user(db):
+    (user,) = make_users(db, 1)
+    assert db.get_or_create_user(user.tele_id).id == user.id
+    created = db.get_or_create_user("999", "new")
+    assert db.get_user_by_id(created.id).tele_username == "new"
+
+
+def test_cached_users_are_copies(db):
+    (user,) = make_users(db, 1)
+    cached = db.get_user_by_tele_id(user.tele_id)
+    cached.tele_username = "changed"
+    assert db.get_user_by_tele_id(user.tele_id).tele_username == "user0"
+
+
+def test_repeat_user_lookup_makes_no_query(db):
+    (user,) = make_users(db, 1)
+    db.get_user_by_tele_id(user.tele_id)
+    with track_queries(budget=0):
+        assert db.get_user_by_tele_id(user.tele_id).id == user.id
+        assert db.get_user_by_id(user.id).id == user.id
+
+
+def test_updated_user_is_written_through(db):
+    (user,) = make_users(db, 1)
+    user = db.get_user_by_id(user.id)
+    user.display_name = "Alice"
+    db.update_user(user)
+    with track_queries(budget=0):
+        assert db.get_user_by_tele_id(user.tele_id).display_name == "Alice"
+
+
+# ==================== AVAILABILITY ====================
+
+
+def test_maintained_tally_equals_a_rebuild(db, event):
+    alice, bob = make_users(db, 2)
+    db.set_user_availability(
+        event.id, alice.id, webapp_slots("01/07/2025", "0900", "0930")
+    )
+    db.get_availability_tally(event.id)
+    db.set_user_availability(
+        event.id, bob.id, webapp_slots("01/07/2025", "0930", "1000")
+    )
+    db.set_user_availability(
+        event.id, alice.id, webapp_slots("01/07/2025", "0930", "1000", "1030")
+    )
+    db.clear_user_availability(event.id, bob.id)
+    db.set_user_availability(event.id, bob.id, webapp_slots("02/07/2025", "1800"))
+
+    maintained = db.calculate_best_meeting_times(event.id, 10)
+    db.invalidate_availability(event.id)
+    assert db.calculate_best_meeting_times(event.id, 10) == maintained
+    assert (
+        AvailabilityCalculator.find_best_times(
+            db.iter_availability_summary(event.id), 10
+        )
+        == maintained
+    )
+    assert db.find_best_times(event.id, 10) == maintained
+    assert list(db.iter_availability_summary(event.id)) == (
+        db.get_availability_summary(event.id)
+    )
+
+
+def test_streamed_best_times_fetch_only_the_winners(db, event, monkeypatch):
+    alice, bob, carol = make_users(db, 3)
+    db.set_user_availability(
+        event.id, alice.id, webapp_slots("01/07/2025", "0900", "0930")
+    )
+    db.set_user_availability(event.id, bob.id, webapp_slots("01/07/2025", "0930"))
+    db.set_user_availability(event.id, carol.id, webapp_slots("02/07/2025", "1800"))
+
+    fetched = []
+    get_users_by_ids = db.get_users_by_ids
+
+    def spy(user_ids):
+        fetched.extend(user_ids)
+        return get_users_by_ids(user_ids)
+
+    monkeypatch.setattr(db, "get_users_by_ids", spy)
+    (best,) = db.find_best_times(event.id, 1)
+    assert (best.available_time, best.participant_count) == (time(9, 30), 2)
+    assert set(fetched) == {alice.id, bob.id}
+
+
+def test_tally_spans_the_event_whoever_builds_it(db, event):
+    (alice,) = make_users(db, 1)
+    db.set_user_availability(event.id, alice.id, webapp_slots("01/07/2025", "0900"))
+    db.calculate_best_meeting_times(event.id)
+    tally = db.get_availability_tally(event.id)
+    assert (tally.grid.start_date, tally.grid.end_date) == (
+        event.start_date,
+        event.end_date,
+    )
+
+    # A slot on a day nobody had picked yet updates the same tally
+    db.set_user_availability(event.id, alice.id, webapp_slots("03/07/2025", "0900"))
+    assert db.get_availability_tally(event.id) is tally
+    (best,) = db.calculate_best_meeting_times(event.id, 1)
+    assert best.available_date == date(2025, 7, 3)
+
+
+def test_tally_expires_so_external_writes_show_up(monkeypatch):
+    monkeypatch.setenv("TALLY_CACHE_TTL", "0.05")
+    db = create_storage("memory")
+    creator = db.create_user(User(tele_id="1", tele_username="creator"))
+    event = db.create_event(
+        Event(
+            event_name="Lunch",
+            creator_id=creator.id,
+            start_date=date(2025, 7, 1),
+            end_date=date(2025, 7, 1),
+        )
+    )
+    db.set_user_availability(event.id, creator.id, webapp_slots("01/07/2025", "0900"))
+    assert db.calculate_best_meeting_times(event.id, 1)[0].participant_count == 1
+
+    # Another process (or the webapp API) adds a row this process never sees
+    (other,) = make_users(db, 1)
+    db._insert(
+        "user_availability",
+        UserAvailability(
+            event_id=event.id,
+            user_id=other.id,
+            available_date=date(2025, 7, 1),
+            available_time=time(9),
+        ).to_dict(),
+    )
+    assert db.calculate_best_meeting_times(event.id, 1)[0].participant_count == 1
+    sleep(0.06)
+    assert db.calculate_best_meeting_times(event.id, 1)[0].participant_count == 2
+
+
+def test_resubmission_replaces_slots(db, event):
+    (alice,) = make_users(db, 1)
+    db.set_user_availability(
+        event.id, alice.id, webapp_slots("01/07/2025", "0900", "0930")
+    )
+    db.set_user_availability(
+        event.id, alice.id, webapp_slots("01/07/2025", "0930", "1000")
+    )
+    slots = sorted(
+        a.available_time for a in db.get_user_availability(event.id, alice.id)
+    )
+    assert slots == [time(9, 30), time(10)]
+
+
+def test_best_windows_cover_common_slots(db, event):
+    alice, bob = make_users(db, 2)
+    evening = ["1800", "1830", "1900", "1930", "2000", "2030", "2100", "2130"]
+    db.set_user_availability(event.id, alice.id, webapp_slots("03/07/2025", *evening))
+    db.set_user_availability(event.id, bob.id, webapp_slots("03/07/2025", *evening[:4]))
+
+    (window,) = db.find_best_windows(event.id, 120, top_k=1)
+    assert (window.participant_count, window.start_time, window.end_time) == (
+        2,
+        time(18),
+        time(20),
+    )
+    assert {user.id for user in window.available_users} == {alice.id, bob.id}
+
+
+def test_best_window_with_filters(db, event):
+    alice, bob = make_users(db, 2)
+    evening = ["1800", "1830", "1900", "1930", "2000", "2030", "2100", "2130"]
+    db.set_user_availability(event.id, alice.id, webapp_slots("03/07/2025", *evening))
+    db.set_user_availability(event.id, bob.id, webapp_slots("03/07/2025", *evening[:4]))
+
+    window = db.find_best_window(event.id, 120)
+    assert (window.participant_count, window.start_time, window.end_time) == (
+        2,
+        time(18),
+        time(20),
+    )
+    assert {user.id for user in window.available_users} == {alice.id, bob.id}
+
+    window = db.find_best_window(event.id, 240, start_time=time(18), end_time=time(22))
+    assert window.participant_count == 1
+    # 3 July 2025 is a Thursday
+    assert db.find_best_window(event.id, 60, weekdays=(5, 6)) is None
+
+
+# ==================== DISPLAY TEXT ====================
+
+
+def test_unchanged_event_is_not_rendered_again(db, event):
+    (alice,) = make_users(db, 1)
+    db.add_event_member(event.id, alice.id)
+    text = db.update_event_display_text(event.id)
+    with track_queries(budget=0):
+        assert db.update_event_display_text(event.id) == text
+
+
+def test_join_changes_the_display_text(db, event):
+    alice, bob = make_users(db, 2)
+    db.add_event_member(event.id, alice.id)
+    assert "user1" not in db.update_event_display_text(event.id)
+    db.add_event_member(event.id, bob.id)
+    assert "user1" in db.update_event_display_text(event.id)
+
+
+def test_renamed_member_is_shown_with_the_new_name(db, event):
+    (alice,) = make_users(db, 1)
+    db.add_event_member(event.id, alice.id)
+    assert "user0" in db.update_event_display_text(event.id)
+
+    alice = db.get_user_by_id(alice.id)
+    alice.tele_username = "renamed"
+    db.update_user(alice)
+    text = db.update_event_display_text(event.id)
+    assert "renamed" in text and "user0" not in text
+
+
+# ==================== UNIT OF WORK ====================
+
+
+def test_unit_of_work_loads_each_event_once(db, event):
+    with db.unit_of_work():
+        first = db.get_event_by_event_id(event.event_id, load=())
+        with track_queries(budget=0):
+            assert db.get_event_by_id(event.id, load=()) is first
+            assert db.get_event_by_event_id(event.event_id, load=()) is first
+
+
+def test_unit_of_work_flushes_display_text(db, event):
+    (alice,) = make_users(db, 1)
+    db.add_event_member(event.id, alice.id)
+    with db.unit_of_work():
+        text = db.update_event_display_text(event.id)
+    db.invalidate_event(event.id)
+    assert db.get_event_by_id(event.id, load=()).display_text == text
+    assert "user0" in text
@@ -0,0 +1,237 @@
+import asyncio
+import os
+from datetime import date
+
+# SupabaseDB requires these even though the tests replace its client
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test")
+os.environ.setdefault("SUPABASE_ANON_KEY", "anon.key.test")
+
+import pytest  # noqa: E402
+
+import supabase_db  # noqa: E402
+from classes import Event, User  # noqa: E402
+from fake_supabase import FakeClient  # noqa: E402
+from querylog import track_queries  # noqa: E402
+from storage import AsyncStorage  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(supabase_db, "create_client", lambda url, key: client)
+    return client
+
+
+@pytest.fixture
+def db(client):
+    return supabase_db.SupabaseDB()
+
+
+@pytest.fixture
+def event(db):
+    creator = db.create_user(User(tele_id="1", tele_username="creator"))
+    return db.create_event(
+        Event(
+            event_id="E" * 16,
+            event_name="Lunch",
+            creator_id=creator.id,
+            start_date=date(2025, 7, 1),
+            end_date=date(2025, 7, 3),
+        )
+    )
+
+
+def webapp_slots(*times):
+    return [{"date": "01/07/2025", "time": slot} for slot in times]
+
+
+# ==================== EVENT CACHE ====================
+
+
+def test_repeat_event_load_is_served_from_cache(db, client, event):
+    first = db.get_event_by_event_id(event.event_id)
+    client.calls.clear()
+    assert db.get_event_by_event_id(event.event_id).id == first.id
+    assert db.get_event_by_id(event.id).id == first.id
+    assert client.calls == []
+
+
+def test_cached_events_are_copies(db, event):
+    db.get_event_by_id(event.id).event_name = "changed"
+    assert db.get_event_by_id(event.id).event_name == "Lunch"
+
+
+def test_update_invalidates_the_cached_event(db, event):
+    loaded = db.get_event_by_id(event.id)
+    loaded.event_name = "Dinner"
+    db.update_event(loaded)
+    assert db.get_event_by_id(event.id).event_name == "Dinner"
+
+
+# ==================== MEMBERS ====================
+
+
+def test_duplicate_join_leaves_one_membership_row(db, client, event):
+    alice = db.create_user(User(tele_id="2", tele_username="alice"))
+    for _ in range(3):
+        db.add_event_member(event.id, alice.id)
+        db.invalidate_membership(event.id)
+    assert len(client.tables["event_members"]) == 1
+    assert db.is_user_event_member(event.id, alice.id)
+
+
+def test_join_falls_back_without_the_unique_constraint(db, client, event):
+    client.missing_constraints.add(("event_members", "event_id,user_id"))
+    alice = db.create_user(User(tele_id="2", tele_username="alice"))
+    for _ in range(3):
+        db.add_event_member(event.id, alice.id)
+        db.invalidate_membership(event.id)
+    assert len(client.tables["event_members"]) == 1
+    assert db.is_user_event_member(event.id, alice.id)
+
+
+def test_embedded_members_are_in_join_order(db, client, event):
+    users = [
+        db.create_user(User(tele_id=str(10 + i), tele_username=f"user{i}"))
+        for i in range(3)
+    ]
+    for user, minute in zip(users, (30, 10, 20)):
+        client.tables.setdefault("event_members", []).append(
+            {
+                "id": f"member-{minute}",
+                "event_id": str(event.id),
+                "user_id": str(user.id),
+                "joined_at": f"2025-07-01T09:{minute}:00+00:00",
+            }
+        )
+    db.invalidate_event(event.id)
+    loaded = db.get_event_by_id(event.id, load=("members",))
+    assert [member.tele_username for member in loaded.members] == [
+        "user1",
+        "user2",
+        "user0",
+    ]
+
+
+# ==================== HYDRATION ====================
+
+
+def test_event_is_hydrated_in_one_request(db, client, event):
+    alice = db.create_user(User(tele_id="2", tele_username="alice"))
+    db.add_event_member(event.id, alice.id)
+    db.set_user_availability(
+        event.id, alice.id, [{"date": "01/07/2025", "time": "0900"}]
+    )
+    db.invalidate_event(event.id)
+
+    client.calls.clear()
+    loaded = db.get_event_by_id(event.id)
+    assert client.calls == [("events", "select")]
+    assert [member.tele_username for member in loaded.members] == ["alice"]
+    assert [a.user_id for a in loaded.availability_data] == [alice.id]
+
+
+def test_deferred_members_load_on_first_access(db, client, event):
+    alice = db.create_user(User(tele_id="2", tele_username="alice"))
+    db.add_event_member(event.id, alice.id)
+    db.invalidate_event(event.id)
+
+    loaded = db.get_event_by_id(event.id, load=())
+    assert not loaded.is_loaded("members")
+    client.calls.clear()
+    assert [member.tele_username for member in loaded.members] == ["alice"]
+    assert loaded.is_loaded("members")
+    assert client.calls
+    client.calls.clear()
+    loaded.members
+    assert client.calls == []
+
+
+# ==================== AVAILABILITY ====================
+
+
+def test_compact_storage_matches_rows(monkeypatch, client):
+    results = {}
+    for storage in ("rows", "compact"):
+        monkeypatch.setenv("AVAILABILITY_STORAGE", storage)
+        db = supabase_db.SupabaseDB()
+        creator = db.create_user(User(tele_id=storage, tele_username=storage))
+        event = db.create_event(
+            Event(
+                event_name=storage,
+                creator_id=creator.id,
+                start_date=date(2025, 7, 1),
+                end_date=date(2025, 7, 3),
+            )
+        )
+        slots = [{"date": "02/07/2025", "time": t} for t in ("0900", "0930", "1400")]
+        db.set_user_availability(event.id, creator.id, slots)
+        best = db.calculate_best_meeting_times(event.id)
+        results[storage] = [(s.available_date, s.available_time) for s in best]
+    assert results["rows"] == results["compact"]
+    assert len(results["rows"]) == 3
+    assert len(client.tables["user_availability_compact"]) == 1
+
+
+def test_resubmission_writes_only_changed_slots(db, client, event):
+    db.set_user_availability(event.id, event.creator_id, webapp_slots("0900", "0930"))
+    kept = next(
+        row["id"]
+        for row in client.tables["user_availability"]
+        if row["available_time"] == "09:30:00"
+    )
+
+    client.calls.clear()
+    db.set_user_availability(event.id, event.creator_id, webapp_slots("0930", "1000"))
+    rows = client.tables["user_availability"]
+    assert sorted(row["available_time"] for row in rows) == ["09:30:00", "10:00:00"]
+    assert kept in {row["id"] for row in rows}
+    assert ("user_availability", "insert") in client.calls
+    assert ("user_availability", "delete") in client.calls
+
+    client.calls.clear()
+    db.set_user_availability(event.id, event.creator_id, webapp_slots("1000", "0930"))
+    assert ("user_availability", "insert") not in client.calls
+    assert ("user_availability", "delete") not in client.calls
+
+
+def test_resubmission_is_one_function_call_when_installed(db, client, event):
+    client.functions.add("replace_user_availability")
+    db.set_user_availability(event.id, event.creator_id, webapp_slots("0900", "0930"))
+
+    client.calls.clear()
+    db.set_user_availability(event.id, event.creator_id, webapp_slots("0930", "1000"))
+    assert client.calls == [("replace_user_availability", "rpc")]
+    rows = client.tables["user_availability"]
+    assert sorted(row["available_time"] for row in rows) == ["09:30:00", "10:00:00"]
+
+
+# ==================== QUERY LOG ====================
+
+
+def test_round_trips_are_recorded(db, client, event):
+    db.invalidate_event(event.id)
+    client.calls.clear()
+    with track_queries() as log:
+        db.get_event_by_id(event.id)
+        db.get_event_by_id(event.id)
+    assert log.round_trips == len(client.calls) == 1
+
+
+# ==================== ASYNC ====================
+
+
+def test_async_db_shares_the_sync_cache(db, client, event):
+    async_db = AsyncStorage(db)
+
+    async def load_twice():
+        return await asyncio.gather(
+            async_db.get_event_by_id(event.id),
+            async_db.get_event_by_event_id(event.event_id),
+        )
+
+    by_id, by_event_id = asyncio.run(load_twice())
+    assert by_id.id == by_event_id.id == event.id
+    client.calls.clear()
+    assert db.get_event_by_id(event.id).id == event.id
+    assert client.calls == []
@@ -0,0 +1,149 @@
+import json
+import os
+from datetime import date
+
+os.environ.setdefault("BOT_TOKEN", "0:test")
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test")
+os.environ.setdefault("SUPABASE_ANON_KEY", "anon.key.test")
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import pytest  # noqa: E402
+import telebot  # noqa: E402
+from telebot import apihelper  # noqa: E402
+
+
+class _Response:
+    status_code = 200
+    reason = "OK"
+    text = json.dumps({"ok": True, "result": True})
+
+    def json(self):
+        return json.loads(self.text)
+
+
+REQUESTS = []
+
+
+def send_request(method, url, **kwargs):
+    REQUESTS.append((url.rsplit("/", 1)[-1], kwargs.get("params") or {}))
+    return _Response()
+
+
+# telegram.py calls the Bot API at import time
+apihelper.CUSTOM_REQUEST_SENDER = send_request
+import telegram  # noqa: E402
+from classes import DISPLAY_TEXT_LIMIT, Event, User  # noqa: E402
+
+SENDER = {"id": 7, "is_bot": False, "first_name": "A"}
+CHAT = {"id": 9, "type": "private"}
+
+
+def update(**payload):
+    return telebot.types.Update.de_json({"update_id": 1, **payload})
+
+
+def message(**payload):
+    return {"message_id": 1, "date": 0, "chat": CHAT, "from": SENDER, **payload}
+
+
+def test_callbacks_are_keyed_by_event():
+    for data in ("abc", "Calculate abc", "Calculate abc 2h"):
+        callback = {"id": "1", "from": SENDER, "chat_instance": "x", "data": data}
+        key = telegram.update_dispatch_key(update(callback_query=callback))
+        assert key == ("event", "abc")
+
+
+def test_inline_queries_are_keyed_by_sender():
+    inline = {"id": "1", "from": SENDER, "query": "Event:abc", "offset": ""}
+    assert telegram.update_dispatch_key(update(inline_query=inline)) == ("chat", 7)
+
+
+def test_other_messages_are_keyed_by_chat():
+    key = telegram.update_dispatch_key(update(message=message(text="/start")))
+    assert key == ("chat", 9)
+
+
+def test_webapp_data_is_keyed_by_its_event():
+    web_app_data = {"data": json.dumps({"event_id": "abc"}), "button_text": "x"}
+    key = telegram.update_dispatch_key(
+        update(message=message(web_app_data=web_app_data))
+    )
+    assert key == ("event", "abc")
+
+
+def test_webhook_is_set_up_and_drained_by_the_lifespan(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("BOT_MODE", "webhook")
+    REQUESTS.clear()
+    with TestClient(telegram.app) as client:
+        name, params = REQUESTS[-1]
+        assert name == "setWebhook" and params["url"].endswith(
+            telegram.WEBHOOK_URL_PATH
+        )
+        assert client.get("/health").json()["webhook"]["workers"] > 0
+        assert telegram.update_pool._accepting
+    assert not telegram.update_pool.submit(update(message=message(text="hi")))
+
+
+@pytest.mark.parametrize(
+    "data, minutes",
+    [
+        ("Calculate abc 2h", 120),
+        ("Calculate abc weekend", 180),
+        ("Calculate abc 90", 90),
+    ],
+)
+def test_calculate_options(data, minutes):
+    _, query = telegram.calculate_option(data)
+    assert query["min_duration_minutes"] == minutes
+
+
+@pytest.mark.parametrize(
+    "data", ["Calculate abc", "Calculate abc 0", "Calculate abc x"]
+)
+def test_plain_or_unknown_calculate_has_no_option(data):
+    assert telegram.calculate_option(data) is None
+
+
+def test_option_buttons_fit_in_callback_data():
+    markup = telegram.event_markup("A" * 16)
+    for row in markup.keyboard:
+        for button in row:
+            assert len(button.callback_data.encode()) <= 64
+
+
+def test_calculate_option_text_stays_within_the_limit():
+    db = telegram.db
+    creator = db.create_user(User(tele_id="1", tele_username="creator"))
+    event = db.create_event(
+        Event(
+            event_id="L" * 16,
+            event_name="Crowded",
+            creator_id=creator.id,
+            start_date=date(2025, 7, 1),
+            end_date=date(2025, 7, 1),
+        )
+    )
+    slots = [{"date": "01/07/2025", "time": t} for t in ("0900", "0930")]
+    for number in range(400):
+        user = db.create_user(
+            User(tele_id=str(1000 + number), tele_username=f"member_{number:04d}")
+        )
+        db.add_event_member(event.id, user.id)
+    db.set_user_availability(event.id, user.id, slots)
+    assert len(db.update_event_display_text(event.id)) > DISPLAY_TEXT_LIMIT - 100
+
+    callback = {
+        "id": "1",
+        "from": SENDER,
+        "chat_instance": "x",
+        "inline_message_id": "crowded",
+        "data": f"Calculate {event.event_id} 60",
+    }
+    REQUESTS.clear()
+    telegram.handle_join_event(update(callback_query=callback).callback_query)
+    assert telegram.outbound.flush(timeout=5)
+    (text,) = [p["text"] for name, p in REQUESTS if name == "editMessageText"]
+    assert len(text) <= DISPLAY_TEXT_LIMIT
+    assert "member_0000" in text
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import defaultdict
+
+from workers import UpdateWorkerPool
+
+
+def test_items_with_one_key_run_in_submission_order():
+    seen = defaultdict(list)
+    running = defaultdict(int)
+    overlap = []
+    lock = threading.Lock()
+
+    def handle(item):
+        key, number = item
+        with lock:
+            running[key] += 1
+            if running[key] > 1:
+                overlap.append(key)
+        time.sleep(0.001)
+        with lock:
+            seen[key].append(number)
+            running[key] -= 1
+
+    pool = UpdateWorkerPool(
+        handle, workers=8, queue_size=1000, key=lambda item: item[0]
+    )
+    pool.start()
+    for number in range(50):
+        for key in ("a", "b", "c"):
+            assert pool.submit((key, number))
+    pool.shutdown(drain=True, timeout=10)
+
+    assert not overlap
+    for key in ("a", "b", "c"):
+        assert seen[key] == list(range(50))
+    assert pool.stats()["processed"] == 150
+
+
+def test_different_keys_run_in_parallel():
+    started = threading.Barrier(2, timeout=5)
+
+    def handle(item):
+        # Deadlocks (and times out) unless both items run at once
+        started.wait()
+
+    pool = UpdateWorkerPool(handle, workers=2, key=lambda item: item)
+    pool.start()
+    pool.submit("a")
+    pool.submit("b")
+    pool.shutdown(drain=True, timeout=10)
+    assert pool.stats()["processed"] == 2
+    assert pool.stats()["failed"] == 0
+
+
+def test_full_queue_rejects_without_blocking():
+    release = threading.Event()
+    pool = UpdateWorkerPool(lambda item: release.wait(5), workers=1, queue_size=2)
+    pool.start()
+    results = [pool.submit(number) for number in range(5)]
+    release.set()
+    pool.shutdown(drain=True, timeout=10)
+    assert results.count(False) >= 2
+    assert pool.stats()["rejected"] == results.count(False)
+
+
+def test_failures_are_counted_and_do_not_stop_the_key():
+    seen = []
+
+    def handle(item):
+        if item == 1:
+            raise ValueError("boom")
+        seen.append(item)
+
+    pool = UpdateWorkerPool(handle, workers=2, key=lambda item: "same")
+    pool.start()
+    for item in range(3):
+        pool.submit(item)
+    pool.shutdown(drain=True, timeout=10)
+    assert seen == [0, 2]
+    assert pool.stats()["failed"] == 1
+
+
+def test_submit_after_shutdown_is_rejected():
+    pool = UpdateWorkerPool(lambda item: None, workers=1)
+    pool.start()
+    pool.shutdown()
+    assert not pool.submit("late")
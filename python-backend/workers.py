@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional
+
+from icecream import ic
+
+
+class UpdateWorkerPool:
+    """Bounded pool of threads that processes Telegram updates off the request path
+
+    ``submit`` never blocks: it returns False when the queue is full so the
+    webhook can answer with an error and let Telegram redeliver later.
+
+    With a ``key`` function, items that share a key (e.g. the same event) run
+    one at a time in submission order while different keys run in parallel.
+    Items whose key is None are not ordered against anything.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        handler: Callable[[Any], None],
+        workers: int = 4,
+        queue_size: int = 100,
+        name: str = "updates",
+        key: Optional[Callable[[Any], Optional[Hashable]]] = None,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.name = name
+        self.key = key
+        # Keys with pending items; each key is on the ready queue or being
+        # worked on at most once, which is what keeps its items serial
+        self._ready: "queue.Queue[Any]" = queue.Queue()
+        self._pending: Dict[Hashable, Deque[Any]] = {}
+        self._queued = 0
+        self._threads: List[threading.Thread] = []
+        self._accepting = False
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def start(self):
+        """Start the worker threads"""
+        if self._threads:
+            return
+        self._accepting = True
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"{self.name}-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _key_for(self, item: Any) -> Hashable:
+        key = None
+        if self.key is not None:
+            try:
+                key = self.key(item)
+            except Exception as e:
+                ic(f"Error computing dispatch key: {e}")
+        # A fresh object never collides, so unkeyed items are unordered
+        return object() if key is None else key
+
+    def submit(self, item: Any) -> bool:
+        """Queue an item for processing; False if the pool is full or stopped"""
+        if not self._accepting:
+            return False
+        key = self._key_for(item)
+        with self._lock:
+            if self._queued >= self.queue_size:
+                self.rejected += 1
+                return False
+            self._queued += 1
+            pending = self._pending.get(key)
+            if pending is not None:
+                # Already scheduled; the worker holding the key picks it up
+                pending.append(item)
+                return True
+            self._pending[key] = deque([item])
+        self._ready.put(key)
+        return True
+
+    def _work(self):
+        while True:
+            key = self._ready.get()
+            if key is self._STOP:
+                return
+            with self._lock:
+                pending = self._pending.get(key)
+                if not pending:
+                    # Discarded by a non-draining shutdown
+                    continue
+                item = pending.popleft()
+                self._queued -= 1
+            try:
+                self.handler(item)
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                ic(f"Error processing update: {e}")
+            finally:
+                with self._lock:
+                    pending = self._pending.get(key)
+                    if pending:
+                        # Back of the line, so one busy key cannot starve others
+                        self._ready.put(key)
+                    else:
+                        self._pending.pop(key, None)
+                        if not self._pending:
+                            self._idle.notify_all()
+
+    def shutdown(self, drain: bool = True, timeout: Optional[float] = None):
+        """Stop accepting work, optionally finish what is queued, then stop"""
+        self._accepting = False
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._idle:
+            if not drain:
+                # Discard anything not yet picked up
+                self._pending.clear()
+                self._queued = 0
+            elif not self._idle.wait_for(lambda: not self._pending, timeout):
+                ic(f"{self.name} pool did not drain before the shutdown timeout")
+        for _ in self._threads:
+            self._ready.put(self._STOP)
+        for thread in self._threads:
+            thread.join(
+                None if deadline is None else max(0.0, deadline - time.monotonic())
+            )
+        self._threads = [t for t in self._threads if t.is_alive()]
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and processing counters"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self._queued,
+                "queue_size": self.queue_size,
+                "keys": len(self._pending),
+                "processed": self.processed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }